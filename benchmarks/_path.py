@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+
+import sys
+from pathlib import Path
+
+
+# ベンチマークをリポジトリのルートから `python benchmarks/<name>.py` で
+# PYTHONPATH 無しに実行できるように，ルートを import のパスに加える．
+# `benchmarks` 以下のスクリプトは `majsoul_rpa` を import する前に
+# `import _path` する．別のプロセスで `majsoul_rpa` を import する場合は
+# `ROOT` を作業ディレクトリにする．
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import time
+import base64
+import numpy
+import _path
+from majsoul_rpa._impl import mahjongsoul_pb2
+from majsoul_rpa.presentation.match._common import (_decode_bytes, parse_action)
+
+
+# `ActionPrototype` のデータの難読化を解く処理について，1バイトずつ
+# 処理していた旧実装と現在の実装の結果が一致することを確かめ，それぞれの
+# 処理時間を計測する．データは実際の対局で流れるのと同じ形の
+# アクションを組み立てて難読化したもの（難読化と解除は同じ処理）と，
+# 様々な長さの乱数列を使う．
+
+
+_REPEAT = 2000
+
+
+def _decode_bytes_reference(buf: bytes) -> bytearray:
+    keys = [132, 94, 78, 66, 57, 162, 31, 96, 28]
+    decode = bytearray()
+    for i, _byte in enumerate(buf):
+        mask = ((23 ^ len(buf)) + 5 * i + keys[i % len(keys)]) & 255
+        _byte ^= mask
+        decode += _byte.to_bytes(1, 'little')
+    return decode
+
+
+def _make_actions() -> list:
+    actions = []
+
+    discard = mahjongsoul_pb2.ActionDiscardTile(
+        seat=1, tile='5m', moqie=True, doras=['3p'])
+    actions.append(('ActionDiscardTile', discard.SerializeToString()))
+
+    deal = mahjongsoul_pb2.ActionDealTile(seat=2, tile='7z', left_tile_count=50)
+    actions.append(('ActionDealTile', deal.SerializeToString()))
+
+    new_round = mahjongsoul_pb2.ActionNewRound(
+        chang=0, ju=1, ben=2, tiles=['1m', '2m', '3m', '4p', '5p', '6p',
+        '7s', '8s', '9s', '1z', '2z', '3z', '4z', '5z'], dora='0m',
+        scores=[25000, 25000, 25000, 25000], left_tile_count=69,
+        doras=['0m'], md5='0123456789abcdef0123456789abcdef')
+    actions.append(('ActionNewRound', new_round.SerializeToString()))
+
+    rng = numpy.random.default_rng(0)
+    for length in (1, 9, 64, 1024, 16384):
+        data = rng.integers(0, 256, size=length, dtype=numpy.uint8).tobytes()
+        actions.append((f'random {length}', data))
+
+    return actions
+
+
+def main() -> None:
+    for name, data in _make_actions():
+        encoded = bytes(_decode_bytes_reference(data))
+        parity = 'O.K.'
+        if _decode_bytes(encoded) != bytes(_decode_bytes_reference(encoded)):
+            parity = 'NG: differs from the reference'
+        elif _decode_bytes(encoded) != data:
+            parity = 'NG: round trip failed'
+
+        elapsed = []
+        for func in (_decode_bytes_reference, _decode_bytes):
+            start = time.perf_counter()
+            for _ in range(_REPEAT):
+                func(encoded)
+            elapsed.append((time.perf_counter() - start) / _REPEAT)
+        print(f'{name:18} {len(data):6} bytes:'
+              f' reference {elapsed[0] * 1000000.0:10.2f} us,'
+              f' current {elapsed[1] * 1000000.0:10.2f} us  {parity}')
+        if parity != 'O.K.':
+            raise AssertionError(f'{name}: {parity}')
+
+        if not name.startswith('random'):
+            message = {
+                'step': 0, 'name': name,
+                'data': base64.b64encode(encoded).decode('UTF-8')}
+            _, _, result = parse_action(message)
+            result.to_dict()
+
+
+if __name__ == '__main__':
+    main()
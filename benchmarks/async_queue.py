@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import asyncio
+import threading
+import redis
+import _path
+from majsoul_rpa._impl import mahjongsoul_pb2
+from majsoul_rpa._impl.redis import (_encode_record, Redis)
+from majsoul_rpa._impl.async_redis import AsyncRedis
+
+
+# 複数のボットのメッセージキューを，ボットごとのスレッドで `Redis` から
+# 読み出す場合と，1つのイベントループで `AsyncRedis` から読み出す場合とで，
+# 全て読み出し終えるまでの時間を比較する．簡単のため全てのボットが同じ
+# キーから読み出す．実際に動いている Redis サーバが必要．
+#
+# 使い方: async_queue.py [<host> [<port>]]
+
+
+_NUM_BOTS = 16
+_NUM_MESSAGES = 500
+
+
+def _make_record(i: int) -> bytes:
+    wrapper = mahjongsoul_pb2.Wrapper(
+        name='.lq.NotifyAccountUpdate', data=b'').SerializeToString()
+    return _encode_record('inbound', b'\x01' + wrapper, None, i)
+
+
+def _produce(client: redis.Redis) -> None:
+    # 全てのボットが同じキーから読み出すので，合計の件数を積む．
+    with client.pipeline(transaction=False) as pipeline:
+        for i in range(_NUM_BOTS * _NUM_MESSAGES):
+            pipeline.rpush('message_queue', _make_record(i))
+        pipeline.execute()
+
+
+def _run_threads(host: str, port: int) -> None:
+    def consume() -> None:
+        queue = Redis(host, port, batch_size=1)
+        for _ in range(_NUM_MESSAGES):
+            queue.dequeue_message(5.0)
+
+    threads = [threading.Thread(target=consume) for _ in range(_NUM_BOTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+async def _run_event_loop(host: str, port: int) -> None:
+    async def consume() -> None:
+        queue = AsyncRedis(host, port, batch_size=1)
+        for _ in range(_NUM_MESSAGES):
+            await queue.dequeue_message(5.0)
+        await queue.close()
+
+    await asyncio.gather(*(consume() for _ in range(_NUM_BOTS)))
+
+
+def main() -> None:
+    host = sys.argv[1] if len(sys.argv) >= 2 else 'localhost'
+    port = int(sys.argv[2]) if len(sys.argv) >= 3 else 6379
+    client = redis.Redis(host=host, port=port)
+
+    for mode in ('threads', 'asyncio'):
+        client.delete('message_queue')
+        _produce(client)
+        start = time.perf_counter()
+        if mode == 'threads':
+            _run_threads(host, port)
+        else:
+            asyncio.run(_run_event_loop(host, port))
+        elapsed = time.perf_counter() - start
+        print(f'{mode:7}: {_NUM_BOTS} bots,'
+              f' {_NUM_BOTS * _NUM_MESSAGES / elapsed:10.2f} messages/s')
+
+    client.delete('message_queue')
+
+
+if __name__ == '__main__':
+    main()
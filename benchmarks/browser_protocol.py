@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import json
+import base64
+import time
+from io import BytesIO
+import numpy
+import PIL.Image
+import cv2
+import _path
+from majsoul_rpa._impl.browser import (_encode_message, _decode_message)
+
+
+# リモートブラウザとの間でスクリーンショットを送受信する際の，
+# base64 を埋め込んだ JSON 形式とバイナリ形式のサイズと
+# エンコード・デコードにかかる時間を比較する．
+
+
+_REPEAT = 20
+
+
+def _make_png() -> bytes:
+    rng = numpy.random.default_rng(0)
+    image = rng.integers(0, 256, size=(135, 240, 3), dtype=numpy.uint8)
+    image = cv2.resize(image, (1920, 1080), interpolation=cv2.INTER_CUBIC)
+    f = BytesIO()
+    PIL.Image.fromarray(image).save(f, format='PNG')
+    return f.getvalue()
+
+
+def _json_round_trip(png: bytes) -> int:
+    data = base64.b64encode(png).decode('UTF-8')
+    message = json.dumps(
+        {'result': 'O.K.', 'data': data}, separators=(',', ':'))
+    message = message.encode('UTF-8')
+    response = json.loads(message.decode('UTF-8'))
+    base64.b64decode(response['data'])
+    return len(message)
+
+
+def _binary_round_trip(png: bytes) -> int:
+    message = _encode_message({'result': 'O.K.'}, png)
+    _decode_message(message)
+    return len(message)
+
+
+def main() -> None:
+    png = _make_png()
+    for name, func in (('json', _json_round_trip),
+                       ('binary', _binary_round_trip)):
+        start = time.perf_counter()
+        for _ in range(_REPEAT):
+            size = func(png)
+        elapsed = (time.perf_counter() - start) / _REPEAT
+        print(f'{name:6}: {size / 1024.0:10.1f} KiB'
+              f' {elapsed * 1000.0:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+
+
+# `benchmarks/suite.py` の2つの結果を比べ，時間 (`median_us`) ごとに
+# 前後の値と変化率を表示する．変化率が `threshold` （既定で 10% ）を
+# 超えるものに印を付ける．
+#
+#   python benchmarks/compare.py before.json after.json [threshold]
+
+
+def _flatten(results: dict, prefix: str='') -> dict:
+    values = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            values.update(_flatten(value, f'{prefix}{key}.'))
+        elif key == 'median_us':
+            values[prefix[:-1]] = value
+    return values
+
+
+def main() -> None:
+    if len(sys.argv) < 3:
+        raise RuntimeError(
+            'Usage: compare.py BEFORE.json AFTER.json [THRESHOLD]')
+    with open(sys.argv[1], encoding='UTF-8') as f:
+        before = json.load(f)
+    with open(sys.argv[2], encoding='UTF-8') as f:
+        after = json.load(f)
+    threshold = float(sys.argv[3]) if len(sys.argv) >= 4 else 0.1
+
+    for key in ('commit', 'match_backend'):
+        print(f'{key:14}: {before["environment"].get(key)}'
+              f' -> {after["environment"].get(key)}')
+
+    before = _flatten(before)
+    after = _flatten(after)
+    for key in sorted(before.keys() | after.keys()):
+        if key.startswith('environment.'):
+            continue
+        if key not in before or key not in after:
+            print(f'{key:56} only in {"after" if key in after else "before"}')
+            continue
+        ratio = after[key] / before[key] - 1.0 if before[key] > 0.0 else 0.0
+        mark = ''
+        if ratio > threshold:
+            mark = '  slower'
+        elif ratio < -threshold:
+            mark = '  faster'
+        print(f'{key:56} {before[key]:14.3f} us -> {after[key]:14.3f} us'
+              f' {ratio * 100.0:+7.1f}%{mark}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+
+import sys
+import random
+from pathlib import Path
+from typing import (Tuple, List,)
+import yaml
+import numpy
+import cv2
+import _path
+from majsoul_rpa._impl import mahjongsoul_pb2
+from majsoul_rpa._impl.redis import _encode_record
+from majsoul_rpa._impl.replay import ArchiveWriter
+from majsoul_rpa.presentation.match._common import _decode_bytes
+
+
+# `benchmarks/suite.py` が使う記録（ `majsoul_rpa.replay.Replay` の形式）を
+# 作る．実際の対局を記録したものではなく，同じ形のメッセージと
+# スクリーンショットを乱数の種を固定して組み立てたもの．同じ入力からは
+# 同じバイト列ができるので， `benchmarks/fixtures` にチェックインしておく
+# （無ければ `benchmarks/suite.py` が作る）．メッセージの形式やテンプレート
+# 画像を変えた場合は，これを直接実行して作り直してからチェックインする．
+#
+#   python benchmarks/make_fixtures.py [directory]
+#
+#   messages.mrrp: メッセージの種類ごとのデコードと，対局の
+#                  `ActionPrototype` の処理に使うメッセージ
+#   login.mrrp, auth.mrrp, home.mrrp: 読み込み中の画面の後に各画面が
+#                  表示される記録． `RPA.wait` がプレゼンテーションを
+#                  検出するまでの時間の計測に使う
+
+
+_START = 1700000000000000000
+_SECOND = 1000000000
+_ACCOUNT_ID = 12345678
+
+
+class _Session(object):
+    # スニファが `message_queue` に送るのと同じ形式のレコードを，
+    # (時刻, レコード) の組として `records` に溜める．
+    def __init__(self, timestamp: int) -> None:
+        self.__index = 0
+        self.__timestamp = timestamp
+        self.__records: List[Tuple[int, bytes]] = []
+
+    @property
+    def records(self) -> List[Tuple[int, bytes]]:
+        return self.__records
+
+    def advance(self, duration: int) -> None:
+        self.__timestamp += duration
+
+    @staticmethod
+    def __wrap(name: str, message) -> bytes:
+        wrapper = mahjongsoul_pb2.Wrapper(
+            name=name, data=message.SerializeToString())
+        return wrapper.SerializeToString()
+
+    def notify(self, name: str, message) -> None:
+        request = b'\x01' + _Session.__wrap(name, message)
+        self.__records.append((self.__timestamp, _encode_record(
+            'inbound', request, None, self.__timestamp)))
+
+    def call(self, name: str, request, response) -> None:
+        self.__index = self.__index % 65535 + 1
+        index = self.__index.to_bytes(2, 'little')
+        request = b'\x02' + index + _Session.__wrap(name, request)
+        response = b'\x03' + index + _Session.__wrap('', response)
+        self.__records.append((self.__timestamp, _encode_record(
+            'outbound', request, response, self.__timestamp)))
+
+    def action(self, step: int, name: str, action) -> None:
+        data = _decode_bytes(action.SerializeToString())
+        self.notify(
+            '.lq.ActionPrototype',
+            mahjongsoul_pb2.ActionPrototype(step=step, name=name, data=data))
+
+
+def _lobby_messages(session: _Session) -> None:
+    # ログインからホーム画面に遷移するまでに流れるメッセージ．
+    pb2 = mahjongsoul_pb2
+    interval = _SECOND // 100
+
+    response = pb2.ResLogin(account_id=_ACCOUNT_ID, access_token='0' * 36)
+    response.account.account_id = _ACCOUNT_ID
+    response.account.nickname = 'majsoul-rpa'
+    response.account.level.id = 10203
+    response.account.level.score = 300
+    response.account.level3.id = 20101
+    response.account.gold = 12345
+    session.call(
+        '.lq.Lobby.oauth2Login', pb2.ReqOauth2Login(
+            type=7, access_token='0' * 36, random_key='0' * 36,
+            client_version_string='web-0.10.0.w'), response)
+    session.advance(interval)
+
+    session.call(
+        '.lq.Lobby.fetchServerTime', pb2.ReqCommon(),
+        pb2.ResServerTime(server_time=_START // _SECOND))
+    session.advance(interval)
+
+    response = pb2.ResFriendList(friend_max_count=150, friend_count=20)
+    for i in range(20):
+        friend = response.friends.add()
+        friend.base.account_id = _ACCOUNT_ID + 1 + i
+        friend.base.nickname = f'friend{i}'
+        friend.base.level.id = 10201 + i % 3
+    session.call('.lq.Lobby.fetchFriendList', pb2.ReqCommon(), response)
+    session.advance(interval)
+
+    for i in range(8):
+        update = pb2.NotifyAccountUpdate()
+        numerical = update.update.numerical.add()
+        numerical.id = 100001 + i
+        numerical.final = 1000 * i
+        session.notify('.lq.NotifyAccountUpdate', update)
+        session.advance(interval)
+
+    response = pb2.ResDailyTask(
+        has_refresh_count=True, max_daily_task_count=3, refresh_count=1)
+    for i in range(3):
+        response.progresses.add(id=1000 + i, counter=i)
+    session.call('.lq.Lobby.fetchDailyTask', pb2.ReqCommon(), response)
+    session.advance(interval)
+
+    for _ in range(4):
+        session.call(
+            '.lq.Lobby.heatbeat', pb2.ReqHeatBeat(no_operation_counter=0),
+            pb2.ResCommon())
+        session.advance(interval)
+
+
+def _make_wall(rng: random.Random) -> list:
+    wall = []
+    for c in 'mps':
+        for n in range(1, 10):
+            if n == 5:
+                wall += ['0' + c] + ['5' + c] * 3
+            else:
+                wall += [f'{n}{c}'] * 4
+    for n in range(1, 8):
+        wall += [f'{n}z'] * 4
+    rng.shuffle(wall)
+    return wall
+
+
+def _round_actions(chang: int, ju: int, rng: random.Random) -> list:
+    # 自分の席を 0 とした1局分の (アクション名, アクション) の列．
+    # 自摸・打牌のほかに，他家の打牌をときどきポンする．
+    pb2 = mahjongsoul_pb2
+    wall = _make_wall(rng)
+    hands = [[wall.pop() for _ in range(13)] for _ in range(4)]
+    hands[ju].append(wall.pop())
+    dora = wall.pop()
+
+    actions = [('ActionNewRound', pb2.ActionNewRound(
+        chang=chang, ju=ju, ben=0, tiles=hands[0], dora=dora,
+        scores=[25000] * 4, liqibang=0, md5='0' * 32,
+        left_tile_count=len(wall) - 14, doras=[dora]))]
+
+    seat = ju
+    draw = False
+    while len(wall) > 14:
+        if draw:
+            tile = wall.pop()
+            hands[seat].append(tile)
+            actions.append(('ActionDealTile', pb2.ActionDealTile(
+                seat=seat, tile=tile if seat == 0 else '',
+                left_tile_count=len(wall) - 14)))
+
+        # 自摸牌（手牌の末尾）か手牌から打牌する．
+        index = rng.randrange(len(hands[seat]))
+        moqie = draw and index == len(hands[seat]) - 1
+        tile = hands[seat].pop(index)
+        actions.append(('ActionDiscardTile', pb2.ActionDiscardTile(
+            seat=seat, tile=tile, moqie=moqie)))
+
+        caller = None
+        for other in range(4):
+            if other != seat and hands[other].count(tile) >= 2 \
+               and rng.random() < 0.3:
+                caller = other
+                break
+        if caller is None:
+            seat = (seat + 1) % 4
+            draw = True
+            continue
+
+        hands[caller].remove(tile)
+        hands[caller].remove(tile)
+        actions.append(('ActionChiPengGang', pb2.ActionChiPengGang(
+            seat=caller, type=1, tiles=[tile] * 3,
+            froms=[caller, caller, seat])))
+        seat = caller
+        draw = False
+
+    return actions
+
+
+def _write_messages(path: Path) -> None:
+    pb2 = mahjongsoul_pb2
+    rng = random.Random(0)
+    session = _Session(_START)
+    _lobby_messages(session)
+
+    session.call(
+        '.lq.FastTest.authGame', pb2.ReqAuthGame(
+            account_id=_ACCOUNT_ID, token='0' * 36, game_uuid='0' * 36),
+        pb2.ResAuthGame(seat_list=[_ACCOUNT_ID, 1, 2, 3]))
+    step = 0
+    for chang in range(2):
+        for ju in range(4):
+            for name, action in _round_actions(chang, ju, rng):
+                session.advance(_SECOND // 10)
+                session.action(step, name, action)
+                step += 1
+                if name == 'ActionDiscardTile' and action.seat == 0:
+                    session.call(
+                        '.lq.FastTest.inputOperation', pb2.ReqSelfOperation(
+                            type=1, tile=action.tile, moqie=action.moqie,
+                            timeuse=1), pb2.ResCommon())
+                if step % 16 == 0:
+                    session.call(
+                        '.lq.FastTest.checkNetworkDelay', pb2.ReqCommon(),
+                        pb2.ResCommon())
+
+    writer = ArchiveWriter(path)
+    for timestamp, record in session.records:
+        writer.write_message(timestamp, record)
+    writer.close()
+
+
+def _make_background() -> numpy.ndarray:
+    # 読み込み中のゲーム画面に見立てた画像．縦のグラデーションに
+    # 枠と文字を描く．
+    row = numpy.linspace(24, 96, 1080, dtype=numpy.float32)
+    image = numpy.empty((1080, 1920, 3), dtype=numpy.uint8)
+    image[:, :, 0] = (row * 1.2).astype(numpy.uint8)[:, None]
+    image[:, :, 1] = (row * 0.8).astype(numpy.uint8)[:, None]
+    image[:, :, 2] = (row * 0.5).astype(numpy.uint8)[:, None]
+    cv2.rectangle(image, (160, 120), (1760, 960), (200, 180, 140), 4)
+    cv2.rectangle(image, (560, 880), (1360, 910), (90, 70, 50), -1)
+    cv2.rectangle(image, (560, 880), (1040, 910), (60, 200, 240), -1)
+    cv2.putText(
+        image, 'Loading...', (820, 860), cv2.FONT_HERSHEY_SIMPLEX, 1.5,
+        (240, 240, 240), 3, cv2.LINE_AA)
+    return image
+
+
+def paste_template(image: numpy.ndarray, name: str) -> numpy.ndarray:
+    # `image` の，テンプレートの探索領域の中央にテンプレート画像を
+    # 貼り付けた画像を返す．探索領域は YAML ファイルのものか，それが
+    # 無ければ画面全体．
+    template = cv2.imread(f'{name}.png', cv2.IMREAD_COLOR)
+    if template is None:
+        raise RuntimeError(f'{name}.png: Could not read.')
+    left, top, width, height = 0, 0, image.shape[1], image.shape[0]
+    if Path(f'{name}.yaml').exists():
+        with open(f'{name}.yaml', encoding='UTF-8') as f:
+            config = yaml.load(f, Loader=yaml.Loader)
+        left = config.get('left', left)
+        top = config.get('top', top)
+        width = config.get('width', width)
+        height = config.get('height', height)
+    x = left + (width - template.shape[1]) // 2
+    y = top + (height - template.shape[0]) // 2
+    image = image.copy()
+    image[y:y + template.shape[0], x:x + template.shape[1]] = template
+    return image
+
+
+def _write_screen(
+    path: Path, templates: List[str], with_lobby_messages: bool=False) -> None:
+    # 読み込み中の画面の1秒後に `templates` を貼り付けた画面を記録する．
+    # `with_lobby_messages` が真ならば，その画面が表示された後に
+    # ホーム画面に遷移する際のメッセージが届く．
+    background = _make_background()
+    image = background
+    for name in templates:
+        image = paste_template(image, name)
+    writer = ArchiveWriter(path)
+    writer.write_frame(_START, background)
+    writer.write_frame(_START + _SECOND, image)
+    if with_lobby_messages:
+        session = _Session(_START + _SECOND)
+        _lobby_messages(session)
+        for timestamp, record in session.records:
+            writer.write_message(timestamp, record)
+    writer.close()
+
+
+FIXTURE_NAMES = ('messages', 'login', 'auth', 'home',)
+
+
+def write_fixtures(directory: Path) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    _write_messages(directory / 'messages.mrrp')
+    _write_screen(directory / 'login.mrrp', ['template/login/marker'])
+    _write_screen(directory / 'auth.mrrp', ['template/auth/marker'])
+    _write_screen(
+        directory / 'home.mrrp',
+        [f'template/home/marker{i}' for i in range(4)],
+        with_lobby_messages=True)
+
+
+def main() -> None:
+    directory = Path(sys.argv[1] if len(sys.argv) >= 2
+                     else 'benchmarks/fixtures')
+    write_fixtures(directory)
+    for path in sorted(directory.glob('*.mrrp')):
+        print(f'{path}: {path.stat().st_size} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import redis
+import _path
+from majsoul_rpa._impl import mahjongsoul_pb2
+from majsoul_rpa._impl.redis import (_encode_record, Redis)
+
+
+# スニファから一度に届いたメッセージの束を，1件ずつ取り出す場合と
+# `dequeue_many` でまとめて取り出す場合とで，全て取り出し終えるまでの
+# 時間を比較する．実際に動いている Redis サーバが必要．
+#
+# 使い方: message_batch.py [<host> [<port>]]
+
+
+_BURST_SIZE = 1000
+
+
+def _make_record(i: int) -> bytes:
+    wrapper = mahjongsoul_pb2.Wrapper(
+        name='.lq.NotifyAccountUpdate', data=b'').SerializeToString()
+    return _encode_record('inbound', b'\x01' + wrapper, None, i)
+
+
+def _push_burst(client: redis.Redis, transport: str) -> None:
+    with client.pipeline(transaction=False) as pipeline:
+        for i in range(_BURST_SIZE):
+            if transport == 'list':
+                pipeline.rpush('message_queue', _make_record(i))
+            else:
+                pipeline.xadd('message_stream', {'data': _make_record(i)})
+        pipeline.execute()
+
+
+def main() -> None:
+    host = sys.argv[1] if len(sys.argv) >= 2 else 'localhost'
+    port = int(sys.argv[2]) if len(sys.argv) >= 3 else 6379
+    client = redis.Redis(host=host, port=port)
+
+    for transport in ('list', 'stream'):
+        for mode in ('single', 'batch'):
+            client.delete('message_queue', 'message_stream',
+                          'message_stream_offset:benchmark')
+            _push_burst(client, transport)
+            queue = Redis(host=host, port=port, transport=transport,
+                          consumer='benchmark')
+            if transport == 'stream':
+                # 既定では最新のメッセージの次から読み出すので，先に
+                # 積んだメッセージを最初から読み出す．
+                queue.seek('0-0')
+            count = 0
+            start = time.perf_counter()
+            while count < _BURST_SIZE:
+                if mode == 'single':
+                    count += 1 if queue.dequeue_message(1.0) else 0
+                else:
+                    count += len(queue.dequeue_many(_BURST_SIZE, 1.0))
+            elapsed = time.perf_counter() - start
+            print(f'{transport:6} {mode:6}: {_BURST_SIZE / elapsed:10.2f}'
+                  ' messages/s')
+
+    client.delete('message_queue', 'message_stream',
+                  'message_stream_offset:benchmark')
+
+
+if __name__ == '__main__':
+    main()
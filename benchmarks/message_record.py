@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import base64
+import time
+import datetime
+import _path
+from majsoul_rpa._impl.redis import (_encode_record, _decode_record)
+
+
+# スニファから Redis に送るレコードについて，旧来の JSON 形式と
+# バイナリ形式のサイズとエンコード・デコードにかかる時間を比較する．
+
+
+_REPEAT = 20000
+
+
+def _make_frames():
+    # 小さなハートビートと，対局開始時のような大きめのメッセージ．
+    return (
+        ('small', os.urandom(24), os.urandom(8)),
+        ('large', os.urandom(16 * 1024), os.urandom(4 * 1024)),
+    )
+
+
+def _json_round_trip(request: bytes, response: bytes) -> int:
+    data = {
+        'request_direction': 'outbound',
+        'request': base64.b64encode(request).decode('UTF-8'),
+        'response': base64.b64encode(response).decode('UTF-8'),
+        'timestamp': time.time(),
+    }
+    data = json.dumps(data, allow_nan=False, separators=(',', ':'))
+    data = data.encode('UTF-8')
+
+    message = json.loads(data.decode('UTF-8'))
+    base64.b64decode(message['request'])
+    base64.b64decode(message['response'])
+    datetime.datetime.fromtimestamp(
+        message['timestamp'], datetime.timezone.utc)
+    return len(data)
+
+
+def _binary_round_trip(request: bytes, response: bytes) -> int:
+    data = _encode_record('outbound', request, response, time.time_ns())
+    _decode_record(data)
+    return len(data)
+
+
+def main() -> None:
+    for name, request, response in _make_frames():
+        for format_, func in (('json', _json_round_trip),
+                              ('binary', _binary_round_trip)):
+            start = time.perf_counter()
+            for _ in range(_REPEAT):
+                size = func(request, response)
+            elapsed = (time.perf_counter() - start) / _REPEAT
+            print(f'{name:5} {format_:6}: {size:8} bytes'
+                  f' {elapsed * 1000000.0:8.2f} us')
+
+
+if __name__ == '__main__':
+    main()
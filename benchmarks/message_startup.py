@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import sys
+import subprocess
+import _path
+
+
+# `Redis` を構築してから最初のメッセージをデコードし終えるまでの時間を，
+# 全てのメッセージクラスを起動時に解決していた旧実装と，初めて使われた
+# 時に解決する現在の実装とで比較する．クラスの解決結果はプロセス内で
+# キャッシュされるので，計測ごとに別のプロセスを起動する．
+
+
+_SCRIPT = '''
+import sys
+import time
+import google.protobuf.json_format
+from google.protobuf.message_factory import MessageFactory
+from majsoul_rpa._impl import mahjongsoul_pb2
+from majsoul_rpa._impl.redis import Redis
+from majsoul_rpa._impl.message_registry import new_message
+
+name = '.lq.Lobby.oauth2Login'
+data = mahjongsoul_pb2.ReqOauth2Login(access_token='x').SerializeToString()
+
+start = time.perf_counter()
+if sys.argv[1] == 'eager':
+    message_type_map = {}
+    for sdesc in mahjongsoul_pb2.DESCRIPTOR.services_by_name.values():
+        for mdesc in sdesc.methods:
+            message_type_map['.' + mdesc.full_name] \\
+                = (MessageFactory().GetPrototype(mdesc.input_type),
+                MessageFactory().GetPrototype(mdesc.output_type))
+    for tdesc in mahjongsoul_pb2.DESCRIPTOR.message_types_by_name.values():
+        message_type_map['.' + tdesc.full_name] \\
+            = (MessageFactory().GetPrototype(tdesc), None)
+    parser = message_type_map[name][0]()
+else:
+    Redis('localhost')
+    parser = new_message(name)
+parser.ParseFromString(data)
+google.protobuf.json_format.MessageToDict(
+    parser, including_default_value_fields=True,
+    preserving_proto_field_name=True)
+print(time.perf_counter() - start)
+'''
+
+
+_NUM_TRIALS = 5
+
+
+def main() -> None:
+    for mode in ('eager', 'lazy'):
+        elapsed = []
+        for _ in range(_NUM_TRIALS):
+            proc = subprocess.run(
+                [sys.executable, '-c', _SCRIPT, mode], cwd=_path.ROOT,
+                capture_output=True, text=True, check=True)
+            elapsed.append(float(proc.stdout))
+        elapsed.sort()
+        print(f'{mode:5}: time to first message:'
+              f' {elapsed[len(elapsed) // 2] * 1000.0:8.2f} ms (median)')
+
+
+if __name__ == '__main__':
+    main()
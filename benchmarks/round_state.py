@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import re
+import time
+import random
+import _path
+from majsoul_rpa.presentation.match.state import (MatchState, RoundState)
+
+
+# `RoundState` の自摸・打牌の処理について，手牌を文字列のリストで持ち
+# 正規表現で理牌していた旧実装と手牌の並びが一致することを確かめ，
+# 1イベントあたりの処理時間を計測する．牌山は赤5を含む136枚をシャッフルして
+# 作り，自分（親）は自摸牌か手牌からランダムに打牌する．
+
+
+_ROUNDS = 2000
+
+
+def _make_wall(rng: random.Random) -> list:
+    wall = []
+    for c in 'mps':
+        for n in range(1, 10):
+            if n == 5:
+                wall += ['0' + c] + ['5' + c] * 3
+            else:
+                wall += [f'{n}{c}'] * 4
+    for n in range(1, 8):
+        wall += [f'{n}z'] * 4
+    rng.shuffle(wall)
+    return wall
+
+
+def _lipai_reference(shoupai: list) -> list:
+    shoupai = [re.sub("^([1-9])([mpsz])$", "\\2\\1@", t) for t in shoupai]
+    shoupai = [re.sub("^0([mps])$", "\\g<1>5!", t) for t in shoupai]
+    shoupai.sort()
+    shoupai = [re.sub("^([mps])5!$", "0\\1", t) for t in shoupai]
+    return [re.sub("^([mpsz])([1-9])@$", "\\2\\1", t) for t in shoupai]
+
+
+def _make_round(seed: int) -> tuple:
+    # 1局分のイベント列と，各打牌の後に期待される手牌を作る．
+    rng = random.Random(seed)
+    wall = _make_wall(rng)
+    tiles = wall[:14]
+    wall = wall[14:]
+    new_round = {
+        'chang': 0, 'ju': 0, 'ben': 0, 'liqibang': 0, 'doras': [wall.pop()],
+        'left_tile_count': 69, 'scores': [25000] * 4, 'tiles': tiles}
+
+    events = []
+    shoupai = list(tiles[:13])
+    zimopai = tiles[13]
+    seat = 0
+    first = True
+    while len(wall) > 14:
+        if not first:
+            tile = wall.pop()
+            events.append(('zimo', {
+                'seat': seat, 'tile': tile if seat == 0 else '', 'doras': [],
+                'left_tile_count': len(wall) - 14}, None))
+            if seat == 0:
+                zimopai = tile
+        first = False
+
+        if seat == 0:
+            index = rng.randrange(len(shoupai) + 1)
+            if index == len(shoupai):
+                tile = zimopai
+                moqie = True
+            else:
+                tile = shoupai.pop(index)
+                shoupai = _lipai_reference(shoupai + [zimopai])
+                moqie = False
+            zimopai = None
+        else:
+            tile = wall.pop()
+            moqie = True
+        events.append(('dapai', {
+            'seat': seat, 'tile': tile, 'moqie': moqie, 'doras': [],
+            'is_liqi': False, 'is_wliqi': False}, list(shoupai)))
+        seat = (seat + 1) % 4
+
+    return (new_round, events)
+
+
+def _run_reference(new_round: dict, events: list) -> None:
+    # 旧実装の自分の手牌の処理だけを抜き出したもの．
+    shoupai = list(new_round['tiles'][:13])
+    zimopai = new_round['tiles'][13]
+    for type_, data, _ in events:
+        if data['seat'] != 0:
+            continue
+        if type_ == 'zimo':
+            zimopai = data['tile']
+        elif data['moqie']:
+            zimopai = None
+        else:
+            for i, tile in enumerate(shoupai):
+                if tile == data['tile']:
+                    break
+            shoupai.pop(i)
+            shoupai.append(zimopai)
+            zimopai = None
+            shoupai = _lipai_reference(shoupai)
+
+
+def _run(match_state: MatchState, new_round: dict, events: list) -> RoundState:
+    round_state = RoundState(match_state, new_round)
+    for type_, data, _ in events:
+        if type_ == 'zimo':
+            round_state._on_zimo(data)
+        else:
+            round_state._on_dapai(data)
+    return round_state
+
+
+def main() -> None:
+    match_state = MatchState()
+    match_state._set_seat(0)
+    rounds = [_make_round(seed) for seed in range(_ROUNDS)]
+
+    parity = 'O.K.'
+    for new_round, events in rounds:
+        round_state = RoundState(match_state, new_round)
+        for type_, data, expected in events:
+            if type_ == 'zimo':
+                round_state._on_zimo(data)
+                continue
+            round_state._on_dapai(data)
+            if data['seat'] == 0 and round_state.shoupai != expected:
+                parity = 'NG: differs from the reference'
+        if round_state.he[0] == round_state.he[1]:
+            parity = 'NG: rivers are shared between seats'
+
+    num_events = sum(len(events) for _, events in rounds)
+
+    start = time.perf_counter()
+    for new_round, events in rounds:
+        _run_reference(new_round, events)
+    reference = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for new_round, events in rounds:
+        _run(match_state, new_round, events)
+    current = time.perf_counter() - start
+
+    print(f'{_ROUNDS} rounds, {num_events} events:'
+          f' reference {reference / num_events * 1000000.0:8.2f} us/event,'
+          f' current {current / num_events * 1000000.0:8.2f} us/event'
+          f'  {parity}')
+    if parity != 'O.K.':
+        raise AssertionError(parity)
+
+
+if __name__ == '__main__':
+    main()
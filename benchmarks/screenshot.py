@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import _path
+from majsoul_rpa._impl import (
+    BrowserBase, DesktopBrowser, RemoteBrowser, Frame, Template)
+
+
+# スクリーンショットの取得からテンプレート照合までを1フレームとして，
+# PNG を経由する従来の経路と BGR 形式の画素を直接受け取る経路の
+# フレームレートを計測する．
+#
+# 使い方:
+#   desktop <proxy port>  ... sniffer コンテナを起動した上で実行する．
+#   remote [<redis port>] ... headless ブラウザのコンテナを起動した上で実行する．
+
+
+_NUM_FRAMES = 30
+
+
+def _measure(browser: BrowserBase, template: Template, raw: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(_NUM_FRAMES):
+        if raw:
+            screenshot = Frame(browser.get_raw_screenshot())
+        else:
+            screenshot = Frame(browser.get_screenshot())
+        template.best_template_match(screenshot)
+    return _NUM_FRAMES / (time.perf_counter() - start)
+
+
+def main() -> None:
+    if len(sys.argv) < 2 or sys.argv[1] not in ('desktop', 'remote'):
+        raise RuntimeError(
+            f'Usage: {sys.argv[0]} (desktop <proxy port>|remote [<redis port>])')
+
+    if sys.argv[1] == 'desktop':
+        browser = DesktopBrowser(int(sys.argv[2]))
+    else:
+        port = int(sys.argv[2]) if len(sys.argv) >= 3 else None
+        browser = RemoteBrowser(port)
+    try:
+        time.sleep(10.0)
+        browser.fullscreen()
+        time.sleep(1.0)
+
+        template = Template.open('template/login/marker')
+        # 初回は接続の確立などを含むので計測から外す．
+        browser.get_screenshot()
+        browser.get_raw_screenshot()
+
+        png = _measure(browser, template, False)
+        raw = _measure(browser, template, True)
+        print(f'{sys.argv[1]}: png: {png:6.2f} fps  raw: {raw:6.2f} fps')
+    finally:
+        browser.close()
+
+
+if __name__ == '__main__':
+    main()
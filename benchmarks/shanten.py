@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import time
+import random
+import _path
+from majsoul_rpa.presentation.match.tile import (NUM_TILE_KINDS, KIND_TILES)
+from majsoul_rpa.presentation.match.shanten import (
+    calculate_shanten, TileEfficiency)
+
+
+# 向聴数の計算について，面子・搭子の分解を全て試す素朴な実装と結果が
+# 一致することを確かめ，1秒あたりの評価回数を計測する．打牌の候補の評価は
+# 14枚の手牌について全ての打牌候補の向聴数と受け入れを求めるもので，
+# ボットが1巡ごとに行う処理に相当する．
+
+
+_HANDS = 2000
+
+
+def _shanten_reference(counts: list, num_fulu: int) -> int:
+    counts = list(counts)
+    num_mentsu = 4 - num_fulu
+    best = [8]
+
+    def search(i: int, m: int, t: int, p: int) -> None:
+        while i < NUM_TILE_KINDS and counts[i] == 0:
+            i += 1
+        if i >= NUM_TILE_KINDS:
+            m = min(m, num_mentsu)
+            t = min(t, num_mentsu - m)
+            best[0] = min(best[0], 2 * num_mentsu - 2 * m - t - p)
+            return
+        shuntsu = i < 27 and i % 9 <= 6
+        kanchan = i < 27 and i % 9 <= 7
+        if counts[i] >= 3:
+            counts[i] -= 3
+            search(i, m + 1, t, p)
+            counts[i] += 3
+        if shuntsu and counts[i + 1] > 0 and counts[i + 2] > 0:
+            for j in (i, i + 1, i + 2):
+                counts[j] -= 1
+            search(i, m + 1, t, p)
+            for j in (i, i + 1, i + 2):
+                counts[j] += 1
+        if counts[i] >= 2:
+            counts[i] -= 2
+            if p == 0:
+                search(i, m, t, 1)
+            search(i, m, t + 1, p)
+            counts[i] += 2
+        for d in ((1,) if kanchan else ()) + ((2,) if shuntsu else ()):
+            if counts[i + d] > 0:
+                counts[i] -= 1
+                counts[i + d] -= 1
+                search(i, m, t + 1, p)
+                counts[i] += 1
+                counts[i + d] += 1
+        counts[i] -= 1
+        search(i, m, t, p)
+        counts[i] += 1
+
+    search(0, 0, 0, 0)
+    shanten = best[0]
+    if num_fulu == 0:
+        yaojiu = (0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33)
+        pairs = sum(1 for c in counts if c >= 2)
+        kinds = sum(1 for c in counts if c >= 1)
+        shanten = min(shanten, 6 - pairs + max(0, 7 - kinds))
+        shanten = min(
+            shanten, 13 - sum(1 for k in yaojiu if counts[k] > 0)
+            - (1 if any(counts[k] >= 2 for k in yaojiu) else 0))
+    return shanten
+
+
+def _make_hands(rng: random.Random) -> list:
+    hands = []
+    for i in range(_HANDS):
+        num_fulu = rng.choice((0, 0, 0, 1, 2))
+        wall = [k for k in range(NUM_TILE_KINDS) for _ in range(4)]
+        if i % 2 == 1:
+            # 染め手のように1つの色に偏った手牌．
+            wall = wall[:36] + rng.sample(wall[36:], 24)
+        hand = rng.sample(wall, 3 * (4 - num_fulu) + 2)
+        counts = [0] * NUM_TILE_KINDS
+        for kind in hand:
+            counts[kind] += 1
+        hands.append((counts, num_fulu))
+    return hands
+
+
+def _make_efficiency(counts: list, num_fulu: int) -> TileEfficiency:
+    efficiency = TileEfficiency()
+    for kind, count in enumerate(counts):
+        for _ in range(count):
+            efficiency._add_hand(KIND_TILES[kind][-1])
+    for _ in range(num_fulu):
+        efficiency._add_fulu()
+    return efficiency
+
+
+def main() -> None:
+    rng = random.Random(0)
+    hands = _make_hands(rng)
+
+    parity = 'O.K.'
+    for counts, num_fulu in hands:
+        if calculate_shanten(counts, num_fulu) != _shanten_reference(
+                counts, num_fulu):
+            parity = 'NG: shanten differs from the reference'
+        # 打牌候補ごとの受け入れを，1枚ずつ足して数え直した結果と比べる．
+        efficiency = _make_efficiency(counts, num_fulu)
+        discard = efficiency.evaluate_discards()[0]
+        hand = list(counts)
+        hand[discard.kind] -= 1
+        shanten = calculate_shanten(hand, num_fulu)
+        ukeire = 0
+        for kind in range(NUM_TILE_KINDS):
+            if hand[kind] >= 4:
+                continue
+            hand[kind] += 1
+            if calculate_shanten(hand, num_fulu) < shanten:
+                ukeire += 4 - counts[kind]
+            hand[kind] -= 1
+        if discard.shanten != shanten or discard.ukeire != ukeire:
+            parity = 'NG: ukeire differs from the reference'
+
+    start = time.perf_counter()
+    for counts, num_fulu in hands:
+        _shanten_reference(counts, num_fulu)
+    reference = (time.perf_counter() - start) / len(hands)
+
+    start = time.perf_counter()
+    for counts, num_fulu in hands:
+        calculate_shanten(counts, num_fulu)
+    current = (time.perf_counter() - start) / len(hands)
+
+    print(f'shanten          : reference {1.0 / reference:10.0f} /s,'
+          f' current {1.0 / current:10.0f} /s  {parity}')
+    if parity != 'O.K.':
+        raise AssertionError(parity)
+
+    efficiencies = [_make_efficiency(c, n) for c, n in hands]
+    start = time.perf_counter()
+    for efficiency in efficiencies:
+        efficiency.evaluate_discards()
+    elapsed = (time.perf_counter() - start) / len(hands)
+    print(f'evaluate_discards: {1.0 / elapsed:10.0f} /s'
+          f' ({elapsed * 1000.0:.2f} ms per 14-tile hand)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import _path
+from majsoul_rpa import RPA
+from majsoul_rpa.pool import ContainerPool
+
+
+# ヘッドレスモードの `RPA` の開始にかかる時間を，毎回コンテナを起動する
+# 場合と `ContainerPool` から起動済みのコンテナを借りる場合とで比較する．
+# Docker とコンテナのイメージ，ゲームのサーバへの接続が必要．プールの
+# 大きさはセッションの数より大きくしておき，入れ替え中のコンテナを
+# 待たないようにする．
+#
+# 使い方: startup.py [<number of sessions> [<redis port>]]
+
+
+def _measure(make_rpa) -> float:
+    start = time.perf_counter()
+    with make_rpa() as rpa:
+        elapsed = time.perf_counter() - start
+    return elapsed
+
+
+def main() -> None:
+    num_sessions = int(sys.argv[1]) if len(sys.argv) >= 2 else 3
+    redis_port = int(sys.argv[2]) if len(sys.argv) >= 3 else None
+
+    for i in range(num_sessions):
+        elapsed = _measure(lambda: RPA(None, redis_port))
+        print(f'cold   #{i}: {elapsed:8.2f} s')
+
+    with ContainerPool(num_sessions + 1, redis_port) as pool:
+        for i in range(num_sessions):
+            elapsed = _measure(lambda: RPA(None, pool=pool))
+            print(f'pooled #{i}: {elapsed:8.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+from pathlib import Path
+from typing import (Optional, Callable,)
+import numpy
+import cv2
+import google.protobuf
+import _path
+from majsoul_rpa import (_DEFAULT_IGNORED_MESSAGES, RPA)
+from majsoul_rpa._impl import (
+    mahjongsoul_pb2, Frame, Template, ReplayClock, ReplayRedis)
+from majsoul_rpa._impl.redis import _decode_record
+from majsoul_rpa._impl.replay import read_archive
+from majsoul_rpa.presentation.match._common import parse_action
+from majsoul_rpa.presentation.match.state import (MatchState, RoundState)
+from majsoul_rpa.replay import Replay
+from make_fixtures import (FIXTURE_NAMES, paste_template, write_fixtures)
+
+
+# プレゼンテーションの処理全体のベンチマーク．乱数の種を固定して
+# 作った記録（ `benchmarks/make_fixtures.py` を参照）だけを使い， Docker や
+# ブラウザ無しで動く．記録が無ければ最初に作る．結果は JSON で出力する
+# ので，コミット間で比べられる（ `benchmarks/compare.py` を参照）．
+# リポジトリのルートで実行する．
+#
+#   python benchmarks/suite.py [output.json]
+#
+# 時間はいずれも `_REPEAT` 回計測した中央値．テンプレートが貼り付けた
+# 画面で一致しない，または読み込み中の画面で一致した場合や，
+# プレゼンテーションが検出されなかった場合は，結果を出力した後に
+# 終了ステータス 1 で終わる．
+#
+#   template_match: テンプレートごとの照合時間．読み込み中の画面
+#                   （ miss ）と，その画面にテンプレートを貼り付けた画面
+#                   （ hit ）それぞれに対する `best_template_match`
+#   dequeue_message: メッセージの種類ごとの `dequeue_message` の
+#                   スループット．記録を再生する `ReplayRedis` は
+#                   `Redis` と同じデコード処理を通る． `lazy` は
+#                   取り出すだけ，そうでないものは辞書への変換まで
+#   parse_action: アクションの名前ごとの `parse_action` と辞書への変換
+#   round_state: 1局分のアクションを `RoundState` に適用する時間
+#   presentation: 記録した画面が最初に取得されてから `RPA.wait` が
+#                   プレゼンテーションを返すまでの時間
+
+
+_FIXTURES = Path(__file__).parent / 'fixtures'
+_REPEAT = 5
+_MESSAGE_REPEAT = 20
+# 記録を最後まで読み出すための `dequeue_message` のタイムアウト．再生中は
+# 実際には待たない．
+_DEQUEUE_TIMEOUT = 3600.0
+_PRESENTATIONS = (
+    ('login', 'LoginPresentation'),
+    ('auth', 'AuthPresentation'),
+    ('home', 'HomePresentation'),
+)
+
+
+def _summarize(samples: list, count: int=1) -> dict:
+    # `count` 件を処理する時間の標本から，1件あたりの時間 [us] を求める．
+    samples = [s / count * 1000000.0 for s in samples]
+    return {
+        'median_us': round(statistics.median(samples), 3),
+        'min_us': round(min(samples), 3),
+    }
+
+
+def _measure(
+    func: Callable[[], None], repeat: int,
+    setup: Optional[Callable[[], None]]=None) -> list:
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _message_name(record: bytes) -> str:
+    _, request, _, _ = _decode_record(record)
+    wrapper = mahjongsoul_pb2.Wrapper()
+    wrapper.ParseFromString(request[1:] if request[0] == 1 else request[3:])
+    return wrapper.name
+
+
+def _message_family(name: str) -> str:
+    if name in _DEFAULT_IGNORED_MESSAGES:
+        return 'ignored'
+    if name == '.lq.ActionPrototype':
+        return 'action'
+    if name.startswith('.lq.Notify'):
+        return 'notify'
+    if name.startswith('.lq.Lobby.'):
+        return 'lobby'
+    if name.startswith('.lq.FastTest.'):
+        return 'fast_test'
+    return 'other'
+
+
+def _bench_template_match(background: numpy.ndarray) -> dict:
+    results = {}
+    for path in sorted(Path('template').glob('**/*.png')):
+        name = str(path.with_suffix(''))
+        template = Template.open(name)
+        result = {}
+        for case, image in (
+                ('miss', background),
+                ('hit', paste_template(background, name))):
+            # 照合結果のキャッシュを毎回捨てて，照合そのものを計測する．
+            samples = _measure(
+                lambda: template.best_template_match(Frame(image)),
+                _REPEAT, template.clear_cache)
+            _, _, score = template.best_template_match(Frame(image))
+            result[case] = dict(
+                _summarize(samples), score=round(float(score), 4),
+                matched=bool(score >= template.threshold))
+        results[name] = result
+    return results
+
+
+def _bench_dequeue_message(messages: list) -> dict:
+    families = {}
+    for timestamp, record in messages:
+        family = _message_family(_message_name(record))
+        families.setdefault(family, []).append((timestamp, record))
+
+    results = {}
+    for family, records in sorted(families.items()):
+        def dequeue_all(decode: bool) -> None:
+            redis = ReplayRedis(
+                records, ReplayClock(records[0][0]),
+                ignored_names=_DEFAULT_IGNORED_MESSAGES)
+            while True:
+                message = redis.dequeue_message(_DEQUEUE_TIMEOUT)
+                if message is None:
+                    break
+                if decode:
+                    _, _, request, response, _ = message
+                    request.to_dict()
+                    if response is not None:
+                        response.to_dict()
+
+        result = {'messages': len(records)}
+        for case, decode in (('lazy', False), ('decoded', True)):
+            samples = _measure(lambda: dequeue_all(decode), _MESSAGE_REPEAT)
+            summary = _summarize(samples, len(records))
+            summary['messages_per_second'] = round(
+                1000000.0 / summary['median_us'])
+            result[case] = summary
+        results[family] = result
+    return results
+
+
+def _load_actions(messages: list) -> list:
+    # 記録中の `.lq.ActionPrototype` の中身を，プレゼンテーションが
+    # `parse_action` に渡すのと同じ辞書にして返す．
+    redis = ReplayRedis(
+        messages, ReplayClock(messages[0][0]),
+        ignored_names=_DEFAULT_IGNORED_MESSAGES)
+    actions = []
+    while True:
+        message = redis.dequeue_message(_DEQUEUE_TIMEOUT)
+        if message is None:
+            break
+        _, name, request, _, _ = message
+        if name == '.lq.ActionPrototype':
+            actions.append(request.to_dict())
+    return actions
+
+
+def _bench_parse_action(actions: list) -> dict:
+    groups = {'all': actions}
+    for action in actions:
+        groups.setdefault(action['name'], []).append(action)
+
+    def parse_all(group: list) -> None:
+        for action in group:
+            _, _, data = parse_action(action)
+            data.to_dict()
+
+    results = {}
+    for name, group in sorted(groups.items()):
+        samples = _measure(lambda: parse_all(group), _MESSAGE_REPEAT)
+        results[name] = dict(
+            _summarize(samples, len(group)), actions=len(group))
+    return results
+
+
+def _bench_round_state(actions: list) -> dict:
+    # 各局の `ActionNewRound` とそれに続くアクションの列．
+    rounds = []
+    for action in actions:
+        _, name, data = parse_action(action)
+        data = data.to_dict()
+        if name == 'ActionNewRound':
+            rounds.append((data, []))
+        elif len(rounds) > 0:
+            rounds[-1][1].append((name, data))
+    match_state = MatchState()
+    match_state._set_seat(0)
+
+    def run() -> None:
+        for new_round, events in rounds:
+            round_state = RoundState(match_state, new_round)
+            for name, data in events:
+                if name == 'ActionDealTile':
+                    round_state._on_zimo(data)
+                elif name == 'ActionDiscardTile':
+                    round_state._on_dapai(data)
+                elif name == 'ActionChiPengGang':
+                    round_state._on_chipenggang(data)
+                elif name == 'ActionAnGangAddGang':
+                    round_state._on_angang_jiagang(data)
+
+    num_events = sum(len(events) + 1 for _, events in rounds)
+    samples = _measure(run, _MESSAGE_REPEAT)
+    return dict(
+        _summarize(samples, num_events), rounds=len(rounds), events=num_events)
+
+
+def _bench_presentation(name: str, expected: str) -> dict:
+    path = _FIXTURES / f'{name}.mrrp'
+    _, frames = read_archive(path)
+    # 最後に記録された画面でプレゼンテーションが検出される．
+    target = frames[-1][0]
+
+    def run() -> dict:
+        replay = Replay(path)
+        clock = replay.clock
+        delivered = []
+
+        def on_frame(image) -> None:
+            if len(delivered) == 0 and clock.now() >= target:
+                delivered.append(time.perf_counter())
+
+        with RPA(None, replay=replay) as rpa:
+            rpa._get_browser()._set_frame_hook(on_frame)
+            start = time.perf_counter()
+            presentation = rpa.wait(60.0)
+            end = time.perf_counter()
+        if type(presentation).__name__ != expected:
+            raise RuntimeError(
+                f'{name}: {type(presentation).__name__} is detected.')
+        return {'latency': end - delivered[0], 'wait': end - start}
+
+    # 1回目はテンプレートの読み込みを含むので捨てる．
+    run()
+    runs = [run() for _ in range(_REPEAT)]
+    return {
+        'presentation': expected,
+        'latency': _summarize([r['latency'] for r in runs]),
+        'wait': _summarize([r['wait'] for r in runs]),
+    }
+
+
+def _check(results: dict) -> list:
+    # 照合の結果が期待どおりでないテンプレートの一覧．
+    failures = []
+    for name, result in results['template_match'].items():
+        if not result['hit']['matched']:
+            failures.append(f'{name}: Did not match the pasted template.')
+        if result['miss']['matched']:
+            failures.append(f'{name}: Matched the loading screen.')
+    return failures
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True,
+            check=True).stdout.decode('UTF-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': numpy.__version__,
+        'opencv': cv2.__version__,
+        'protobuf': google.protobuf.__version__,
+        'match_backend': Template.get_match_backend(),
+    }
+
+
+def main() -> None:
+    if any(not (_FIXTURES / f'{name}.mrrp').exists()
+           for name in FIXTURE_NAMES):
+        write_fixtures(_FIXTURES)
+    messages, _ = read_archive(_FIXTURES / 'messages.mrrp')
+    _, frames = read_archive(_FIXTURES / 'login.mrrp')
+    background = cv2.imdecode(
+        numpy.frombuffer(frames[0][1], dtype=numpy.uint8), cv2.IMREAD_COLOR)
+    actions = _load_actions(messages)
+
+    results = {
+        'environment': _environment(),
+        'template_match': _bench_template_match(background),
+        'dequeue_message': _bench_dequeue_message(messages),
+        'parse_action': _bench_parse_action(actions),
+        'round_state': _bench_round_state(actions),
+        'presentation': {
+            name: _bench_presentation(name, expected)
+            for name, expected in _PRESENTATIONS},
+    }
+
+    output = json.dumps(results, indent=2)
+    if len(sys.argv) >= 2:
+        with open(sys.argv[1], 'w', encoding='UTF-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    failures = _check(results)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if len(failures) > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+from pathlib import Path
+from typing import (List, Tuple,)
+import numpy
+import PIL.Image
+import cv2
+import _path
+from majsoul_rpa._impl.template import (pil2opencv, Frame, Template)
+
+
+# 照合の実装ごとに，同梱のテンプレートで1秒あたりの照合回数を計測する．
+# 第2引数にスクリーンショット (PNG) のディレクトリを指定するとそれらを
+# 使い，指定しない場合は合成した画像を使う．
+#
+# 使い方: template_backend.py [<template dir> [<screenshot dir>]]
+
+
+_BACKENDS = ('plain', 'umat', 'tiled',)
+_REPEAT = 3
+
+
+def _load_templates(directory: Path) -> List[Tuple[str, Template]]:
+    templates = []
+    for path in sorted(directory.glob('**/*.yaml')):
+        name = str(path.with_suffix(''))
+        templates.append((name, Template.open(name)))
+    for path in sorted(directory.glob('**/*.png')):
+        if path.with_suffix('.yaml').exists():
+            continue
+        name = str(path.with_suffix(''))
+        templates.append((name, Template.open(name)))
+    return templates
+
+
+def _load_screenshots(directory: Path) -> List[numpy.ndarray]:
+    screenshots = []
+    for path in sorted(directory.glob('*.png')):
+        with PIL.Image.open(path) as image:
+            screenshots.append(pil2opencv(image))
+    return screenshots
+
+
+def _make_screenshots() -> List[numpy.ndarray]:
+    rng = numpy.random.default_rng(0)
+    image = rng.integers(0, 256, size=(135, 240, 3), dtype=numpy.uint8)
+    image = cv2.resize(image, (1920, 1080), interpolation=cv2.INTER_CUBIC)
+    return [cv2.GaussianBlur(image, (5, 5), 0)]
+
+
+def main() -> None:
+    template_dir = Path(sys.argv[1] if len(sys.argv) >= 2 else 'template')
+    templates = _load_templates(template_dir)
+    if len(sys.argv) >= 3:
+        screenshots = _load_screenshots(Path(sys.argv[2]))
+    else:
+        screenshots = _make_screenshots()
+    frames = [Frame(s) for s in screenshots]
+
+    print(f'{"template":48}'
+          + ''.join(f' {b + " [/s]":>12}' for b in _BACKENDS) + '  parity')
+    totals = {b: 0.0 for b in _BACKENDS}
+    for name, template in templates:
+        rates = []
+        results = {}
+        for backend in _BACKENDS:
+            Template.set_match_backend(backend)
+            results[backend] = []
+            start = time.perf_counter()
+            for _ in range(_REPEAT):
+                for frame in frames:
+                    # スコアのキャッシュを無効にして毎回照合させる．
+                    template.clear_cache()
+                    results[backend].append(
+                        template.best_template_match(frame))
+            elapsed = time.perf_counter() - start
+            totals[backend] += elapsed
+            rates.append(_REPEAT * len(frames) / elapsed)
+
+        parity = 'O.K.'
+        for backend in _BACKENDS[1:]:
+            for expected, actual in zip(results['plain'], results[backend]):
+                if expected[:2] != actual[:2] \
+                   or abs(expected[2] - actual[2]) > 1.0e-4:
+                    parity = f'{backend}: {expected} != {actual}'
+        print(f'{name:48}' + ''.join(f' {r:12.2f}' for r in rates)
+              + f'  {parity}')
+
+    num_matches = _REPEAT * len(frames) * len(templates)
+    print(f'{"total":48}' + ''.join(
+        f' {num_matches / totals[b]:12.2f}' for b in _BACKENDS))
+    Template.set_match_backend('plain')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import time
+import numpy
+import cv2
+import _path
+from majsoul_rpa._impl.template import (Frame, Template)
+
+
+# 待機中のポーリングを模して，探索領域が変化しないフレームが続く場合と
+# 毎フレーム変化する場合とで，1回の照合にかかる時間とキャッシュの
+# ヒット率を計測する．
+
+
+_NUM_FRAMES = 50
+
+
+def _make_background() -> numpy.ndarray:
+    rng = numpy.random.default_rng(0)
+    image = rng.integers(0, 256, size=(135, 240, 3), dtype=numpy.uint8)
+    image = cv2.resize(image, (1920, 1080), interpolation=cv2.INTER_CUBIC)
+    return cv2.GaussianBlur(image, (5, 5), 0)
+
+
+def _measure(template: Template, frames) -> float:
+    template.clear_cache()
+    start = time.perf_counter()
+    for frame in frames:
+        template.best_template_match(frame)
+    return (time.perf_counter() - start) / len(frames)
+
+
+def main() -> None:
+    base = Template.open('template/room/start')
+    left, top, width, height = base.region
+    template = Template(
+        base.path, left=left, top=top, width=width, height=height,
+        threshold=base.threshold)
+
+    background = _make_background()
+    # 探索領域の外側だけがアニメーションしているフレーム．
+    idle = []
+    for i in range(_NUM_FRAMES):
+        image = background.copy()
+        x = 0 if left >= 64 else left + width
+        image[:32, x:x + 32] = i % 256
+        idle.append(Frame(image))
+    # 探索領域の内側が毎フレーム変化するフレーム．
+    busy = []
+    for i in range(_NUM_FRAMES):
+        image = background.copy()
+        image[top:top + 8, left:left + 8] = i % 256
+        busy.append(Frame(image))
+
+    for name, frames in (('idle', idle), ('busy', busy)):
+        elapsed = _measure(template, frames)
+        hits = template.cache_hits
+        rate = hits / (hits + template.cache_misses)
+        print(f'{name}: {elapsed * 1000.0:8.2f} ms/frame  hit rate: {rate:.2f}')
+
+
+if __name__ == '__main__':
+    main()
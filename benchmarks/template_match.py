@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import sys
+import random
+import time
+from pathlib import Path
+from typing import (Tuple,)
+import numpy
+import PIL.Image
+import cv2
+import _path
+from majsoul_rpa._impl.template import (pil2opencv, _best_match_location)
+
+
+def _reference_best_match_location(
+    image: numpy.ndarray, template: numpy.ndarray) -> Tuple[int, int, float]:
+    # 画素ごとの Python ループによる旧実装．
+    result1: numpy.ndarray = cv2.matchTemplate(
+        image, template, cv2.TM_CCOEFF_NORMED)
+    result2: numpy.ndarray = cv2.matchTemplate(
+        image, template, cv2.TM_SQDIFF_NORMED)
+
+    argmax_x = 0
+    argmax_y = 0
+    max_score = result1[0, 0]
+    for x in range(result1.shape[1]):
+        for y in range(result1.shape[0]):
+            score = max(result1[y, x], 1.0 - result2[y, x])
+            if score > max_score:
+                argmax_x = x
+                argmax_y = y
+                max_score = score
+
+    return (argmax_x, argmax_y, max_score)
+
+
+def _make_image(
+    template: numpy.ndarray, width: int, height: int,
+    rng: random.Random) -> numpy.ndarray:
+    # ノイズ画像の上にテンプレートを貼り付けた画像を作る．
+    image = numpy.random.default_rng(rng.randrange(2 ** 32)).integers(
+        0, 256, size=(height, width, 3), dtype=numpy.uint8)
+    x = rng.randrange(width - template.shape[1] + 1)
+    y = rng.randrange(height - template.shape[0] + 1)
+    image[y:y + template.shape[0], x:x + template.shape[1]] = template
+    return image
+
+
+def _check_parity(rng: random.Random) -> None:
+    # 一様な画像のように最大スコアを取る位置が多数ある場合も含めて，
+    # 旧実装と同じ位置を返すことを確認する．
+    cases = []
+    for _ in range(20):
+        template = numpy.random.default_rng(rng.randrange(2 ** 32)).integers(
+            0, 256, size=(rng.randint(1, 12), rng.randint(1, 12), 3),
+            dtype=numpy.uint8)
+        image = _make_image(
+            template, rng.randint(template.shape[1], 48),
+            rng.randint(template.shape[0], 48), rng)
+        cases.append((image, template))
+    for value in (0, 128, 255):
+        image = numpy.full((20, 30, 3), value, dtype=numpy.uint8)
+        template = numpy.full((5, 7, 3), value, dtype=numpy.uint8)
+        cases.append((image, template))
+    image = numpy.zeros((24, 24, 3), dtype=numpy.uint8)
+    image[::6, ::6] = 255
+    template = numpy.zeros((3, 3, 3), dtype=numpy.uint8)
+    template[0, 0] = 255
+    cases.append((image, template))
+
+    for image, template in cases:
+        expected = _reference_best_match_location(image, template)
+        actual = _best_match_location(image, template)
+        if expected[:2] != actual[:2] \
+           or abs(float(expected[2]) - actual[2]) > 1.0e-6:
+            raise AssertionError(f'{expected} != {actual}')
+
+
+def _measure(func, *args, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    rng = random.Random(0)
+
+    _check_parity(rng)
+    print('parity: O.K.')
+
+    template_dir = Path(sys.argv[1] if len(sys.argv) >= 2 else 'template')
+    for path in sorted(template_dir.glob('**/*.png')):
+        with PIL.Image.open(path) as template:
+            template = pil2opencv(template)
+        for width, height in ((240, 135), (1920, 1080)):
+            if width < template.shape[1] or height < template.shape[0]:
+                continue
+            image = _make_image(template, width, height, rng)
+            new = _measure(_best_match_location, image, template, repeat=5)
+            if width * height <= 240 * 135:
+                old = _measure(
+                    _reference_best_match_location, image, template, repeat=1)
+                old = f'{old * 1000.0:10.2f} ms'
+            else:
+                # 旧実装はフルスクリーンでは遅すぎるので計測しない．
+                old = f'{"-":>10} ms'
+            print(f'{str(path):48} {width:4}x{height:<4}'
+                  f' old: {old}  new: {new * 1000.0:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
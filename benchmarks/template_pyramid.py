@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import sys
+import random
+import time
+from pathlib import Path
+from typing import (List, Tuple,)
+import numpy
+import cv2
+import _path
+from majsoul_rpa._impl.template import (Frame, Template)
+
+
+# ノイズ画像の上にテンプレートを貼り付けた画像を作り，
+# `pyramid_levels` ごとに位置の正解率とレイテンシを計測する．
+
+
+_LEVELS = (0, 1, 2, 3)
+_NUM_TRIALS = 5
+
+
+def _load_templates(directory: Path) -> List[Tuple[str, Template]]:
+    templates = []
+    for path in sorted(directory.glob('**/*.yaml')):
+        name = str(path.with_suffix(''))
+        templates.append((name, Template.open(name)))
+    for path in sorted(directory.glob('**/*.png')):
+        if path.with_suffix('.yaml').exists():
+            continue
+        name = str(path.with_suffix(''))
+        templates.append((name, Template.open(name)))
+    return templates
+
+
+def _make_background(rng: numpy.random.Generator) -> numpy.ndarray:
+    # 一様なノイズではなく，ゲーム画面に近い滑らかな背景にする．
+    image = rng.integers(0, 256, size=(135, 240, 3), dtype=numpy.uint8)
+    image = cv2.resize(image, (1920, 1080), interpolation=cv2.INTER_CUBIC)
+    return cv2.GaussianBlur(image, (5, 5), 0)
+
+
+def _paste(
+    image: numpy.ndarray, template: numpy.ndarray, x: int, y: int) -> None:
+    height, width = template.shape[:2]
+    image[y:y + height, x:x + width] = template
+
+
+def main() -> None:
+    directory = Path(sys.argv[1] if len(sys.argv) >= 2 else 'template')
+    templates = _load_templates(directory)
+    rng = numpy.random.default_rng(0)
+    py_rng = random.Random(0)
+
+    print(f'{"template":48} {"level":>5} {"latency":>10} {"accuracy":>8}')
+    for name, base in templates:
+        template = base.image
+        left, top, width, height = base.region
+        if template.shape[1] > width or template.shape[0] > height:
+            continue
+
+        # 正解位置と画像の組を作る．他のテンプレートを紛らわしい物体
+        # として貼り付けておく．
+        others = [t for n, t in templates if n != name]
+        cases = []
+        for _ in range(_NUM_TRIALS):
+            image = _make_background(rng)
+            for other in py_rng.sample(others, min(8, len(others))):
+                other = other.image
+                _paste(
+                    image, other, py_rng.randrange(1920 - other.shape[1] + 1),
+                    py_rng.randrange(1080 - other.shape[0] + 1))
+            x = left + py_rng.randrange(width - template.shape[1] + 1)
+            y = top + py_rng.randrange(height - template.shape[0] + 1)
+            _paste(image, template, x, y)
+            cases.append(((x, y), image))
+
+        # 元の解像度での探索と同じ正解率を保つ最大の段数を推奨値とする．
+        best_level = 0
+        base_accuracy = None
+        for level in _LEVELS:
+            candidate = Template(
+                base.path, left=left, top=top, width=width, height=height,
+                threshold=base.threshold, pyramid_levels=level)
+            elapsed = 0.0
+            num_hits = 0
+            for expected, image in cases:
+                # スクリーンショットの縮小はテンプレート間で共有されるので，
+                # 計測に含めない．
+                frame = Frame(image)
+                frame.pyramid(level)
+                start = time.perf_counter()
+                x, y, score = candidate.best_template_match(frame)
+                elapsed += time.perf_counter() - start
+                if (x, y) == expected and score >= candidate.threshold:
+                    num_hits += 1
+            accuracy = num_hits / len(cases)
+            if base_accuracy is None:
+                base_accuracy = accuracy
+            if accuracy >= base_accuracy:
+                best_level = level
+            print(f'{name:48} {level:5} {elapsed / len(cases) * 1000.0:7.2f} ms'
+                  f' {accuracy:8.2f}')
+        print(f'{name:48} suggested `pyramid_levels: {best_level}`')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 
 from io import BytesIO
+import os
 import time
 import subprocess
 import json
 import base64
+import struct
+import threading
+import queue
+import traceback
+from typing import (Optional, Tuple,)
 import redis
 import PIL.Image
 from selenium.webdriver.chrome.options import Options
@@ -90,51 +96,212 @@ _KEY_MAP = {
 }
 
 
-def main(driver) -> None:
+# `majsoul_rpa/_impl/browser.py` と同じバイナリ形式．コンテナ内からは
+# `majsoul_rpa` を参照できないので，ここにも同じ定義を置く．
+#
+#   magic (4 bytes) | version (1 byte) | header length (4 bytes)
+#   | payload length (4 bytes) | header (JSON) | payload (raw bytes)
+_MAGIC = b'MRPC'
+_VERSION = 1
+_PREFIX = struct.Struct('!4sBII')
+
+
+def _encode_message(header: dict, payload: bytes=b'') -> bytes:
+    header = json.dumps(header, separators=(',', ':')).encode('UTF-8')
+    prefix = _PREFIX.pack(_MAGIC, _VERSION, len(header), len(payload))
+    return b''.join((prefix, header, payload))
+
+
+def _decode_message(data: bytes) -> Tuple[dict, bytes]:
+    magic, version, header_length, payload_length \
+        = _PREFIX.unpack_from(data)
+    if magic != _MAGIC:
+        raise RuntimeError('An invalid message.')
+    if version != _VERSION:
+        raise RuntimeError(f'{version}: An unsupported version.')
+    offset = _PREFIX.size
+    header = json.loads(data[offset:offset + header_length].decode('UTF-8'))
+    offset += header_length
+    payload = data[offset:offset + payload_length]
+    if len(payload) != payload_length:
+        raise RuntimeError('A truncated message.')
+    return (header, payload)
+
+
+def _capture_screenshot(driver, driver_lock) -> PIL.Image.Image:
+    # `get_screenshot_as_png` よりも速度を優先した設定でキャプチャする．
+    # デコードはロックの外で行い，入力操作を待たせない．
+    with driver_lock:
+        result = driver.execute_cdp_cmd(
+            'Page.captureScreenshot',
+            {'format': 'png', 'optimizeForSpeed': True})
+    data = base64.b64decode(result['data'])
+    image = PIL.Image.open(BytesIO(data))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def _session_key(name: str, session: Optional[str]) -> str:
+    # 複数のセッションで1つの Redis を共有する場合に，キーにセッションの
+    # 名前を付けて名前空間を分ける． `majsoul_rpa/_impl/redis.py` にも
+    # 同じ定義がある．
+    if session is None:
+        return name
+    return f'{name}:{session}'
+
+
+def _wait_for_ready(
+    redis_: redis.Redis, key: str, timeout: float) -> bool:
+    # 準備ができたことを知らせるリストを待つ．要素は同じリストに戻す．
+    # Redis のコンテナが起動途中の場合は接続できるまで待つ．
+    # `majsoul_rpa/_impl/redis.py` にも同じ処理がある．
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0.0:
+            return False
+        try:
+            result = redis_.blmove(key, key, remaining, 'RIGHT', 'LEFT')
+            return result is not None
+        except redis.ConnectionError:
+            time.sleep(0.1)
+
+
+# 入力操作とは別のスレッドで処理する要求．画素データをそのまま送る
+# `get_raw_screenshot` はバイナリ形式の要求でだけ受け付け，これも別の
+# スレッドで処理する．
+_CAPTURE_TYPES = ('get_screenshot',)
+
+# 要求 ID ごとの応答が読まれずに残った場合に消えるまでの秒数．
+_RESPONSE_EXPIRATION = 60
+
+
+def main(driver, redis_: redis.Redis, session: Optional[str]) -> None:
     driver.get('https://game.mahjongsoul.com/')
     canvas = WebDriverWait(driver, 60).until(
         ec.visibility_of_element_located((By.ID, 'layaCanvas')))
-    redis_ = redis.Redis('redis')
 
-    def respond(message) -> None:
-        message = json.dumps(message, separators=(',', ':'))
-        message = message.encode('UTF-8')
-        redis_.lpush('browser_response', message)
+    # ゲーム画面が表示されたら準備ができたことを知らせる．
+    redis_.rpush(_session_key('browser_ready', session), 1)
+
+    request_key = _session_key('browser_request', session)
+    response_key = _session_key('browser_response', session)
+
+    # WebDriver は複数のスレッドから同時に操作できないので，
+    # WebDriver の呼び出しだけをこのロックで直列化する．
+    driver_lock = threading.Lock()
+
+    # 要求と同じ形式で応答する．旧来の JSON 形式のクライアントも
+    # 移行期間中は引き続き使えるようにしておく．要求 ID を持つ要求には
+    # その ID 専用のキーに応答する．
+    def respond(
+        binary: bool, request: dict, message: dict,
+        payload: bytes=b'') -> None:
+        if binary:
+            message = _encode_message(message, payload)
+        else:
+            message = json.dumps(message, separators=(',', ':'))
+            message = message.encode('UTF-8')
+        if 'id' in request:
+            key = f'{response_key}:{request["id"]}'
+            with redis_.pipeline() as pipeline:
+                pipeline.lpush(key, message)
+                pipeline.expire(key, _RESPONSE_EXPIRATION)
+                pipeline.execute()
+        else:
+            redis_.lpush(response_key, message)
+
+    def capture(binary: bool, message: dict) -> None:
+        if message['type'] == 'get_screenshot':
+            with driver_lock:
+                data = driver.get_screenshot_as_png()
+            if binary:
+                response = {'result': 'O.K.'}
+                respond(binary, message, response, data)
+            else:
+                data = base64.b64encode(data)
+                data = data.decode('UTF-8')
+                response = {'result': 'O.K.', 'data': data}
+                respond(binary, message, response)
+        elif message['type'] == 'get_raw_screenshot':
+            # 画素データを BGR 形式のバイト列として送る．
+            image = _capture_screenshot(driver, driver_lock)
+            data = image.tobytes('raw', 'BGR')
+            response = {
+                'result': 'O.K.', 'width': image.width,
+                'height': image.height}
+            respond(binary, message, response, data)
+        else:
+            raise RuntimeError(f'{message["type"]}: An unknown message.')
+
+    # スクリーンショットの取得は専用のスレッドで行い，
+    # 入力操作と並行して処理する．
+    capture_queue = queue.Queue()
+
+    def capture_loop() -> None:
+        # 1つの要求の失敗でスレッドが終わると以降の要求に応答できなく
+        # なるので，失敗はその要求への応答として返す．
+        while True:
+            binary, message = capture_queue.get()
+            try:
+                capture(binary, message)
+            except Exception as e:
+                traceback.print_exc()
+                try:
+                    respond(binary, message, {'result': f'Error: {e}'})
+                except Exception:
+                    traceback.print_exc()
+
+    capture_thread = threading.Thread(target=capture_loop, daemon=True)
+    capture_thread.start()
 
     while True:
-        _, message = redis_.brpop('browser_request')
-        message = message.decode('UTF-8')
-        message = json.loads(message)
+        _, message = redis_.brpop(request_key)
+        binary = message.startswith(_MAGIC)
+        if binary:
+            message, _ = _decode_message(message)
+        else:
+            message = message.decode('UTF-8')
+            message = json.loads(message)
 
-        if message['type'] == 'fullscreen':
-            driver.fullscreen_window()
+        if message['type'] in _CAPTURE_TYPES \
+           or binary and message['type'] == 'get_raw_screenshot':
+            capture_queue.put((binary, message))
+        elif message['type'] == 'fullscreen':
+            with driver_lock:
+                driver.fullscreen_window()
             response = {'result': 'O.K.'}
-            respond(response)
+            respond(binary, message, response)
         elif message['type'] == 'refresh':
-            driver.refresh()
+            with driver_lock:
+                driver.refresh()
             response = {'result': 'O.K.'}
-            respond(response)
+            respond(binary, message, response)
         elif message['type'] == 'write':
             s = message['message']
             interval = message['interval']
             if s != '':
-                ActionChains(driver).send_keys(s[0]).perform()
+                with driver_lock:
+                    ActionChains(driver).send_keys(s[0]).perform()
                 for i in range(1, len(s)):
                     time.sleep(interval)
-                    ActionChains(driver).send_keys(s[i]).perform()
+                    with driver_lock:
+                        ActionChains(driver).send_keys(s[i]).perform()
             response = {'result': 'O.K.'}
-            respond(response)
+            respond(binary, message, response)
         elif message['type'] == 'press':
             keys = message['keys']
-            if isinstance(keys, list):
-                ac = ActionChains(driver)
-                for key in keys:
-                    ac = ac.send_keys(_KEY_MAP[key])
-                ac.perform()
-            else:
-                ActionChains(driver).send_keys(_KEY_MAP[keys]).perform()
+            with driver_lock:
+                if isinstance(keys, list):
+                    ac = ActionChains(driver)
+                    for key in keys:
+                        ac = ac.send_keys(_KEY_MAP[key])
+                    ac.perform()
+                else:
+                    ActionChains(driver).send_keys(_KEY_MAP[keys]).perform()
             response = {'result': 'O.K.'}
-            respond(response)
+            respond(binary, message, response)
         elif message['type'] == 'press_hotkey':
             args = message['args']
             if len(args) > 0:
@@ -145,7 +312,7 @@ def main(driver) -> None:
                 for i in range(len(args) - 1, 0, -1):
                     ac.key_up(_KEY_MAP[args[i - 1]])
             response = {'result': 'O.K.'}
-            respond(response)
+            respond(binary, message, response)
         elif message['type'] == 'move':
             x = message['x']
             y = message['y']
@@ -153,30 +320,26 @@ def main(driver) -> None:
             ac.move_to_element_with_offset(canvas, x, y)
             ac.perform
             response = {'result': 'O.K.'}
-            respond(response)
+            respond(binary, message, response)
         elif message['type'] == 'scroll':
             clicks = message['clicks']
             response = {'result': 'Error: Not implemented.'}
-            respond(response)
+            respond(binary, message, response)
         elif message['type'] == 'click':
             x = message['x']
             y = message['y']
-            ac = ActionChains(driver)
-            ac.move_to_element_with_offset(canvas, x, y)
-            ac.click()
-            ac.perform()
+            with driver_lock:
+                ac = ActionChains(driver)
+                ac.move_to_element_with_offset(canvas, x, y)
+                ac.click()
+                ac.perform()
             response = {'result': 'O.K.'}
-            respond(response)
-        elif message['type'] == 'get_screenshot':
-            data = driver.get_screenshot_as_png()
-            data = base64.b64encode(data)
-            data = data.decode('UTF-8')
-            response = {'result': 'O.K.', 'data': data}
-            respond(response)
+            respond(binary, message, response)
         elif message['type'] == 'close':
-            driver.close()
+            with driver_lock:
+                driver.close()
             response = {'result': 'O.K.'}
-            respond(response)
+            respond(binary, message, response)
         else:
             raise RuntimeError(f'{message["type"]}: An unknown message.')
 
@@ -184,7 +347,15 @@ def main(driver) -> None:
 if __name__ == '__main__':
     subprocess.Popen(
         ['mitmdump', '-qs', 'sniffer.py'], text=True, encoding='UTF-8')
-    time.sleep(10.0)
+
+    # 決め打ちの時間だけ待つのではなく，スニファがプロキシの準備が
+    # できたことを知らせるのを待つ．オーケストレータの下で動く場合は
+    # セッションの名前が与えられる．
+    redis_ = redis.Redis('redis')
+    session = os.environ.get('MAJSOUL_RPA_SESSION') or None
+    if not _wait_for_ready(
+            redis_, _session_key('sniffer_ready', session), 60.0):
+        raise RuntimeError('The sniffer did not become ready.')
 
     options = Options()
     options.headless = True
@@ -195,4 +366,4 @@ if __name__ == '__main__':
     options.add_argument('--ignore-certificate-errors')
 
     with Chrome(options=options) as driver:
-        main(driver)
+        main(driver, redis_, session)
@@ -3,37 +3,64 @@
 import datetime
 from majsoul_rpa._impl.mahjongsoul_pb2 import Room
 from pathlib import Path
-import time
 import uuid
+import asyncio
 from typing import (Optional, Union, Tuple, Iterable,)
 import yaml
+import numpy
 import docker
 from PIL.Image import Image
 from majsoul_rpa.common import Player
 from majsoul_rpa.presentation.presentation_base import (
     InconsistentMessage, StalePresentation, PresentationBase,
     PresentationNotUpdated, Timeout, PresentationNotDetected)
-from majsoul_rpa._impl import (Redis, BrowserBase, DesktopBrowser, RemoteBrowser)
+from majsoul_rpa._impl import (
+    Redis, AsyncRedis, BrowserBase, DesktopBrowser, RemoteBrowser,
+    AsyncRemoteBrowser, Template)
 
 
-class RPA(object):
+# コンテナの準備ができるのを待つ最大の秒数．ヘッドレスブラウザの場合は
+# ゲーム画面の読み込みを含む．
+_READY_TIMEOUT = 120.0
+
+
+# どのプレゼンテーションでも読み捨てる WebSocket メッセージ．
+_DEFAULT_IGNORED_MESSAGES = (
+    '.lq.Lobby.heatbeat',
+    '.lq.FastTest.checkNetworkDelay',
+)
+
+
+def _sniffer_environment(
+    ignored_messages: Tuple[str, ...], message_transport: str,
+    session: Optional[str]=None) -> dict:
+    # スニファ（とヘッドレスブラウザ）のコンテナに渡す環境変数．読み捨てる
+    # メッセージはスニファの段階で Redis に送らないようにする．
+    environment = {
+        'MAJSOUL_RPA_IGNORED_MESSAGES': ','.join(ignored_messages),
+        'MAJSOUL_RPA_MESSAGE_TRANSPORT': message_transport,
+    }
+    if session is not None:
+        environment['MAJSOUL_RPA_SESSION'] = session
+    return environment
+
+
+class _Containers(object):
+    # ボット1つ分の Docker ネットワークと Redis ・スニファのコンテナ．
     def __init__(
-        self, proxy_port: Optional[int]=8080,
-        redis_port: Optional[int]=None) -> None:
-        # Docker Desktop for Windows でデスクトップモードを動かすと，
-        # Docker Desktop for Windows の制約上， Redis コンテナに
-        # 接続できないので， redis_port を指定して expose する必要がある．
+        self, proxy_port: Optional[int], redis_port: Optional[int],
+        ignored_messages: Tuple[str, ...], message_transport: str) -> None:
         self.__id = uuid.uuid4()
-        self.__redis_port = redis_port
         self.__proxy_port = proxy_port
+        self.__redis_port = redis_port
+        self.__ignored_messages = ignored_messages
+        self.__message_transport = message_transport
         self.__docker_client = None
         self.__docker_network = None
         self.__redis_container = None
         self.__mitmproxy_container = None
-        self.__browser = None
-        self.__redis = None
 
-    def __enter__(self) -> 'RPA':
+    def start(self) -> None:
         # Docker クライアントを取得．
         self.__docker_client = docker.from_env()
 
@@ -53,39 +80,21 @@ class RPA(object):
                 network=network_name, ports={'6379/tcp': self.__redis_port})
 
         # Network sniffering コンテナを走らせる．
+        environment = _sniffer_environment(
+            self.__ignored_messages, self.__message_transport)
         if self.__proxy_port is None:
             self.__mitmproxy_container = self.__docker_client.containers.run(
                 'majsoul-rpa-sniffer-headless', auto_remove=True, detach=True,
-                hostname='sniffer', network=network_name)
+                hostname='sniffer', network=network_name,
+                environment=environment)
         else:
             self.__mitmproxy_container = self.__docker_client.containers.run(
                 'majsoul-rpa-sniffer-desktop', auto_remove=True, detach=True,
                 hostname='sniffer', network=network_name,
-                ports={'8080/tcp': self.__proxy_port})
-
-        # ブラウザ操作を抽象化するクラスインスタンスを構築．
-        if self.__proxy_port is None:
-            self.__browser = RemoteBrowser(self.__redis_port)
-        else:
-            self.__browser = DesktopBrowser(self.__proxy_port)
-
-        # Redis クライアントを抽象化するクラスインスタンスを構築．
-        if self.__redis_port is None:
-            self.__redis = Redis('redis')
-        else:
-            self.__redis = Redis('localhost', self.__redis_port)
-
-        # ブラウザをフルスクリーン化
-        time.sleep(1.0)
-        self.__browser.fullscreen()
+                ports={'8080/tcp': self.__proxy_port},
+                environment=environment)
 
-        return self
-
-    def __exit__(self, exc_type, exc_value, traceback) -> None:
-        self.__redis = None
-        if self.__browser is not None:
-            self.__browser.close()
-            self.__browser = None
+    def stop(self) -> None:
         if self.__mitmproxy_container is not None:
             self.__mitmproxy_container.stop()
             self.__mitmproxy_container = None
@@ -99,6 +108,141 @@ class RPA(object):
             self.__docker_client.close()
             self.__docker_client = None
 
+
+def _get_template_region(
+    name_or_path: Union[str, Path]) -> Tuple[int, int, int, int]:
+    if isinstance(name_or_path, Path):
+        name_or_path = str(name_or_path)
+    if name_or_path.endswith('.yaml'):
+        path = Path(name_or_path)
+    else:
+        path = Path(f'{name_or_path}.yaml')
+    if not path.exists():
+        raise RuntimeError(f'{path}: does not exist.')
+    with open(path) as f:
+        data = yaml.load(f, Loader=yaml.Loader)
+    return (data['left'], data['top'], data['width'], data['height'])
+
+
+class RPA(object):
+    def __init__(
+        self, proxy_port: Optional[int]=8080,
+        redis_port: Optional[int]=None, *,
+        preload_templates: bool=False, capture: bool=False,
+        ignored_messages: Iterable[str]=_DEFAULT_IGNORED_MESSAGES,
+        message_transport: str='list',
+        session: Optional[str]=None, pool=None, replay=None) -> None:
+        # Docker Desktop for Windows でデスクトップモードを動かすと，
+        # Docker Desktop for Windows の制約上， Redis コンテナに
+        # 接続できないので， redis_port を指定して expose する必要がある．
+        #
+        # `session` を指定した場合は自前のコンテナを走らせずに，
+        # 共有の Redis と，そのセッションに割り当てられたヘッドレス
+        # ブラウザを使う． `pool` に `ContainerPool` を指定した場合は，
+        # そこからセッションを借りて，終わったら返す． `replay` に
+        # `majsoul_rpa.replay.Replay` を指定した場合はコンテナを使わずに
+        # 記録を再生する．
+        if len([x for x in (session, pool, replay) if x is not None]) > 1:
+            raise ValueError('`session`, `pool` and `replay` are exclusive.')
+        if (session is not None or pool is not None or replay is not None) \
+           and proxy_port is not None:
+            raise ValueError(
+                '`session`, `pool` and `replay` require the headless mode.')
+        if pool is not None:
+            redis_port = pool.redis_port
+            message_transport = pool.message_transport
+        self.__redis_port = redis_port
+        self.__proxy_port = proxy_port
+        self.__preload_templates = preload_templates
+        self.__capture = capture
+        self.__ignored_messages = tuple(ignored_messages)
+        self.__message_transport = message_transport
+        self.__session = session
+        self.__pool = pool
+        self.__replay = replay
+        self.__containers = None
+        if session is None and pool is None and replay is None:
+            self.__containers = _Containers(
+                proxy_port, redis_port, self.__ignored_messages,
+                message_transport)
+        self.__browser = None
+        self.__redis = None
+
+    def __enter__(self) -> 'RPA':
+        # テンプレート画像をあらかじめ読み込んでおく．
+        if self.__preload_templates:
+            Template.preload()
+
+        try:
+            # Redis とスニファのコンテナを走らせるか，プールから借りる．
+            if self.__pool is not None:
+                self.__session = self.__pool.lease(_READY_TIMEOUT)
+            elif self.__containers is not None:
+                self.__containers.start()
+
+            # Redis クライアントを抽象化するクラスインスタンスを構築．
+            if self.__replay is not None:
+                self.__redis = self.__replay._create_redis(
+                    self.__ignored_messages)
+            elif self.__redis_port is None:
+                self.__redis = Redis(
+                    'redis', ignored_names=self.__ignored_messages,
+                    transport=self.__message_transport,
+                    session=self.__session)
+            else:
+                self.__redis = Redis(
+                    'localhost', self.__redis_port,
+                    ignored_names=self.__ignored_messages,
+                    transport=self.__message_transport,
+                    session=self.__session)
+
+            # 決め打ちの時間だけ待つのではなく，コンテナが準備できたことを
+            # 知らせるのを待つ．ヘッドレスブラウザはスニファの準備ができてから
+            # ゲーム画面を読み込む．
+            if self.__proxy_port is None:
+                if not self.__redis.wait_for_ready(
+                        'browser', _READY_TIMEOUT):
+                    raise RuntimeError(
+                        'The remote browser did not become ready.')
+            elif not self.__redis.wait_for_ready('sniffer', _READY_TIMEOUT):
+                raise RuntimeError('The sniffer did not become ready.')
+
+            # ブラウザ操作を抽象化するクラスインスタンスを構築．
+            if self.__replay is not None:
+                self.__browser = self.__replay._create_browser()
+            elif self.__proxy_port is None:
+                self.__browser = RemoteBrowser(
+                    self.__redis_port, session=self.__session)
+            else:
+                self.__browser = DesktopBrowser(self.__proxy_port)
+
+            # ブラウザをフルスクリーン化
+            self.__browser.fullscreen()
+
+            # スクリーンショットをバックグラウンドで取り続ける．
+            if self.__capture:
+                self.__browser.start_capture()
+        except BaseException:
+            # `__enter__` が例外を送出した場合は `__exit__` が呼ばれないので，
+            # ここで借りたセッションを返し，コンテナを止める．
+            self.__exit__(None, None, None)
+            raise
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.__redis = None
+        try:
+            if self.__browser is not None:
+                self.__browser.close()
+                self.__browser = None
+        finally:
+            if self.__pool is not None and self.__session is not None:
+                self.__pool.release(self.__session)
+                self.__session = None
+            if self.__containers is not None:
+                self.__containers.stop()
+
     def get_account_id(self) -> int:
         if self.__redis.account_id is None:
             raise RuntimeError('`account_id` has not been fetched yet.')
@@ -107,6 +251,9 @@ class RPA(object):
     def get_screenshot(self) -> Image:
         return self.__browser.get_screenshot()
 
+    def get_raw_screenshot(self) -> numpy.ndarray:
+        return self.__browser.get_raw_screenshot()
+
     def _get_redis(self) -> Redis:
         return self.__redis
 
@@ -136,25 +283,14 @@ class RPA(object):
 
     def _click_region(
         self, left: int, top: int, width: int, height: int,
-        edge_sigma: float=2.0, warp: bool=False) -> None:
+        edge_sigma: float=2.0, warp: bool=False,
+        blocking: bool=True) -> None:
         self.__browser.click_region(
-            left, top, width, height, edge_sigma=edge_sigma, warp=warp)
+            left, top, width, height, edge_sigma=edge_sigma, warp=warp,
+            blocking=blocking)
 
     def _click_template(self, name_or_path: Union[str, Path]) -> None:
-        if isinstance(name_or_path, Path):
-            name_or_path = str(name_or_path)
-        if name_or_path.endswith('.yaml'):
-            path = Path(name_or_path)
-        else:
-            path = Path(f'{name_or_path}.yaml')
-        if not path.exists():
-            raise RuntimeError(f'{path}: does not exist.')
-        with open(path) as f:
-            data = yaml.load(f, Loader=yaml.Loader)
-        left = data['left']
-        top = data['top']
-        width = data['width']
-        height = data['height']
+        left, top, width, height = _get_template_region(name_or_path)
         self._click_region(left, top, width, height)
 
     def wait(self, timeout: float) -> PresentationBase:
@@ -192,3 +328,121 @@ class RPA(object):
             now = datetime.datetime.now(datetime.timezone.utc)
             if now > deadline:
                 raise Timeout('Timeout', self.get_screenshot())
+
+
+class AsyncRPA(object):
+    # `RPA` の asyncio 版．1つのイベントループで複数のボットを同時に
+    # 動かすためのもの．ヘッドレスモードのみに対応する．プレゼンテーションは
+    # 同期 API のままなので，メッセージとテンプレートの水準で操作する．
+    def __init__(
+        self, redis_port: Optional[int]=None, *,
+        preload_templates: bool=False,
+        ignored_messages: Iterable[str]=_DEFAULT_IGNORED_MESSAGES,
+        message_transport: str='list',
+        session: Optional[str]=None) -> None:
+        self.__redis_port = redis_port
+        self.__preload_templates = preload_templates
+        self.__ignored_messages = tuple(ignored_messages)
+        self.__message_transport = message_transport
+        self.__session = session
+        self.__containers = None
+        if session is None:
+            self.__containers = _Containers(
+                None, redis_port, self.__ignored_messages, message_transport)
+        self.__browser = None
+        self.__redis = None
+
+    async def __aenter__(self) -> 'AsyncRPA':
+        # Docker の操作はブロックするので別スレッドで行う．
+        if self.__preload_templates:
+            await asyncio.to_thread(Template.preload)
+        try:
+            if self.__containers is not None:
+                await asyncio.to_thread(self.__containers.start)
+
+            self.__browser = AsyncRemoteBrowser(
+                self.__redis_port, session=self.__session)
+            if self.__redis_port is None:
+                self.__redis = AsyncRedis(
+                    'redis', ignored_names=self.__ignored_messages,
+                    transport=self.__message_transport,
+                    session=self.__session)
+            else:
+                self.__redis = AsyncRedis(
+                    'localhost', self.__redis_port,
+                    ignored_names=self.__ignored_messages,
+                    transport=self.__message_transport,
+                    session=self.__session)
+
+            if not await self.__redis.wait_for_ready(
+                    'browser', _READY_TIMEOUT):
+                raise RuntimeError('The remote browser did not become ready.')
+
+            # ブラウザをフルスクリーン化
+            await self.__browser.fullscreen()
+        except BaseException:
+            # `__aenter__` が例外を送出した場合は `__aexit__` が呼ばれないので，
+            # ここでコンテナを止める．
+            await self.__aexit__(None, None, None)
+            raise
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if self.__redis is not None:
+                await self.__redis.close()
+                self.__redis = None
+            if self.__browser is not None:
+                await self.__browser.close()
+                self.__browser = None
+        finally:
+            if self.__containers is not None:
+                await asyncio.to_thread(self.__containers.stop)
+
+    def get_account_id(self) -> int:
+        if self.__redis.account_id is None:
+            raise RuntimeError('`account_id` has not been fetched yet.')
+        return self.__redis.account_id
+
+    async def get_screenshot(self) -> Image:
+        return await self.__browser.get_screenshot()
+
+    async def get_raw_screenshot(self) -> numpy.ndarray:
+        return await self.__browser.get_raw_screenshot()
+
+    def _get_redis(self) -> AsyncRedis:
+        return self.__redis
+
+    def _get_browser(self) -> AsyncRemoteBrowser:
+        return self.__browser
+
+    async def _write(self, message: str, interval=0.1) -> None:
+        await self.__browser.write(message, interval=interval)
+
+    async def _press(self, keys: Union[str, Iterable[str]]):
+        await self.__browser.press(keys)
+
+    async def _press_hotkey(self, *args: str):
+        await self.__browser.press_hotkey(*args)
+
+    async def _move_to_region(
+        self, left: int, top: int, width: int, height: int,
+        edge_sigma: float=2.0, warp: bool=False) -> None:
+        await self.__browser.move_to_region(
+            left, top, width, height, edge_sigma=edge_sigma, warp=warp)
+
+    async def _scroll(self, clicks: int) -> None:
+        await self.__browser.scroll(clicks)
+
+    async def _click_region(
+        self, left: int, top: int, width: int, height: int,
+        edge_sigma: float=2.0, warp: bool=False,
+        blocking: bool=True) -> None:
+        await self.__browser.click_region(
+            left, top, width, height, edge_sigma=edge_sigma, warp=warp,
+            blocking=blocking)
+
+    async def _click_template(self, name_or_path: Union[str, Path]) -> None:
+        left, top, width, height = _get_template_region(name_or_path)
+        await self._click_region(left, top, width, height)
@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 
 from majsoul_rpa._impl.redis import Redis
+from majsoul_rpa._impl.async_redis import AsyncRedis
+from majsoul_rpa._impl.frame_buffer import FrameBuffer
 from majsoul_rpa._impl.browser import (
     BrowserBase, DesktopBrowser, RemoteBrowser)
-from majsoul_rpa._impl.template import Template
+from majsoul_rpa._impl.async_browser import AsyncRemoteBrowser
+from majsoul_rpa._impl.template import (Frame, Template, TemplateSet)
+from majsoul_rpa._impl.replay import (ReplayClock, ReplayRedis, ReplayBrowser)
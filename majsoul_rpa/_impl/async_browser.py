@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+import uuid
+from io import BytesIO
+import math
+from typing import (Optional, List, Tuple, Union, Iterable,)
+import numpy
+import PIL.Image
+from PIL.Image import Image
+import redis.asyncio
+from majsoul_rpa._impl.browser import (
+    _RESPONSE_TIMEOUT, _get_random_point_in_region, _encode_message,
+    _decode_message,)
+from majsoul_rpa._impl.frame_buffer import next_sequence
+from majsoul_rpa._impl.redis import _session_key
+
+
+class AsyncRemoteBrowser(object):
+    # `RemoteBrowser` の asyncio 版．要求と応答の形式は同じ．応答の待ち受けを
+    # キャンセルした場合，届かなかった応答はリモートブラウザ側で設定された
+    # 期限が来ると Redis から消える．
+    def __init__(self, port, session: Optional[str]=None) -> None:
+        if port is None:
+            self.__redis = redis.asyncio.Redis(host='redis')
+        else:
+            self.__redis = redis.asyncio.Redis(host='localhost', port=port)
+        self.__request_key = _session_key('browser_request', session)
+        self.__response_key = _session_key('browser_response', session)
+        # 応答を待たずに送った要求の ID ．
+        self.__pending: List[str] = []
+
+    async def __send(self, message: dict) -> str:
+        request_id = uuid.uuid4().hex
+        message = dict(message, id=request_id)
+        message = _encode_message(message)
+        await self.__redis.lpush(self.__request_key, message)
+        return request_id
+
+    async def __receive(
+        self, request_id: str, timeout: float) -> Tuple[dict, bytes]:
+        result = await self.__redis.brpop(
+            f'{self.__response_key}:{request_id}', math.ceil(timeout))
+        if result is None:
+            raise RuntimeError('The remote browser did not respond.')
+        _, message = result
+        return _decode_message(message)
+
+    async def __check_pending(self) -> None:
+        # 応答を待たずに送った要求のうち，応答が届いているものを確認する．
+        if len(self.__pending) == 0:
+            return
+        pending = self.__pending
+        self.__pending = []
+        try:
+            async with self.__redis.pipeline(transaction=False) as pipeline:
+                for request_id in pending:
+                    pipeline.rpop(f'{self.__response_key}:{request_id}')
+                messages = await pipeline.execute()
+        except BaseException:
+            # キャンセルされた場合なども，確認していない要求を戻しておく．
+            self.__pending = pending + self.__pending
+            raise
+        # 失敗した応答があっても残りの要求を確認し終えてから例外を送出し，
+        # 応答が届いていない要求を取りこぼさないようにする．
+        failed = False
+        for request_id, message in zip(pending, messages):
+            if message is None:
+                self.__pending.append(request_id)
+                continue
+            response, _ = _decode_message(message)
+            if response['result'] != 'O.K.':
+                failed = True
+        if failed:
+            raise RuntimeError(
+                'Failed to send a message to the remote browser.')
+
+    async def __communicate(
+        self, message: dict, timeout: float=_RESPONSE_TIMEOUT,
+        check_pending: bool=True) -> Tuple[dict, bytes]:
+        # スクリーンショットの要求は `check_pending` を偽にして，応答を
+        # 待たずに送った要求を確認しない（ `RemoteBrowser` を参照）．
+        if check_pending:
+            await self.__check_pending()
+        request_id = await self.__send(message)
+        response, data = await self.__receive(request_id, timeout)
+        if response['result'] != 'O.K.':
+            raise RuntimeError(
+                'Failed to send a message to the remote browser.')
+        return (response, data)
+
+    async def __wait_pending(self) -> None:
+        # 応答を待たずに送った要求の応答が届くまで待つ．
+        pending = self.__pending
+        self.__pending = []
+        failed = False
+        for i, request_id in enumerate(pending):
+            try:
+                response, _ = await self.__receive(
+                    request_id, _RESPONSE_TIMEOUT)
+            except BaseException:
+                self.__pending[:0] = pending[i + 1:]
+                raise
+            if response['result'] != 'O.K.':
+                failed = True
+        if failed:
+            raise RuntimeError(
+                'Failed to send a message to the remote browser.')
+
+    async def __post(self, message: dict) -> None:
+        # 応答を待たずに要求を送る．応答は後続の要求の際に確認する．
+        # ただし，応答を待っている要求は高々1つとし，前の要求の応答が
+        # まだ届いていなければそれを待つ．
+        await self.__wait_pending()
+        request_id = await self.__send(message)
+        self.__pending.append(request_id)
+
+    async def wait(self) -> None:
+        # 応答を待たずに行った操作が完了するまで待ち，失敗していれば
+        # 例外を送出する．
+        await self.__wait_pending()
+
+    async def fullscreen(self) -> None:
+        await self.__communicate({'type': 'fullscreen'})
+
+    async def activate(self) -> None:
+        pass
+
+    async def refresh(self) -> None:
+        await self.__communicate({'type': 'refresh'})
+
+    async def write(self, message: str, interval: float) -> None:
+        await self.__communicate(
+            {'type': 'write', 'message': message, 'interval': interval},
+            _RESPONSE_TIMEOUT + len(message) * interval)
+
+    async def press(self, keys: Union[str, Iterable[str]]) -> None:
+        if not isinstance(keys, str):
+            keys = [k for k in keys]
+        await self.__communicate({'type': 'press', 'keys': keys})
+
+    async def press_hotkey(self, *args: str) -> None:
+        await self.__communicate(
+            {'type': 'press_hotkey', 'args': [a for a in args]})
+
+    async def move_to_region(
+        self, left: int, top: int, width: int, height: int,
+        edge_sigma: float=2.0, warp: bool=False) -> None:
+        x, y = _get_random_point_in_region(left, top, width, height, edge_sigma)
+        await self.__communicate({'type': 'move', 'x': x, 'y': y})
+
+    async def scroll(self, clicks: int) -> None:
+        await self.__communicate({'type': 'scroll', 'clicks': clicks})
+
+    async def click_region(
+        self, left: int, top: int, width: int, height: int,
+        edge_sigma: float=2.0, warp: bool=False,
+        blocking: bool=True) -> None:
+        x, y = _get_random_point_in_region(left, top, width, height, edge_sigma)
+        request = {'type': 'click', 'x': x, 'y': y}
+        if not blocking:
+            await self.__post(request)
+            return
+        await self.__communicate(request)
+
+    async def get_screenshot(self) -> Image:
+        _, data = await self.__communicate(
+            {'type': 'get_screenshot'}, check_pending=False)
+        return PIL.Image.open(BytesIO(data))
+
+    async def get_raw_screenshot(self) -> numpy.ndarray:
+        # 画素データは BGR 形式のバイト列のまま受け取る．
+        response, data = await self.__communicate(
+            {'type': 'get_raw_screenshot'}, check_pending=False)
+        width: int = response['width']
+        height: int = response['height']
+        if len(data) != width * height * 3:
+            raise RuntimeError(
+                'Failed to receive a screenshot from the remote browser.')
+        image = numpy.frombuffer(data, dtype=numpy.uint8)
+        return image.reshape((height, width, 3))
+
+    async def get_next_raw_screenshot(
+        self, sequence: int=-1) -> Tuple[int, numpy.ndarray]:
+        # `BrowserBase.get_next_raw_screenshot` と同じ形式で返す．
+        # 毎回その場でキャプチャするので常に新しいフレームになる．
+        image = await self.get_raw_screenshot()
+        return (next_sequence(), image)
+
+    async def close(self) -> None:
+        try:
+            await self.__communicate({'type': 'close'})
+        finally:
+            await self.__redis.aclose()
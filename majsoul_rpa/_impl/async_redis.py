@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import datetime
+import asyncio
+from typing import (Optional, List, Dict, Iterable, Callable,)
+import redis.asyncio
+from majsoul_rpa._impl.redis import (Message, _MessageQueueBase, _ready_key)
+from majsoul_rpa.common import TimeoutType
+
+
+class AsyncRedis(_MessageQueueBase):
+    # `Redis` の asyncio 版．待ち受けは Redis サーバ側のブロッキング
+    # コマンドで行い，イベントループをブロックしない．1つのイベントループで
+    # 複数のボットのメッセージキューを同時に待ち受けることができる．
+    def __init__(
+        self, host='redis', port=6379, *,
+        ignored_names: Iterable[str]=(), transport: str='list',
+        consumer: str='default', batch_size: int=64,
+        session: Optional[str]=None) -> None:
+        super(AsyncRedis, self).__init__(
+            ignored_names=ignored_names, transport=transport,
+            consumer=consumer, batch_size=batch_size, session=session)
+        self.__redis = redis.asyncio.Redis(host=host, port=port)
+
+    async def close(self) -> None:
+        await self.__redis.aclose()
+
+    async def get_ignored_counts(self) -> Dict[str, int]:
+        return self._merge_ignored_counts(
+            await self.__redis.hgetall(self._counts_key))
+
+    async def wait_for_ready(self, name: str, timeout: TimeoutType) -> bool:
+        # `Redis.wait_for_ready` の asyncio 版．
+        if isinstance(timeout, (int, float,)):
+            timeout = datetime.timedelta(seconds=timeout)
+        key = _ready_key(name, self._session)
+        deadline = datetime.datetime.now(datetime.timezone.utc) + timeout
+        while True:
+            timeout = deadline - datetime.datetime.now(datetime.timezone.utc)
+            if timeout.total_seconds() <= 0.0:
+                return False
+            try:
+                if self._needs_offset():
+                    await self.__load_offset()
+                result = await self.__redis.blmove(
+                    key, key, timeout.total_seconds(), 'RIGHT', 'LEFT')
+                return result is not None
+            except redis.asyncio.ConnectionError:
+                await asyncio.sleep(0.1)
+
+    async def __run_steps(self, steps):
+        # `_run_steps` の asyncio 版．
+        try:
+            timeout = next(steps)
+            while True:
+                timeout = steps.send(await self.__receive(timeout))
+        except StopIteration as e:
+            return e.value
+
+    async def dequeue_message(
+        self, timeout: TimeoutType) -> Optional[Message]:
+        return await self.__run_steps(self._dequeue_message_steps(timeout))
+
+    async def dequeue_many(
+        self, max_n: int, timeout: TimeoutType) -> List[Message]:
+        return await self.__run_steps(
+            self._dequeue_many_steps(max_n, timeout))
+
+    async def peek(self, timeout: TimeoutType) -> Optional[Message]:
+        return await self.__run_steps(self._peek_steps(timeout))
+
+    async def peek_many(self, n: int, timeout: TimeoutType) -> List[Message]:
+        return await self.__run_steps(self._peek_many_steps(n, timeout))
+
+    async def take_if(
+        self, predicate: Callable[[Message], bool],
+        timeout: TimeoutType) -> Optional[Message]:
+        return await self.__run_steps(
+            self._take_if_steps(predicate, timeout))
+
+    async def __receive(
+        self, timeout: Optional[datetime.timedelta]) -> Optional[Message]:
+        # `timeout` が `None` の場合はブロックしない．
+        if timeout is not None:
+            deadline = datetime.datetime.now(datetime.timezone.utc) + timeout
+        while True:
+            message = self._take_prefetched()
+            if message is not None:
+                return message
+
+            if timeout is not None:
+                timeout = deadline \
+                    - datetime.datetime.now(datetime.timezone.utc)
+                if timeout.total_seconds() <= 0.0:
+                    return None
+            if not await self.__prefetch(timeout):
+                return None
+
+    async def __load_offset(self) -> None:
+        async with self.__redis.pipeline(transaction=False) as pipeline:
+            self._queue_load_offset(pipeline)
+            self._restore_offset(await pipeline.execute())
+
+    async def __prefetch(self, timeout: Optional[datetime.timedelta]) -> bool:
+        if self._needs_offset():
+            await self.__load_offset()
+        async with self.__redis.pipeline(transaction=False) as pipeline:
+            self._queue_prefetch(pipeline, timeout)
+            result = await pipeline.execute()
+        return self._store_prefetched(result, timeout)
+
+    async def commit_offset(self) -> None:
+        # 読み出し位置を直ちに Redis に保存する．
+        if self._needs_offset():
+            return
+        position = self._uncommitted_offset()
+        if position is not None:
+            await self.__redis.set(self._offset_key, position)
+            self._mark_committed(position)
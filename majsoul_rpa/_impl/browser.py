@@ -1,18 +1,26 @@
 #!/usr/bin/env python3
 
 import math
+import logging
 from io import BytesIO
 import time
 import platform
 import json
 import base64
-from typing import (Tuple, Union, Iterable,)
+import struct
+import threading
+import uuid
+from typing import (Optional, Tuple, List, Union, Iterable, Callable,)
+import numpy
 import PIL.Image
 from PIL.Image import Image
-import pyautogui
 import redis
 from selenium import webdriver
 from selenium.webdriver.chrome.webdriver import WebDriver
+from majsoul_rpa.common import TimeoutType
+from majsoul_rpa._impl.frame_buffer import (
+    FrameType, FrameBuffer, next_sequence)
+from majsoul_rpa._impl.redis import _session_key
 
 
 def _get_random_point_in_region(
@@ -39,9 +47,60 @@ def _get_random_point_in_region(
     return (x, y)
 
 
+# リモートブラウザとの間で用いるバイナリ形式．スクリーンショットなどの
+# バイト列を base64 で JSON に埋め込まずにそのまま送る．
+# `headless_browser/headless_browser.py` にも同じ定義がある．
+#
+#   magic (4 bytes) | version (1 byte) | header length (4 bytes)
+#   | payload length (4 bytes) | header (JSON) | payload (raw bytes)
+_MAGIC = b'MRPC'
+_VERSION = 1
+_PREFIX = struct.Struct('!4sBII')
+# リモートブラウザの応答を待つ時間 [s] ．リモートブラウザが落ちた場合に
+# 待ち続けないようにする．文字の入力はこれに入力にかかる時間を加える．
+_RESPONSE_TIMEOUT = 60.0
+
+
+def _encode_message(header: dict, payload: bytes=b'') -> bytes:
+    header = json.dumps(header, separators=(',', ':')).encode('UTF-8')
+    prefix = _PREFIX.pack(_MAGIC, _VERSION, len(header), len(payload))
+    return b''.join((prefix, header, payload))
+
+
+def _decode_message(data: bytes) -> Tuple[dict, bytes]:
+    magic, version, header_length, payload_length \
+        = _PREFIX.unpack_from(data)
+    if magic != _MAGIC:
+        raise RuntimeError('An invalid message.')
+    if version != _VERSION:
+        raise RuntimeError(f'{version}: An unsupported version.')
+    offset = _PREFIX.size
+    header = json.loads(data[offset:offset + header_length].decode('UTF-8'))
+    offset += header_length
+    payload = data[offset:offset + payload_length]
+    if len(payload) != payload_length:
+        raise RuntimeError('A truncated message.')
+    return (header, payload)
+
+
 class BrowserBase(object):
     def __init__(self) -> None:
         self._window = None
+        self.__frame_buffer = None
+        self.__capture_thread = None
+        self.__capture_stop = None
+        # 取得したスクリーンショットを渡す先．記録用．
+        self.__frame_hook: Optional[
+            Callable[[Union[Image, numpy.ndarray]], None]] = None
+
+    def _set_frame_hook(
+        self,
+        hook: Optional[Callable[[Union[Image, numpy.ndarray]], None]]) -> None:
+        self.__frame_hook = hook
+
+    def _notify_frame(self, image: Union[Image, numpy.ndarray]) -> None:
+        if self.__frame_hook is not None:
+            self.__frame_hook(image)
 
     def fullscreen(self) -> None:
         raise NotImplementedError
@@ -103,19 +162,134 @@ class BrowserBase(object):
 
     def click_region(
         self, left: int, top: int, width: int, height: int,
-        edge_sigma: float=2.0, warp: bool=False) -> None:
+        edge_sigma: float=2.0, warp: bool=False,
+        blocking: bool=True) -> None:
         raise NotImplementedError
 
-    def get_screenshot(
-        self, left: int, top: int, width: int, height: int,
-        edge_sigma: float) -> Image:
+    def wait(self) -> None:
+        # 応答を待たずに行った操作（ `click_region` の `blocking=False` ）が
+        # 完了するまで待ち，失敗していれば例外を送出する．
+        pass
+
+    def _capture_screenshot(self) -> Image:
         raise NotImplementedError
 
+    def _capture_raw_screenshot(self) -> numpy.ndarray:
+        # BGR 形式の ndarray としてスクリーンショットを取得する．
+        # 派生クラスは PNG のエンコード・デコードを省いた実装で上書きする．
+        from majsoul_rpa._impl.template import pil2opencv
+        return pil2opencv(self._capture_screenshot())
+
+    @property
+    def capturing(self) -> bool:
+        return self.__capture_thread is not None
+
+    def start_capture(self, capacity: int=8, interval: float=0.0) -> None:
+        # バックグラウンドのスレッドでスクリーンショットを取り続け，
+        # 直近のフレームを保持する．
+        if self.__capture_thread is not None:
+            raise RuntimeError('Capture has already been started.')
+
+        frame_buffer = FrameBuffer(capacity)
+        stop = threading.Event()
+
+        def capture() -> None:
+            while not stop.is_set():
+                try:
+                    image = self._capture_raw_screenshot()
+                except Exception as e:
+                    # 黙って止まらないように，例外をバッファに置いて
+                    # フレームを取り出す側で送出させる．
+                    logging.exception(e)
+                    frame_buffer.set_error(e)
+                    break
+                frame_buffer.push(image)
+                stop.wait(interval)
+
+        self.__frame_buffer = frame_buffer
+        self.__capture_stop = stop
+        self.__capture_thread = threading.Thread(target=capture, daemon=True)
+        self.__capture_thread.start()
+
+    def stop_capture(self) -> None:
+        if self.__capture_thread is None:
+            return
+        self.__capture_stop.set()
+        self.__capture_thread.join()
+        self.__frame_buffer = None
+        self.__capture_stop = None
+        self.__capture_thread = None
+
+    def __get_live_buffer(self) -> Optional[FrameBuffer]:
+        # キャプチャを行っている場合にそのバッファを返す．キャプチャの
+        # スレッドが失敗して止まっている場合は，バッファが例外を送出する．
+        frame_buffer = self.__frame_buffer
+        if self.__capture_thread is None:
+            return None
+        return frame_buffer
+
+    def __get_live_frame(self) -> Optional[FrameType]:
+        frame_buffer = self.__get_live_buffer()
+        if frame_buffer is None:
+            return None
+        return frame_buffer.latest()
+
+    def get_frame(self) -> Optional[FrameType]:
+        if self.__frame_buffer is None:
+            return None
+        return self.__frame_buffer.latest()
+
+    def wait_for_frame(
+        self, sequence: int, timeout: TimeoutType) -> Optional[FrameType]:
+        # 通し番号が `sequence` より新しいフレームを待つ．
+        if self.__frame_buffer is None:
+            raise RuntimeError('Capture has not been started.')
+        return self.__frame_buffer.wait_for(sequence, timeout)
+
+    def get_screenshot(self) -> Image:
+        frame = self.__get_live_frame()
+        if frame is None:
+            image = self._capture_screenshot()
+            self._notify_frame(image)
+            return image
+        _, _, image = frame
+        self._notify_frame(image)
+        return PIL.Image.fromarray(numpy.ascontiguousarray(image[:, :, ::-1]))
+
+    def get_raw_screenshot(self) -> numpy.ndarray:
+        frame = self.__get_live_frame()
+        if frame is None:
+            image = self._capture_raw_screenshot()
+        else:
+            _, _, image = frame
+        self._notify_frame(image)
+        return image
+
+    def get_next_raw_screenshot(
+        self, sequence: int=-1,
+        timeout: TimeoutType=1.0) -> Tuple[int, numpy.ndarray]:
+        # ポーリング用．前回得たものより新しいフレームを通し番号と共に返す．
+        # バックグラウンドでのキャプチャを行っていない場合や，キャプチャが
+        # 止まっている場合はその場でキャプチャする．
+        frame_buffer = self.__get_live_buffer()
+        if frame_buffer is not None:
+            frame = frame_buffer.wait_for(sequence, timeout)
+            if frame is not None:
+                sequence, _, image = frame
+                self._notify_frame(image)
+                return (sequence, image)
+        image = self._capture_raw_screenshot()
+        self._notify_frame(image)
+        return (next_sequence(), image)
+
     def close(self) -> None:
         raise NotImplementedError
 
 
 class DesktopBrowser(BrowserBase):
+    # `pyautogui` は import するだけでディスプレイを必要とするので，
+    # ヘッドレスモードやベンチマークで import できるように使う所で
+    # import する．
     def __init__(self, proxy_port: int) -> None:
         super(DesktopBrowser, self).__init__()
 
@@ -135,17 +309,21 @@ class DesktopBrowser(BrowserBase):
         self.__driver.refresh()
 
     def write(self, message: str, interval) -> None:
+        import pyautogui
         pyautogui.write(message, interval=interval)
 
     def press(self, keys: Union[str, Iterable[str]]) -> None:
+        import pyautogui
         pyautogui.press(keys)
 
     def press_hotkey(self, *args: str) -> None:
+        import pyautogui
         pyautogui.hotkey(*args)
 
     def move_to_region(
         self, left: int, top: int, width: int, height: int,
         edge_sigma: float=2.0, warp: bool=False) -> None:
+        import pyautogui
         x, y = pyautogui.position()
         if left <= x and x < left + width and top <= y and y < top + height:
             return
@@ -160,6 +338,7 @@ class DesktopBrowser(BrowserBase):
         pyautogui.moveTo(xx, yy, duration, pyautogui.easeInOutSine)
 
     def scroll(self, clicks: int) -> None:
+        import pyautogui
         if clicks == 0:
             return
 
@@ -176,46 +355,134 @@ class DesktopBrowser(BrowserBase):
 
     def click_region(
         self, left: int, top: int, width: int, height: int,
-        edge_sigma: float=2.0, warp: bool=False) -> None:
+        edge_sigma: float=2.0, warp: bool=False,
+        blocking: bool=True) -> None:
+        # `pyautogui` の操作は常に完了まで待つので `blocking` は使わない．
+        import pyautogui
         self.move_to_region(
             left, top, width, height, edge_sigma=edge_sigma, warp=warp)
         pyautogui.click()
 
-    def get_screenshot(self) -> Image:
+    def _capture_screenshot(self) -> Image:
         png = self.__driver.get_screenshot_as_png()
         return PIL.Image.open(BytesIO(png))
 
+    def _capture_raw_screenshot(self) -> numpy.ndarray:
+        # DevTools Protocol で直接キャプチャし， PIL を経由せずに
+        # BGR 形式へデコードする．
+        import cv2
+        result = self.__driver.execute_cdp_cmd(
+            'Page.captureScreenshot',
+            {'format': 'png', 'optimizeForSpeed': True})
+        data = base64.b64decode(result['data'])
+        data = numpy.frombuffer(data, dtype=numpy.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
     def close(self) -> None:
+        self.stop_capture()
         self.__driver.close()
         self.__driver = None
 
 
 class RemoteBrowser(BrowserBase):
-    def __init__(self, port) -> None:
+    def __init__(self, port, session: Optional[str]=None) -> None:
         super(RemoteBrowser, self).__init__()
         if port is None:
             self.__redis = redis.Redis('redis')
         else:
             self.__redis = redis.Redis('localhost', port)
-
-    def __communicate(self, message: object) -> object:
-        message = json.dumps(message, separators=(',', ':'))
-        message = message.encode('UTF-8')
-        if self.__redis.llen('browser_request') > 0:
+        self.__request_key = _session_key('browser_request', session)
+        self.__response_key = _session_key('browser_response', session)
+        # 応答を待たずに送った要求の ID ．
+        self.__pending: List[str] = []
+        self.__pending_lock = threading.Lock()
+
+    def __send(self, message: dict) -> str:
+        # 要求ごとに ID を付け，応答はその ID 専用のキーで受け取る．
+        # これにより複数の要求を同時に送ることができる．
+        request_id = uuid.uuid4().hex
+        message = dict(message, id=request_id)
+        message = _encode_message(message)
+        self.__redis.lpush(self.__request_key, message)
+        return request_id
+
+    def __receive(
+        self, request_id: str, timeout: float) -> Tuple[dict, bytes]:
+        result = self.__redis.brpop(
+            f'{self.__response_key}:{request_id}', math.ceil(timeout))
+        if result is None:
+            raise RuntimeError('The remote browser did not respond.')
+        _, message = result
+        return _decode_message(message)
+
+    def __check_pending(self) -> None:
+        # 応答を待たずに送った要求のうち，応答が届いているものを確認する．
+        # 失敗した応答があっても残りの要求を確認し終えてから例外を送出し，
+        # 応答が届いていない要求を取りこぼさないようにする．
+        with self.__pending_lock:
+            pending = self.__pending
+            self.__pending = []
+        failed = False
+        for request_id in pending:
+            message = self.__redis.rpop(f'{self.__response_key}:{request_id}')
+            if message is None:
+                with self.__pending_lock:
+                    self.__pending.append(request_id)
+                continue
+            response, _ = _decode_message(message)
+            if response['result'] != 'O.K.':
+                failed = True
+        if failed:
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
-        if self.__redis.lpush('browser_request', message) != 1:
+
+    def __communicate(
+        self, message: dict, timeout: float=_RESPONSE_TIMEOUT,
+        check_pending: bool=True) -> Tuple[dict, bytes]:
+        # スクリーンショットの要求は `check_pending` を偽にして，応答を
+        # 待たずに送った要求を確認しない．キャプチャのスレッドから
+        # 呼ばれた場合に，クリックの失敗がそのスレッドで送出されて
+        # 呼び出し側に届かなくなるのを避ける．
+        if check_pending:
+            self.__check_pending()
+        request_id = self.__send(message)
+        return self.__receive(request_id, timeout)
+
+    def __wait_pending(self) -> None:
+        # 応答を待たずに送った要求の応答が届くまで待つ．
+        with self.__pending_lock:
+            pending = self.__pending
+            self.__pending = []
+        failed = False
+        for i, request_id in enumerate(pending):
+            try:
+                response, _ = self.__receive(request_id, _RESPONSE_TIMEOUT)
+            except BaseException:
+                with self.__pending_lock:
+                    self.__pending[:0] = pending[i + 1:]
+                raise
+            if response['result'] != 'O.K.':
+                failed = True
+        if failed:
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
 
-        _, message = self.__redis.brpop('browser_response')
-        message = message.decode('UTF-8')
-        message = json.loads(message)
-        return message
+    def __post(self, message: dict) -> None:
+        # 応答を待たずに要求を送る．応答は後続の要求の際に確認する．
+        # ただし，応答を待っている要求は高々1つとし，前の要求の応答が
+        # まだ届いていなければそれを待つ．クリックを繰り返す場合などに
+        # 応答の届かない要求が溜まり続けないようにする．
+        self.__wait_pending()
+        request_id = self.__send(message)
+        with self.__pending_lock:
+            self.__pending.append(request_id)
+
+    def wait(self) -> None:
+        self.__wait_pending()
 
     def fullscreen(self) -> None:
         request = {'type': 'fullscreen'}
-        response = self.__communicate(request)
+        response, _ = self.__communicate(request)
         if response['result'] != 'O.K.':
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
@@ -225,14 +492,15 @@ class RemoteBrowser(BrowserBase):
 
     def refresh(self) -> None:
         request = {'type': 'refresh'}
-        response = self.__communicate(request)
+        response, _ = self.__communicate(request)
         if response['result'] != 'O.K.':
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
 
     def write(self, message: str, interval: float) -> None:
         request = {'type': 'write', 'message': message, 'interval': interval}
-        response = self.__communicate(request)
+        response, _ = self.__communicate(
+            request, _RESPONSE_TIMEOUT + len(message) * interval)
         if response['result'] != 'O.K.':
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
@@ -241,14 +509,14 @@ class RemoteBrowser(BrowserBase):
         if not isinstance(keys, str):
             keys = [k for k in keys]
         request = {'type': 'press', 'keys': keys}
-        response = self.__communicate(request)
+        response, _ = self.__communicate(request)
         if response['result'] != 'O.K.':
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
 
     def press_hotkey(self, *args: str) -> None:
         request = {'type': 'press_hotkey', 'args': [a for a in args]}
-        response = self.__communicate(request)
+        response, _ = self.__communicate(request)
         if response['result'] != 'O.K.':
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
@@ -258,42 +526,60 @@ class RemoteBrowser(BrowserBase):
         edge_sigma: float=2.0, warp: bool=False) -> None:
         x, y = _get_random_point_in_region(left, top, width, height, edge_sigma)
         request = {'type': 'move', 'x': x, 'y': y}
-        response = self.__communicate(request)
+        response, _ = self.__communicate(request)
         if response['result'] != 'O.K.':
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
 
     def scroll(self, clicks: int) -> None:
         request = {'type': 'scroll', 'clicks': clicks}
-        response = self.__communicate(request)
+        response, _ = self.__communicate(request)
         if response['result'] != 'O.K.':
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
 
     def click_region(
         self, left: int, top: int, width: int, height: int,
-        edge_sigma: float=2.0, warp: bool=False) -> None:
+        edge_sigma: float=2.0, warp: bool=False,
+        blocking: bool=True) -> None:
         x, y = _get_random_point_in_region(left, top, width, height, edge_sigma)
         request = {'type': 'click', 'x': x, 'y': y}
-        response = self.__communicate(request)
+        if not blocking:
+            self.__post(request)
+            return
+        response, _ = self.__communicate(request)
         if response['result'] != 'O.K.':
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
 
-    def get_screenshot(self) -> Image:
+    def _capture_screenshot(self) -> Image:
         request = {'type': 'get_screenshot'}
-        response = self.__communicate(request)
+        response, data = self.__communicate(request, check_pending=False)
         if response['result'] != 'O.K.':
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
-        data: str = response['data']
-        data = base64.b64decode(data)
         image = PIL.Image.open(BytesIO(data))
         return image
 
+    def _capture_raw_screenshot(self) -> numpy.ndarray:
+        # 画素データは BGR 形式のバイト列のまま受け取る．
+        request = {'type': 'get_raw_screenshot'}
+        response, data = self.__communicate(request, check_pending=False)
+        if response['result'] != 'O.K.':
+            raise RuntimeError(
+                'Failed to send a message to the remote browser.')
+        width: int = response['width']
+        height: int = response['height']
+        if len(data) != width * height * 3:
+            raise RuntimeError(
+                'Failed to receive a screenshot from the remote browser.')
+        image = numpy.frombuffer(data, dtype=numpy.uint8)
+        return image.reshape((height, width, 3))
+
     def close(self) -> None:
+        self.stop_capture()
         request = {'type': 'close'}
-        response = self.__communicate(request)
+        response, _ = self.__communicate(request)
         if response['result'] != 'O.K.':
             raise RuntimeError(
                 'Failed to send a message to the remote browser.')
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import datetime
+import time
+import threading
+import itertools
+from collections import deque
+from typing import (Optional, Tuple, List,)
+import numpy
+from majsoul_rpa.common import TimeoutType
+
+
+# (通し番号, `time.monotonic()` による取得時刻, BGR 形式の画像)
+FrameType = Tuple[int, float, numpy.ndarray]
+
+
+# 通し番号はプロセス全体で一意にし，異なるブラウザのフレームが
+# 同じ番号を持たないようにする．
+_SEQUENCE = itertools.count()
+
+
+def next_sequence() -> int:
+    return next(_SEQUENCE)
+
+
+class FrameBuffer(object):
+    # バックグラウンドでキャプチャしたスクリーンショットのうち，
+    # 直近の数枚だけを保持するリングバッファ．
+    def __init__(self, capacity: int=8) -> None:
+        if capacity < 1:
+            raise ValueError(f'{capacity}: An invalid capacity.')
+        self.__frames = deque(maxlen=capacity)
+        self.__sequence = -1
+        # キャプチャが失敗して止まった場合のその例外．
+        self.__error: Optional[BaseException] = None
+        self.__condition = threading.Condition()
+
+    @property
+    def sequence(self) -> int:
+        # 最新のフレームの通し番号．まだフレームが無い場合は -1 ．
+        with self.__condition:
+            return self.__sequence
+
+    def push(self, image: numpy.ndarray) -> int:
+        timestamp = time.monotonic()
+        with self.__condition:
+            self.__sequence = next_sequence()
+            self.__frames.append((self.__sequence, timestamp, image))
+            self.__condition.notify_all()
+            return self.__sequence
+
+    def set_error(self, error: BaseException) -> None:
+        # キャプチャが失敗して止まったことを知らせる．以降，フレームを
+        # 取り出す側で例外を送出する．
+        with self.__condition:
+            self.__error = error
+            self.__condition.notify_all()
+
+    def __raise_error(self) -> None:
+        if self.__error is not None:
+            raise RuntimeError(
+                'The background capture stopped.') from self.__error
+
+    def latest(self) -> Optional[FrameType]:
+        with self.__condition:
+            self.__raise_error()
+            if len(self.__frames) == 0:
+                return None
+            return self.__frames[-1]
+
+    def frames(self) -> List[FrameType]:
+        with self.__condition:
+            return list(self.__frames)
+
+    def wait_for(
+        self, sequence: int,
+        timeout: TimeoutType) -> Optional[FrameType]:
+        # 通し番号が `sequence` より大きいフレームが届くまで待ち，
+        # 最新のフレームを返す．タイムアウトした場合は `None` を返す．
+        if isinstance(timeout, datetime.timedelta):
+            timeout = timeout.total_seconds()
+        with self.__condition:
+            if not self.__condition.wait_for(
+                lambda: self.__sequence > sequence or self.__error is not None,
+                timeout=max(timeout, 0.0)):
+                return None
+            self.__raise_error()
+            return self.__frames[-1]
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import threading
+from typing import (Optional, Tuple,)
+from google.protobuf.message import Message as ProtobufMessage
+from google.protobuf.message_factory import MessageFactory
+from majsoul_rpa._impl import mahjongsoul_pb2
+
+
+try:
+    from google.protobuf.message_factory import GetMessageClass \
+        as _get_message_class
+except ImportError:
+    # `GetMessageClass` が無い古い protobuf では，共有の
+    # `MessageFactory` から取得する．
+    _MESSAGE_FACTORY = MessageFactory()
+
+    def _get_message_class(descriptor) -> type:
+        return _MESSAGE_FACTORY.GetPrototype(descriptor)
+
+
+MessageClasses = Tuple[type, Optional[type]]
+
+
+class _MessageRegistry(object):
+    # WebSocket メッセージの名前から Protocol Buffers のメッセージクラスを
+    # 引くための表．全ての名前を起動時に解決するのではなく，初めて使われた
+    # 時に解決してプロセス全体で使い回す．
+    def __init__(self) -> None:
+        self.__file = mahjongsoul_pb2.DESCRIPTOR
+        self.__prefix = f'.{self.__file.package}.'
+        self.__classes = {}
+        self.__lock = threading.Lock()
+
+    def __resolve(self, name: str) -> Optional[MessageClasses]:
+        if not name.startswith(self.__prefix):
+            return None
+        short_name = name[len(self.__prefix):]
+
+        # メッセージ型とサービスのメソッドで名前が重複する場合は，
+        # メッセージ型を優先する．
+        if short_name in self.__file.message_types_by_name:
+            tdesc = self.__file.message_types_by_name[short_name]
+            return (_get_message_class(tdesc), None)
+
+        service_name, _, method_name = short_name.rpartition('.')
+        if service_name not in self.__file.services_by_name:
+            return None
+        sdesc = self.__file.services_by_name[service_name]
+        if method_name not in sdesc.methods_by_name:
+            return None
+        mdesc = sdesc.methods_by_name[method_name]
+        return (
+            _get_message_class(mdesc.input_type),
+            _get_message_class(mdesc.output_type))
+
+    def get(self, name: str) -> Optional[MessageClasses]:
+        # 辞書の参照は GIL の下でアトミックなので，解決済みの名前は
+        # ロックを取らずに返す．
+        classes = self.__classes.get(name)
+        if classes is not None or name in self.__classes:
+            return classes
+        classes = self.__resolve(name)
+        with self.__lock:
+            self.__classes.setdefault(name, classes)
+            return self.__classes[name]
+
+
+_MESSAGE_REGISTRY = _MessageRegistry()
+
+
+def get_message_classes(name: str) -> Optional[MessageClasses]:
+    # (リクエストのクラス, レスポンスのクラス) を返す．メッセージ型の
+    # 場合はレスポンスのクラスが `None` ．未知の名前には `None` を返す．
+    return _MESSAGE_REGISTRY.get(name)
+
+
+def new_message(name: str, is_response: bool=False) -> ProtobufMessage:
+    classes = get_message_classes(name)
+    if classes is None:
+        raise KeyError(name)
+    message_class = classes[1] if is_response else classes[0]
+    if message_class is None:
+        raise KeyError(name)
+    return message_class()
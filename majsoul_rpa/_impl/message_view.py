@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+from collections.abc import Mapping
+from typing import (Optional, Iterator,)
+import google.protobuf.json_format
+
+
+class LazyMessageView(Mapping):
+    # Protocol Buffers メッセージの辞書形式のビュー．最初に要素が参照
+    # されるまでメッセージのパースと辞書への変換を遅らせる．読み捨てられる
+    # メッセージではパースも変換も行われない．変換結果は
+    # `MessageToDict(..., including_default_value_fields=True,
+    # preserving_proto_field_name=True)` と同じ．
+    def __init__(self, message_class: type, data: bytes) -> None:
+        self.__message_class = message_class
+        self.__data = data
+        self.__dict: Optional[dict] = None
+
+    @property
+    def message_class(self) -> type:
+        return self.__message_class
+
+    @property
+    def data(self) -> bytes:
+        return self.__data
+
+    @property
+    def decoded(self) -> bool:
+        return self.__dict is not None
+
+    def __get(self) -> dict:
+        if self.__dict is None:
+            message = self.__message_class()
+            message.ParseFromString(self.__data)
+            self.__dict = google.protobuf.json_format.MessageToDict(
+                message, including_default_value_fields=True,
+                preserving_proto_field_name=True)
+        return self.__dict
+
+    def to_dict(self) -> dict:
+        return self.__get()
+
+    def __getitem__(self, key: str) -> object:
+        return self.__get()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__get())
+
+    def __len__(self) -> int:
+        return len(self.__get())
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__get()
+
+    def __repr__(self) -> str:
+        return repr(self.__get())
@@ -1,73 +1,360 @@
 #!/usr/bin/env python3
 
 import datetime
+import time
 import subprocess
 import json
 import base64
-from typing import (Optional, Tuple)
+import struct
+import itertools
+from collections import deque
+from typing import (
+    Optional, Tuple, List, Dict, Iterable, Callable, Generator,)
 import redis
-from google.protobuf.message_factory import MessageFactory
-import google.protobuf.json_format
 from majsoul_rpa._impl import mahjongsoul_pb2
+from majsoul_rpa._impl.message_registry import get_message_classes
+from majsoul_rpa._impl.message_view import LazyMessageView
 from majsoul_rpa.common import TimeoutType
 
 
 Message = Tuple[str, str, object, Optional[object], datetime.datetime]
+# メッセージの取り出し方の手順（ `_MessageQueueBase` を参照）．
+_Steps = Generator[Optional[datetime.timedelta], Optional[Message], object]
 
 
-class Redis(object):
-    def __init__(self, host='redis', port=6379):
-        self.__redis = redis.Redis(host, port)
+# スニファから Redis に送られるレコードのバイナリ形式．
+# `mitmproxy/sniffer.py` にも同じ定義がある．旧来の JSON 形式の
+# レコードも読めるようにしておく．
+#
+#   magic (4 bytes) | version (1 byte) | flags (1 byte)
+#   | timestamp [ns] (8 bytes) | request length (4 bytes)
+#   | response length (4 bytes) | request | response
+#
+# flags の bit 0 はリクエストが inbound であること， bit 1 はレスポンスが
+# 存在することを表す．
+_RECORD_MAGIC = b'MRWS'
+_RECORD_VERSION = 1
+_RECORD_PREFIX = struct.Struct('!4sBBQII')
+_RECORD_INBOUND = 0x01
+_RECORD_HAS_RESPONSE = 0x02
+
+
+def _encode_record(
+    request_direction: str, request: bytes, response: Optional[bytes],
+    timestamp: int) -> bytes:
+    flags = 0
+    if request_direction == 'inbound':
+        flags |= _RECORD_INBOUND
+    if response is not None:
+        flags |= _RECORD_HAS_RESPONSE
+    else:
+        response = b''
+    prefix = _RECORD_PREFIX.pack(
+        _RECORD_MAGIC, _RECORD_VERSION, flags, timestamp, len(request),
+        len(response))
+    return b''.join((prefix, request, response))
+
+
+def _decode_record(
+    data: bytes) -> Tuple[str, bytes, Optional[bytes], datetime.datetime]:
+    magic, version, flags, timestamp, request_length, response_length \
+        = _RECORD_PREFIX.unpack_from(data)
+    if magic != _RECORD_MAGIC:
+        raise RuntimeError('An invalid record.')
+    if version != _RECORD_VERSION:
+        raise RuntimeError(f'{version}: An unsupported record version.')
+    if len(data) != _RECORD_PREFIX.size + request_length + response_length:
+        raise RuntimeError('A truncated record.')
+    if flags & _RECORD_INBOUND != 0:
+        request_direction = 'inbound'
+    else:
+        request_direction = 'outbound'
+    offset = _RECORD_PREFIX.size
+    request = data[offset:offset + request_length]
+    offset += request_length
+    response = None
+    if flags & _RECORD_HAS_RESPONSE != 0:
+        response = data[offset:offset + response_length]
+    seconds, nanoseconds = divmod(timestamp, 1000000000)
+    timestamp = datetime.datetime.fromtimestamp(
+        seconds, datetime.timezone.utc)
+    timestamp += datetime.timedelta(microseconds=nanoseconds // 1000)
+    return (request_direction, request, response, timestamp)
+
+
+def _session_key(name: str, session: Optional[str]) -> str:
+    # 複数のセッションで1つの Redis を共有する場合に，キーにセッションの
+    # 名前を付けて名前空間を分ける． `mitmproxy/sniffer.py` と
+    # `headless_browser/headless_browser.py` にも同じ定義がある．
+    if session is None:
+        return name
+    return f'{name}:{session}'
+
+
+# コンテナの準備ができたことを知らせるリストのキー．コンテナは準備が
+# できたら要素を1つ積む．待つ側は要素を取り除かずに同じリストに戻すので，
+# 何度でも待つことができる．
+def _ready_key(name: str, session: Optional[str]) -> str:
+    return _session_key(f'{name}_ready', session)
+
+
+def _wait_for_ready(
+    client: redis.Redis, key: str, timeout: datetime.timedelta,
+    prepare: Optional[Callable[[], None]]=None) -> bool:
+    # Redis のコンテナ自体が起動途中の場合は接続できるまで待つ．
+    # `prepare` は接続できたら待つ前に1度だけ呼ぶ．
+    deadline = datetime.datetime.now(datetime.timezone.utc) + timeout
+    while True:
+        timeout = deadline - datetime.datetime.now(datetime.timezone.utc)
+        if timeout.total_seconds() <= 0.0:
+            return False
+        try:
+            if prepare is not None:
+                prepare()
+                prepare = None
+            result = client.blmove(
+                key, key, timeout.total_seconds(), 'RIGHT', 'LEFT')
+            return result is not None
+        except redis.ConnectionError:
+            time.sleep(0.1)
 
-        self.__message_type_map = {}
-        for sdesc in mahjongsoul_pb2.DESCRIPTOR.services_by_name.values():
-            for mdesc in sdesc.methods:
-                self.__message_type_map['.' + mdesc.full_name] \
-                    = (MessageFactory().GetPrototype(mdesc.input_type),
-                    MessageFactory().GetPrototype(mdesc.output_type))
-        for tdesc in mahjongsoul_pb2.DESCRIPTOR.message_types_by_name.values():
-            self.__message_type_map['.' + tdesc.full_name] \
-                = (MessageFactory().GetPrototype(tdesc), None)
-
-        self.__put_back_messages = []
+
+# メッセージキューの実装． `list` は Redis のリストを `blpop` で読み出し，
+# `stream` は Redis Streams を `XREAD` で読み出す．後者は読み出した
+# メッセージが Redis に残るので，読み出し位置を保存しておくことで，
+# クラッシュ後の再開や過去のメッセージの再処理ができる．
+_MESSAGE_TRANSPORTS = ('list', 'stream',)
+
+
+class _MessageQueueBase(object):
+    # `Redis` と `AsyncRedis` に共通する部分．読み出したレコードの
+    # バッファリングとデコード，先読み，読み出し位置の管理を行う．
+    # Redis との通信は派生クラスが行う．
+    #
+    # `dequeue_message` などの取り出し方は `_*_steps` のジェネレータに
+    # まとめてある．ジェネレータはメッセージの読み出しが必要になると
+    # 待つ時間（ブロックしない場合は `None` ）を yield し，派生クラスが
+    # 読み出したメッセージ（無ければ `None` ）を send する．同期版は
+    # `_run_steps` で，非同期版はこれを await で行う実装で進める．
+    def __init__(
+        self, *, ignored_names: Iterable[str], transport: str,
+        consumer: str, batch_size: int, session: Optional[str]) -> None:
+        if transport not in _MESSAGE_TRANSPORTS:
+            raise ValueError(f'{transport}: An unknown transport.')
+        if batch_size < 1:
+            raise ValueError(f'{batch_size}: An invalid batch size.')
+
+        # 先読みした，または埋め戻されたデコード済みのメッセージを
+        # (ストリームのエントリ ID, メッセージ) の組として保持する．
+        # 先頭が次に取り出されるメッセージ．
+        self.__lookahead = deque()
         self.__account_id = None
 
+        # 1往復で最大 `batch_size` 件のメッセージをまとめて読み出し，
+        # (ストリームのエントリ ID, レコード) の組として保持しておく．
+        # ID はリストの場合は `None` ．
+        self._transport = transport
+        self.__batch_size = batch_size
+        self.__prefetched = deque()
+
+        # キーは `session` ごとに分かれる．
+        self._session = session
+        self._queue_key = _session_key('message_queue', session)
+        self._stream_key = _session_key('message_stream', session)
+        self._counts_key = _session_key('ignored_message_counts', session)
+
+        # `stream` の場合の状態．読み出し位置は `consumer` ごとに Redis に
+        # 保存し，次回はその続きから読み出す．保存する位置は取り出された
+        # メッセージのもので，先読みしただけのメッセージは含まない．
+        # 保存された位置が無ければ，その時点で最新のメッセージの次から
+        # 読み出す．保持されている最初のメッセージから読み出す場合は
+        # `seek` を使う．位置を Redis から読み込むまでは `None` ．
+        self._offset_key = _session_key('message_stream_offset', session) \
+            + f':{consumer}'
+        self.__read_position = None
+        self.__decoded_position = None
+        self.__stream_position = None
+        self.__committed_position = None
+        self.__committing_position = None
+
+        # 読み捨てるメッセージの名前． `RPA` の `ignored_messages` で
+        # 指定する．読み捨てたメッセージは名前を取り出すだけでデコード
+        # せずに数だけを数える．
+        self.__ignored_names = frozenset(ignored_names)
+        self.__ignored_counts: Dict[str, int] = {}
+
+        # 読み出したレコードをデコードする前に渡す先．記録用．
+        self.__record_hook: Optional[Callable[[bytes], None]] = None
+
     # account id が取得できる WebSocket メッセージ一覧
     __ACCOUNT_ID_MESSAGES = {
         '.lq.Lobby.oauth2Login': ['account_id'],
         '.lq.Lobby.createRoom': ['room', 'owner_id'],
     }
 
-    def dequeue_message(self, timeout: TimeoutType) -> Optional[Message]:
-        if isinstance(timeout, (int, float,)):
-            timeout = datetime.timedelta(seconds=timeout)
+    @property
+    def ignored_names(self) -> frozenset:
+        return self.__ignored_names
 
-        if timeout.total_seconds() <= 0.0:
+    def _merge_ignored_counts(
+        self, sniffer_counts: Dict[bytes, bytes]) -> Dict[str, int]:
+        # 読み捨てたメッセージの名前ごとの数．スニファの段階で
+        # 読み捨てられたものも含む．
+        counts = dict(self.__ignored_counts)
+        for name, count in sniffer_counts.items():
+            name = name.decode('UTF-8')
+            counts[name] = counts.get(name, 0) + int(count)
+        return counts
+
+    def _queue_load_offset(self, pipeline) -> None:
+        # 保存された読み出し位置と最新のメッセージの ID を読み込む
+        # コマンドを `pipeline` に積む．
+        pipeline.get(self._offset_key)
+        pipeline.xrevrange(self._stream_key, count=1)
+
+    def _restore_offset(self, result: list) -> None:
+        # `_queue_load_offset` で積んだコマンドの結果を取り込む．
+        position, latest = result
+        if position is None:
+            position = latest[0][0] if len(latest) > 0 else b'0-0'
+        self.__read_position = position
+        self.__stream_position = position
+        self.__committed_position = position
+
+    def _needs_offset(self) -> bool:
+        return self._transport == 'stream' and self.__read_position is None
+
+    def _lookahead_size(self) -> int:
+        return len(self.__lookahead)
+
+    def _set_record_hook(
+        self, hook: Optional[Callable[[bytes], None]]) -> None:
+        self.__record_hook = hook
+
+    def _has_prefetched(self) -> bool:
+        return len(self.__prefetched) > 0
+
+    def _pop_prefetched(self) -> bytes:
+        entry_id, message = self.__prefetched.popleft()
+        self.__decoded_position = entry_id
+        if self.__record_hook is not None:
+            self.__record_hook(message)
+        return message
+
+    def _extend_prefetched(self, messages: Iterable[bytes]) -> None:
+        # Redis 以外から読み出したレコードを取り込む．
+        self.__prefetched.extend((None, m) for m in messages)
+
+    def _take_prefetched(self) -> Optional[Message]:
+        # 通信せずに，読み出し済みのレコードから読み捨てないメッセージを
+        # 1件デコードして返す．読み出し済みのレコードが尽きたら `None` ．
+        while len(self.__prefetched) > 0:
+            message = self._decode_message(self._pop_prefetched())
+            if message is not None:
+                return message
+        return None
+
+    def _queue_prefetch(
+        self, pipeline, timeout: Optional[datetime.timedelta]) -> None:
+        # メッセージをまとめて読み出すコマンドを `pipeline` に積む．
+        # `timeout` が `None` の場合はブロックしない．同期版と非同期版の
+        # どちらのパイプラインでも同じように積める．
+        if self._transport == 'list':
+            if timeout is not None:
+                pipeline.blpop(self._queue_key, timeout.total_seconds())
+                if self.__batch_size > 1:
+                    pipeline.lpop(self._queue_key, self.__batch_size - 1)
+            else:
+                pipeline.lpop(self._queue_key, self.__batch_size)
+            return
+
+        # 前回までに読み出した位置の保存と，次のメッセージの
+        # まとめての読み出しを1往復で行う．
+        if timeout is not None:
+            block = max(int(timeout.total_seconds() * 1000.0), 1)
+        else:
+            block = None
+        self.__committing_position = None
+        if self.__committed_position != self.__stream_position:
+            pipeline.set(self._offset_key, self.__stream_position)
+            self.__committing_position = self.__stream_position
+        pipeline.xread(
+            {self._stream_key: self.__read_position},
+            count=self.__batch_size, block=block)
+
+    def _store_prefetched(
+        self, result: list, timeout: Optional[datetime.timedelta]) -> bool:
+        # `_queue_prefetch` で積んだコマンドの結果を取り込む．1件も
+        # 読み出せなかった場合は `False` を返す．
+        if self._transport == 'list':
+            if timeout is not None and result[0] is not None:
+                key, message = result[0]
+                assert(key.decode('UTF-8') == self._queue_key)
+                self.__prefetched.append((None, message))
+            if (timeout is None or self.__batch_size > 1) \
+               and result[-1] is not None:
+                self.__prefetched.extend((None, m) for m in result[-1])
+            return len(self.__prefetched) > 0
+
+        if self.__committing_position is not None:
+            self.__committed_position = self.__committing_position
+            self.__committing_position = None
+        if not result[-1]:
+            return False
+        _, entries = result[-1][0]
+        self.__prefetched.extend(
+            (entry_id, fields[b'data']) for entry_id, fields in entries)
+        if len(entries) > 0:
+            self.__read_position = entries[-1][0]
+        return len(self.__prefetched) > 0
+
+    def _uncommitted_offset(self) -> Optional[bytes]:
+        # 保存すべき読み出し位置．保存済みならば `None` ．
+        if self._transport != 'stream':
+            raise RuntimeError('Offsets are available only for `stream`.')
+        if self.__committed_position == self.__stream_position:
             return None
+        return self.__stream_position
 
-        if len(self.__put_back_messages) > 0:
-            return self.__put_back_messages.pop(0)
+    def _mark_committed(self, position: bytes) -> None:
+        self.__committed_position = position
 
-        message: Optional[Tuple[str, bytes]] = self.__redis.blpop(
-            'message_queue', timeout.total_seconds())
-        if message is None:
+    @property
+    def offset(self) -> Optional[str]:
+        # 最後に取り出したメッセージの ID ．
+        if self.__stream_position is None:
             return None
-        assert(message[0] == b'message_queue')
-        _, message = message
-
-        message = message.decode('UTF-8')
-        message = json.loads(message)
-        request_direction: str = message['request_direction']
-        request: str = message['request']
-        response: Optional[str] = message['response']
-        timestamp = message['timestamp']
-
-        # JSON 化するためにエンコードしていたデータをデコードする．
-        request = base64.b64decode(request)
-        if response is not None:
-            response = base64.b64decode(response)
-        timestamp = datetime.datetime.fromtimestamp(
-            timestamp, datetime.timezone.utc)
+        return self.__stream_position.decode('UTF-8')
+
+    def seek(self, message_id: str='0-0') -> None:
+        # `message_id` の次のメッセージから読み出し直す． `0-0` を指定すると
+        # 保持されている最初のメッセージから再処理する．
+        if self._transport != 'stream':
+            raise RuntimeError('Seeking is available only for `stream`.')
+        self.__prefetched.clear()
+        self.__lookahead.clear()
+        self.__read_position = message_id.encode('UTF-8')
+        self.__stream_position = self.__read_position
+
+    def _decode_message(self, message: bytes) -> Optional[Message]:
+        # 読み捨てるメッセージの場合は `None` を返す．
+        if message.startswith(_RECORD_MAGIC):
+            request_direction, request, response, timestamp \
+                = _decode_record(message)
+        else:
+            message = message.decode('UTF-8')
+            message = json.loads(message)
+            request_direction: str = message['request_direction']
+            request: str = message['request']
+            response: Optional[str] = message['response']
+            timestamp = message['timestamp']
+
+            # JSON 化するためにエンコードしていたデータをデコードする．
+            request = base64.b64decode(request)
+            if response is not None:
+                response = base64.b64decode(response)
+            timestamp = datetime.datetime.fromtimestamp(
+                timestamp, datetime.timezone.utc)
 
         def _unwrap_message(message) -> Tuple[str, bytes]:
             wrapper = mahjongsoul_pb2.Wrapper()
@@ -86,6 +373,10 @@ class Redis(object):
         else:
             raise RuntimeError(f'{request[0]}: unknown request type.')
 
+        if name in self.__ignored_names:
+            self.__ignored_counts[name] = self.__ignored_counts.get(name, 0) + 1
+            return None
+
         if response is not None:
             if response[0] != 3:
                 raise RuntimeError(f'{response[0]}: unknown response type.')
@@ -93,12 +384,12 @@ class Redis(object):
             if _ != '':
                 raise RuntimeError(f'{_}: unknown response name.')
 
-        # Protocol Buffers メッセージを JSONizable object 形式に変換する．
+        # Protocol Buffers メッセージを JSONizable object 形式のビューに
+        # 変換する．パースと変換は要素が最初に参照された時に行う．
         def _jsonize(name: str, data: bytes, is_response: bool) -> object:
+            classes = get_message_classes(name)
             if is_response:
-                try:
-                    parser = self.__message_type_map[name][1]()
-                except IndexError as e:
+                if classes is None or classes[1] is None:
                     proc = subprocess.run(
                         ['protoc', '--decode_raw'], input=data,
                         capture_output=True)
@@ -114,9 +405,7 @@ Output of `protoc --decode_raw`
 ===============================
 {stdout}''')
             else:
-                try:
-                    parser = self.__message_type_map[name][0]()
-                except KeyError as e:
+                if classes is None:
                     proc = subprocess.run(
                         ['protoc', '--decode_raw'], input=data,
                         capture_output=True)
@@ -131,23 +420,19 @@ Output of `protoc --decode_raw`
 Output of `protoc --decode_raw`
 ===============================
 {stdout}''')
-            parser.ParseFromString(data)
-
-            jsonized = google.protobuf.json_format.MessageToDict(
-                parser, including_default_value_fields=True,
-                preserving_proto_field_name=True)
-            return jsonized
+            message_class = classes[1] if is_response else classes[0]
+            return LazyMessageView(message_class, data)
 
         request = _jsonize(name, request, False)
         if response is not None:
             response = _jsonize(name, response, True)
 
         # account id が載っているメッセージなら account id を抽出する．
-        if name in Redis.__ACCOUNT_ID_MESSAGES:
+        if name in _MessageQueueBase.__ACCOUNT_ID_MESSAGES:
             if response is None:
                 raise RuntimeError('Message without any response.')
             account_id = response
-            keys = Redis.__ACCOUNT_ID_MESSAGES[name]
+            keys = _MessageQueueBase.__ACCOUNT_ID_MESSAGES[name]
             for key in keys:
                 if key not in account_id:
                     raise RuntimeError(
@@ -162,8 +447,211 @@ Output of `protoc --decode_raw`
         return (request_direction, name, request, response, timestamp)
 
     def put_back(self, message: Message) -> None:
-        self.__put_back_messages.insert(0, message)
+        # 埋め戻したメッセージは取り出し済みとして扱い，読み出し位置は
+        # 戻さない．
+        self.__lookahead.appendleft((None, message))
+
+    def __push_lookahead(self, message: Message) -> None:
+        # 直前に `_take_prefetched` が返したメッセージを先読みに加える．
+        self.__lookahead.append((self.__decoded_position, message))
+
+    def __pop_lookahead(self) -> Message:
+        entry_id, message = self.__lookahead.popleft()
+        self.__consume(entry_id)
+        return message
+
+    def __consume(self, entry_id: Optional[bytes]) -> None:
+        # メッセージが取り出されたので，読み出し位置をそこまで進める．
+        if entry_id is not None:
+            self.__stream_position = entry_id
+
+    def _dequeue_message_steps(self, timeout: TimeoutType) -> _Steps:
+        if isinstance(timeout, (int, float,)):
+            timeout = datetime.timedelta(seconds=timeout)
+
+        if timeout.total_seconds() <= 0.0:
+            return None
+
+        if len(self.__lookahead) > 0:
+            return self.__pop_lookahead()
+
+        message = yield timeout
+        if message is not None:
+            self.__consume(self.__decoded_position)
+        return message
+
+    def _dequeue_many_steps(self, max_n: int, timeout: TimeoutType) -> _Steps:
+        # 最初の1件が届くまで最大 `timeout` だけ待ち，その時点で届いている
+        # メッセージを最大 `max_n` 件まとめて返す．
+        if max_n < 1:
+            raise ValueError(f'{max_n}: An invalid number of messages.')
+
+        messages = []
+        while len(self.__lookahead) > 0 and len(messages) < max_n:
+            messages.append(self.__pop_lookahead())
+        if len(messages) == 0:
+            message = yield from self._dequeue_message_steps(timeout)
+            if message is None:
+                return messages
+            messages.append(message)
+
+        # 残りはブロックせずに読み出す．
+        while len(messages) < max_n:
+            message = yield None
+            if message is None:
+                break
+            self.__consume(self.__decoded_position)
+            messages.append(message)
+
+        return messages
+
+    def _peek_many_steps(self, n: int, timeout: TimeoutType) -> _Steps:
+        # 次に取り出されるメッセージを取り出さずに最大 `n` 件返す．
+        # 先読みしたメッセージが1件も無い場合に限り，最初の1件が
+        # 届くまで最大 `timeout` だけ待つ．
+        if n < 1:
+            raise ValueError(f'{n}: An invalid number of messages.')
+
+        if len(self.__lookahead) == 0:
+            if isinstance(timeout, (int, float,)):
+                timeout = datetime.timedelta(seconds=timeout)
+            if timeout.total_seconds() <= 0.0:
+                return []
+            message = yield timeout
+            if message is None:
+                return []
+            self.__push_lookahead(message)
+        while len(self.__lookahead) < n:
+            message = yield None
+            if message is None:
+                break
+            self.__push_lookahead(message)
+
+        return [m for _, m in itertools.islice(self.__lookahead, n)]
+
+    def _peek_steps(self, timeout: TimeoutType) -> _Steps:
+        # 次に取り出されるメッセージを取り出さずに返す．
+        messages = yield from self._peek_many_steps(1, timeout)
+        if len(messages) == 0:
+            return None
+        return messages[0]
+
+    def _take_if_steps(
+        self, predicate: Callable[[Message], bool],
+        timeout: TimeoutType) -> _Steps:
+        # 次のメッセージが `predicate` を満たす場合に限りそれを取り出す．
+        # 満たさない場合は取り出さずに `None` を返す．
+        message = yield from self._peek_steps(timeout)
+        if message is None or not predicate(message):
+            return None
+        return self.__pop_lookahead()
+
+    def _run_steps(
+        self, steps: _Steps,
+        receive: Callable[[Optional[datetime.timedelta]], Optional[Message]]):
+        # 手順が要求する読み出しを `receive` で行いながら最後まで進め，
+        # その結果を返す．
+        try:
+            timeout = next(steps)
+            while True:
+                timeout = steps.send(receive(timeout))
+        except StopIteration as e:
+            return e.value
 
     @property
     def account_id(self) -> Optional[int]:
         return self.__account_id
+
+
+class Redis(_MessageQueueBase):
+    def __init__(
+        self, host='redis', port=6379, *,
+        ignored_names: Iterable[str]=(), transport: str='list',
+        consumer: str='default', batch_size: int=64,
+        session: Optional[str]=None) -> None:
+        super(Redis, self).__init__(
+            ignored_names=ignored_names, transport=transport,
+            consumer=consumer, batch_size=batch_size, session=session)
+        # Redis のコンテナが起動途中でも構築できるように，ここでは
+        # 通信しない．保存された読み出し位置は最初の読み出しの際に読み込む．
+        self.__redis = redis.Redis(host, port)
+
+    @property
+    def ignored_counts(self) -> Dict[str, int]:
+        return self._merge_ignored_counts(
+            self.__redis.hgetall(self._counts_key))
+
+    def wait_for_ready(self, name: str, timeout: TimeoutType) -> bool:
+        # `name` のコンテナ（ `sniffer` か `browser` ）の準備ができるまで
+        # 待つ．タイムアウトした場合は `False` を返す． `stream` の場合は
+        # 待つ間に届くメッセージを取りこぼさないように，待つ前に読み出し
+        # 位置を決めておく．
+        if isinstance(timeout, (int, float,)):
+            timeout = datetime.timedelta(seconds=timeout)
+        prepare = None
+        if self._needs_offset():
+            prepare = self.__load_offset
+        return _wait_for_ready(
+            self.__redis, _ready_key(name, self._session), timeout, prepare)
+
+    def dequeue_message(self, timeout: TimeoutType) -> Optional[Message]:
+        return self._run_steps(
+            self._dequeue_message_steps(timeout), self.__receive)
+
+    def dequeue_many(
+        self, max_n: int, timeout: TimeoutType) -> List[Message]:
+        return self._run_steps(
+            self._dequeue_many_steps(max_n, timeout), self.__receive)
+
+    def peek(self, timeout: TimeoutType) -> Optional[Message]:
+        return self._run_steps(self._peek_steps(timeout), self.__receive)
+
+    def peek_many(self, n: int, timeout: TimeoutType) -> List[Message]:
+        return self._run_steps(
+            self._peek_many_steps(n, timeout), self.__receive)
+
+    def take_if(
+        self, predicate: Callable[[Message], bool],
+        timeout: TimeoutType) -> Optional[Message]:
+        return self._run_steps(
+            self._take_if_steps(predicate, timeout), self.__receive)
+
+    def __receive(
+        self, timeout: Optional[datetime.timedelta]) -> Optional[Message]:
+        # `timeout` が `None` の場合はブロックしない．
+        if timeout is not None:
+            deadline = datetime.datetime.now(datetime.timezone.utc) + timeout
+        while True:
+            message = self._take_prefetched()
+            if message is not None:
+                return message
+
+            if timeout is not None:
+                timeout = deadline \
+                    - datetime.datetime.now(datetime.timezone.utc)
+                if timeout.total_seconds() <= 0.0:
+                    return None
+            if not self.__prefetch(timeout):
+                return None
+
+    def __load_offset(self) -> None:
+        with self.__redis.pipeline(transaction=False) as pipeline:
+            self._queue_load_offset(pipeline)
+            self._restore_offset(pipeline.execute())
+
+    def __prefetch(self, timeout: Optional[datetime.timedelta]) -> bool:
+        if self._needs_offset():
+            self.__load_offset()
+        with self.__redis.pipeline(transaction=False) as pipeline:
+            self._queue_prefetch(pipeline, timeout)
+            result = pipeline.execute()
+        return self._store_prefetched(result, timeout)
+
+    def commit_offset(self) -> None:
+        # 読み出し位置を直ちに Redis に保存する．
+        if self._needs_offset():
+            return
+        position = self._uncommitted_offset()
+        if position is not None:
+            self.__redis.set(self._offset_key, position)
+            self._mark_committed(position)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+
+import gzip
+import time
+import bisect
+import struct
+import datetime
+import threading
+from pathlib import Path
+from typing import (Optional, Tuple, List, Dict, Union, Iterable, Callable,)
+import numpy
+import PIL.Image
+from PIL.Image import Image
+import cv2
+from majsoul_rpa.common import TimeoutType
+from majsoul_rpa._impl.redis import (Message, _MessageQueueBase)
+from majsoul_rpa._impl.browser import BrowserBase
+from majsoul_rpa._impl.frame_buffer import next_sequence
+
+
+# 記録のファイル形式．ファイル全体を gzip で圧縮する．
+#
+#   magic (4 bytes) | version (1 byte)
+#   | (type (1 byte) | timestamp [ns] (8 bytes) | length (4 bytes)
+#      | payload) *
+#
+# type が `_ENTRY_MESSAGE` のエントリの payload は `message_queue` から
+# 読み出したレコードそのもの， `_ENTRY_FRAME` のエントリの payload は
+# スクリーンショットの PNG ．タイムスタンプはボットがそれらを読み出した
+# 時刻．
+_ARCHIVE_MAGIC = b'MRRP'
+_ARCHIVE_VERSION = 1
+_ARCHIVE_HEADER = struct.Struct('!4sB')
+_ENTRY_PREFIX = struct.Struct('!BQI')
+_ENTRY_MESSAGE = 1
+_ENTRY_FRAME = 2
+
+
+class ArchiveWriter(object):
+    def __init__(self, path: Union[str, Path]) -> None:
+        # 同じ内容からは同じバイト列ができるように，ヘッダの時刻は 0 にする．
+        self.__file = gzip.GzipFile(path, 'wb', mtime=0)
+        self.__file.write(
+            _ARCHIVE_HEADER.pack(_ARCHIVE_MAGIC, _ARCHIVE_VERSION))
+        self.__lock = threading.Lock()
+
+    def __write(self, type_: int, timestamp: int, payload: bytes) -> None:
+        prefix = _ENTRY_PREFIX.pack(type_, timestamp, len(payload))
+        with self.__lock:
+            if self.__file is None:
+                raise RuntimeError('The archive has already been closed.')
+            self.__file.write(prefix)
+            self.__file.write(payload)
+
+    def write_message(self, timestamp: int, message: bytes) -> None:
+        self.__write(_ENTRY_MESSAGE, timestamp, message)
+
+    def write_frame(self, timestamp: int, image: numpy.ndarray) -> None:
+        # BGR 形式の画像を可逆圧縮して書く．
+        success, png = cv2.imencode('.png', image)
+        if not success:
+            raise RuntimeError('Failed to encode a screenshot.')
+        self.__write(_ENTRY_FRAME, timestamp, png.tobytes())
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+
+
+def read_archive(
+    path: Union[str, Path]) -> Tuple[List[Tuple[int, bytes]],
+                                     List[Tuple[int, bytes]]]:
+    # 記録を読み込み，メッセージとスクリーンショットをそれぞれ
+    # (タイムスタンプ, payload) の列として返す．
+    with gzip.open(path, 'rb') as f:
+        data = f.read()
+    magic, version = _ARCHIVE_HEADER.unpack_from(data)
+    if magic != _ARCHIVE_MAGIC:
+        raise RuntimeError(f'{path}: An invalid archive.')
+    if version != _ARCHIVE_VERSION:
+        raise RuntimeError(f'{path}: {version}: An unsupported version.')
+
+    messages = []
+    frames = []
+    offset = _ARCHIVE_HEADER.size
+    view = memoryview(data)
+    while offset < len(data):
+        type_, timestamp, length = _ENTRY_PREFIX.unpack_from(data, offset)
+        offset += _ENTRY_PREFIX.size
+        payload = bytes(view[offset:offset + length])
+        if len(payload) != length:
+            raise RuntimeError(f'{path}: A truncated archive.')
+        offset += length
+        if type_ == _ENTRY_MESSAGE:
+            messages.append((timestamp, payload))
+        elif type_ == _ENTRY_FRAME:
+            frames.append((timestamp, payload))
+        else:
+            raise RuntimeError(f'{path}: {type_}: An unknown entry type.')
+    return (messages, frames)
+
+
+def _to_seconds(timeout: TimeoutType) -> float:
+    if isinstance(timeout, datetime.timedelta):
+        return timeout.total_seconds()
+    return float(timeout)
+
+
+class ReplayClock(object):
+    # 再生中の時刻（記録のタイムスタンプと同じ単位の ns ）．メッセージや
+    # フレームを待つ呼び出しがあった場合は，実際に待たずに待ち終わる
+    # 時刻まで飛ぶ．さらに `speed` が正の場合は実時間の `speed` 倍の
+    # 速さでも進む． `speed` が 0 の場合は呼び出しだけで進むので，
+    # 同じ記録を同じ手順で再生すれば常に同じ結果になる．
+    def __init__(self, start: int, speed: float=0.0) -> None:
+        if speed < 0.0:
+            raise ValueError(f'{speed}: An invalid speed.')
+        self.__start = start
+        self.__speed = speed
+        self.__origin = None
+        self.__skipped = 0
+        self.__lock = threading.Lock()
+
+    def __now(self) -> int:
+        if self.__origin is None:
+            # 最初に参照された時に再生を始める．
+            self.__origin = time.monotonic_ns()
+        elapsed = (time.monotonic_ns() - self.__origin) * self.__speed
+        return self.__start + int(elapsed) + self.__skipped
+
+    def now(self) -> int:
+        with self.__lock:
+            return self.__now()
+
+    def wait_until(self, timestamp: int, timeout: TimeoutType) -> bool:
+        # 時刻 `timestamp` まで待つ．それまでに `timeout` 秒以上かかる場合は
+        # `timeout` 秒だけ進めて `False` を返す．
+        timeout = max(int(_to_seconds(timeout) * 1000000000.0), 0)
+        with self.__lock:
+            now = self.__now()
+            if timestamp <= now:
+                return True
+            if timestamp - now > timeout:
+                self.__skipped += timeout
+                return False
+            self.__skipped += timestamp - now
+            return True
+
+    def sleep(self, timeout: TimeoutType) -> None:
+        # 実際には待たずに `timeout` 秒だけ進める．
+        timeout = max(int(_to_seconds(timeout) * 1000000000.0), 0)
+        with self.__lock:
+            self.__skipped += timeout
+
+
+class ReplayRedis(_MessageQueueBase):
+    # `Redis` と同じインタフェースで，記録したメッセージを再生する．
+    # 記録したレコードは `Redis` と同じようにデコードして読み捨てる．
+    def __init__(
+        self, messages: List[Tuple[int, bytes]], clock: ReplayClock, *,
+        ignored_names: Iterable[str]=(), batch_size: int=64) -> None:
+        super(ReplayRedis, self).__init__(
+            ignored_names=ignored_names, transport='list',
+            consumer='default', batch_size=batch_size, session=None)
+        self.__timestamps = [t for t, _ in messages]
+        self.__messages = [m for _, m in messages]
+        self.__index = 0
+        self.__batch_size = batch_size
+        self.__clock = clock
+
+    @property
+    def exhausted(self) -> bool:
+        return self.__index == len(self.__messages) \
+            and not self._has_prefetched() and self._lookahead_size() == 0
+
+    @property
+    def ignored_counts(self) -> Dict[str, int]:
+        return self._merge_ignored_counts({})
+
+    def wait_for_ready(self, name: str, timeout: TimeoutType) -> bool:
+        return True
+
+    def dequeue_message(self, timeout: TimeoutType) -> Optional[Message]:
+        return self._run_steps(
+            self._dequeue_message_steps(timeout), self.__receive)
+
+    def dequeue_many(
+        self, max_n: int, timeout: TimeoutType) -> List[Message]:
+        return self._run_steps(
+            self._dequeue_many_steps(max_n, timeout), self.__receive)
+
+    def peek(self, timeout: TimeoutType) -> Optional[Message]:
+        return self._run_steps(self._peek_steps(timeout), self.__receive)
+
+    def peek_many(self, n: int, timeout: TimeoutType) -> List[Message]:
+        return self._run_steps(
+            self._peek_many_steps(n, timeout), self.__receive)
+
+    def take_if(
+        self, predicate: Callable[[Message], bool],
+        timeout: TimeoutType) -> Optional[Message]:
+        return self._run_steps(
+            self._take_if_steps(predicate, timeout), self.__receive)
+
+    def __receive(
+        self, timeout: Optional[datetime.timedelta]) -> Optional[Message]:
+        # 再生中の時刻で `timeout` だけ待つ．実時間では待たない．
+        # `timeout` が `None` の場合は待たない．
+        while True:
+            message = self._take_prefetched()
+            if message is not None:
+                return message
+
+            if timeout is None:
+                if not self.__prefetch():
+                    return None
+                continue
+            if self.__index == len(self.__messages):
+                self.__clock.sleep(timeout)
+                return None
+            start = self.__clock.now()
+            if not self.__clock.wait_until(
+                    self.__timestamps[self.__index], timeout):
+                return None
+            self.__prefetch()
+            timeout -= datetime.timedelta(
+                microseconds=(self.__clock.now() - start) // 1000)
+
+    def __prefetch(self) -> bool:
+        # 再生中の時刻までに届いているレコードを最大 `batch_size` 件
+        # 取り込む．
+        end = bisect.bisect_right(
+            self.__timestamps, self.__clock.now(), lo=self.__index)
+        end = min(end, self.__index + self.__batch_size)
+        if end == self.__index:
+            return False
+        self._extend_prefetched(self.__messages[self.__index:end])
+        self.__index = end
+        return True
+
+    def commit_offset(self) -> None:
+        pass
+
+
+class ReplayBrowser(BrowserBase):
+    # `BrowserBase` と同じインタフェースで，記録したスクリーンショットを
+    # 再生する．その時点より前で最新のスクリーンショットを返す．ブラウザの
+    # 操作は行わずに `actions` に記録するだけ．
+    #
+    # 同じスクリーンショットを続けて取得した場合は，画面が変わるまで
+    # ポーリングしているとみなして，次のスクリーンショットの時刻まで
+    # （最大 `poll_interval` 秒）再生中の時刻を進める．
+    def __init__(
+        self, frames: List[Tuple[int, bytes]], clock: ReplayClock,
+        poll_interval: float=1.0) -> None:
+        super(ReplayBrowser, self).__init__()
+        if len(frames) == 0:
+            raise ValueError('No screenshot is recorded.')
+        self.__timestamps = [t for t, _ in frames]
+        self.__frames = [f for _, f in frames]
+        # 同じフレームには同じ通し番号を振り，テンプレートマッチの
+        # キャッシュが効くようにする．
+        self.__sequences: Dict[int, int] = {}
+        self.__decoded: Tuple[int, Optional[numpy.ndarray]] = (-1, None)
+        self.__clock = clock
+        self.__poll_interval = poll_interval
+        self.__last_index = -1
+        self.__actions: List[Tuple[int, str, tuple]] = []
+
+    @property
+    def actions(self) -> List[Tuple[int, str, tuple]]:
+        # (再生中の時刻, 操作の名前, 引数) の列．
+        return self.__actions
+
+    def __record(self, name: str, *args) -> None:
+        self.__actions.append((self.__clock.now(), name, args))
+
+    def __current_index(self) -> int:
+        index = bisect.bisect_right(self.__timestamps, self.__clock.now())
+        return max(index - 1, 0)
+
+    def __get_frame(self, index: int) -> Tuple[int, numpy.ndarray]:
+        if index not in self.__sequences:
+            self.__sequences[index] = next_sequence()
+        decoded_index, image = self.__decoded
+        if decoded_index != index:
+            data = numpy.frombuffer(self.__frames[index], dtype=numpy.uint8)
+            image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+            image.flags.writeable = False
+            self.__decoded = (index, image)
+        return (self.__sequences[index], image)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.__current_index() == len(self.__frames) - 1
+
+    def fullscreen(self) -> None:
+        self.__record('fullscreen')
+
+    def activate(self) -> None:
+        self.__record('activate')
+
+    def refresh(self) -> None:
+        self.__record('refresh')
+
+    def write(self, message: str, interval: float) -> None:
+        self.__record('write', message, interval)
+
+    def press(self, keys: Union[str, Iterable[str]]) -> None:
+        if not isinstance(keys, str):
+            keys = tuple(keys)
+        self.__record('press', keys)
+
+    def press_hotkey(self, *args: str) -> None:
+        self.__record('press_hotkey', *args)
+
+    def move_to_region(
+        self, left: int, top: int, width: int, height: int,
+        edge_sigma: float=2.0, warp: bool=False) -> None:
+        self.__record('move_to_region', left, top, width, height)
+
+    def scroll(self, clicks: int) -> None:
+        self.__record('scroll', clicks)
+
+    def click_region(
+        self, left: int, top: int, width: int, height: int,
+        edge_sigma: float=2.0, warp: bool=False,
+        blocking: bool=True) -> None:
+        self.__record('click_region', left, top, width, height)
+
+    def _capture_screenshot(self) -> Image:
+        image = self._capture_raw_screenshot()
+        return PIL.Image.fromarray(numpy.ascontiguousarray(image[:, :, ::-1]))
+
+    def _capture_raw_screenshot(self) -> numpy.ndarray:
+        index = self.__current_index()
+        if index == self.__last_index and index + 1 < len(self.__frames):
+            if self.__clock.wait_until(
+                    self.__timestamps[index + 1], self.__poll_interval):
+                index += 1
+        self.__last_index = index
+        _, image = self.__get_frame(index)
+        return image
+
+    def start_capture(self, capacity: int=8, interval: float=0.0) -> None:
+        # 記録したスクリーンショットがキャプチャ済みのフレームの
+        # 代わりになるので，キャプチャのスレッドは走らせない．
+        pass
+
+    def stop_capture(self) -> None:
+        pass
+
+    def get_next_raw_screenshot(
+        self, sequence: int=-1,
+        timeout: TimeoutType=1.0) -> Tuple[int, numpy.ndarray]:
+        # 通し番号が `sequence` より新しいフレームを返す．無ければ次の
+        # フレームの時刻まで（最大 `timeout` 秒）再生中の時刻を進める．
+        index = self.__current_index()
+        current_sequence, image = self.__get_frame(index)
+        if current_sequence <= sequence:
+            if index + 1 == len(self.__frames):
+                raise RuntimeError('The recorded screenshots are exhausted.')
+            if self.__clock.wait_until(self.__timestamps[index + 1], timeout):
+                index += 1
+                current_sequence, image = self.__get_frame(index)
+        self.__last_index = index
+        self._notify_frame(image)
+        return (current_sequence, image)
+
+    def close(self) -> None:
+        self.__record('close')
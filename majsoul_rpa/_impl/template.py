@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 
+import os
 import re
+import hashlib
 import datetime
+import threading
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import (Union, Tuple, Iterable,)
+from typing import (Optional, Union, Tuple, List, Iterable, Callable,)
 import yaml
 import numpy
 import PIL.Image
@@ -25,10 +31,217 @@ def pil2opencv(image: Image) -> numpy.ndarray:
     return image
 
 
+def _combine_scores(
+    result1: numpy.ndarray, result2: numpy.ndarray) -> numpy.ndarray:
+    # スコアは `TM_CCOEFF_NORMED` と `1 - TM_SQDIFF_NORMED` の大きいほう．
+    numpy.subtract(1.0, result2, out=result2)
+    numpy.maximum(result1, result2, out=result1)
+    return result1
+
+
+def _plain_score_map(
+    image: numpy.ndarray, template: numpy.ndarray) -> numpy.ndarray:
+    result1: numpy.ndarray = cv2.matchTemplate(
+        image, template, cv2.TM_CCOEFF_NORMED)
+    result2: numpy.ndarray = cv2.matchTemplate(
+        image, template, cv2.TM_SQDIFF_NORMED)
+    return _combine_scores(result1, result2)
+
+
+def _umat_score_map(
+    image: numpy.ndarray, template: numpy.ndarray) -> numpy.ndarray:
+    # Transparent API を介して OpenCL デバイス（CPU の ICD を含む）で
+    # 照合する． OpenCL が使えない環境では CPU で実行される．
+    image = cv2.UMat(image)
+    template = cv2.UMat(template)
+    result1 = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    result2 = cv2.matchTemplate(image, template, cv2.TM_SQDIFF_NORMED)
+    return _combine_scores(result1.get(), result2.get())
+
+
+_TILE_EXECUTOR = None
+_TILE_EXECUTOR_LOCK = threading.Lock()
+
+
+def _get_tile_executor() -> ThreadPoolExecutor:
+    global _TILE_EXECUTOR
+    with _TILE_EXECUTOR_LOCK:
+        if _TILE_EXECUTOR is None:
+            _TILE_EXECUTOR = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                thread_name_prefix='template-match')
+        return _TILE_EXECUTOR
+
+
+def _tiled_score_map(
+    image: numpy.ndarray, template: numpy.ndarray) -> numpy.ndarray:
+    # 探索領域を横長の帯に分割し，スレッドプールで並列に照合する．
+    # `cv2.matchTemplate` は GIL を解放するので，スレッドで並列化できる．
+    num_rows = image.shape[0] - template.shape[0] + 1
+    num_tiles = min(os.cpu_count() or 1, num_rows)
+    if num_tiles <= 1:
+        return _plain_score_map(image, template)
+
+    bounds = [num_rows * i // num_tiles for i in range(num_tiles + 1)]
+    executor = _get_tile_executor()
+    futures = []
+    for i in range(num_tiles):
+        tile = image[bounds[i]:bounds[i + 1] + template.shape[0] - 1]
+        futures.append(executor.submit(_plain_score_map, tile, template))
+    return numpy.concatenate([f.result() for f in futures], axis=0)
+
+
+_MATCH_BACKENDS = {
+    'plain': _plain_score_map,
+    'umat': _umat_score_map,
+    'tiled': _tiled_score_map,
+}
+
+
+def _select_match_backend(name: str):
+    if name not in _MATCH_BACKENDS:
+        raise ValueError(f'{name}: An unknown match backend.')
+    if name == 'umat':
+        cv2.ocl.setUseOpenCL(True)
+    return _MATCH_BACKENDS[name]
+
+
+# 照合の実装はプロセスごとに環境変数か `Template.set_match_backend` で
+# 選択する．
+_MATCH_BACKEND_NAME = os.environ.get('MAJSOUL_RPA_MATCH_BACKEND', 'plain')
+_MATCH_BACKEND = _select_match_backend(_MATCH_BACKEND_NAME)
+
+
+def _best_match_location(
+    image: numpy.ndarray, template: numpy.ndarray) -> Tuple[int, int, float]:
+    result = _MATCH_BACKEND(image, template)
+
+    # 最大スコアを取る位置が複数ある場合は x が最小のもの，その中で
+    # y が最小のものを選ぶ（画素を x 優先で走査していた旧実装と同じ）．
+    # `cv2.minMaxLoc` は行優先で最初の最大値を返すので，転置してから
+    # 適用する．
+    _, max_score, _, (argmax_y, argmax_x) = cv2.minMaxLoc(
+        cv2.transpose(result))
+
+    return (argmax_x, argmax_y, max_score)
+
+
+def _crop(
+    image: numpy.ndarray, left: int, top: int, width: int,
+    height: int) -> numpy.ndarray:
+    if left >= 0 and top >= 0 and left + width <= image.shape[1] \
+       and top + height <= image.shape[0]:
+        # コピーせずにビューを返す．
+        return image[top:top + height, left:left + width]
+
+    # `PIL.Image.Image.crop` と同様に，画像の外側は黒で埋める．
+    result = numpy.zeros(
+        (max(height, 0), max(width, 0)) + image.shape[2:], dtype=image.dtype)
+    x0 = max(left, 0)
+    y0 = max(top, 0)
+    x1 = min(left + width, image.shape[1])
+    y1 = min(top + height, image.shape[0])
+    if x0 < x1 and y0 < y1:
+        result[y0 - top:y1 - top, x0 - left:x1 - left] = image[y0:y1, x0:x1]
+    return result
+
+
+async def _async_poll_until(
+    browser: 'AsyncRemoteBrowser', deadline: datetime.datetime,
+    match: Callable[['Frame'], Optional[object]], message: str) -> object:
+    # `match` が `None` 以外を返すまでスクリーンショットを取り続ける．
+    # 照合はイベントループを止めないように別スレッドで行う．期限が来たら
+    # 応答待ちの要求ごとキャンセルして `Timeout` を送出する．
+    async def poll() -> object:
+        sequence = -1
+        while True:
+            sequence, screenshot = await browser.get_next_raw_screenshot(
+                sequence)
+            result = await asyncio.to_thread(match, Frame(screenshot, sequence))
+            if result is not None:
+                return result
+
+    timeout = deadline - datetime.datetime.now(datetime.timezone.utc)
+    try:
+        return await asyncio.wait_for(
+            poll(), max(timeout.total_seconds(), 0.0))
+    except asyncio.TimeoutError:
+        from majsoul_rpa.presentation import Timeout
+        raise Timeout(message, await browser.get_screenshot())
+
+
+class Frame(object):
+    # 1枚のスクリーンショットを複数のテンプレートで走査する際に，
+    # BGR 形式への変換を1回で済ませるためのクラス． `sequence` は
+    # `BrowserBase.get_next_raw_screenshot` が返すフレームの通し番号．
+    def __init__(
+        self, screenshot: Union[Image, numpy.ndarray],
+        sequence: Optional[int]=None) -> None:
+        self.__sequence = sequence
+        if isinstance(screenshot, numpy.ndarray):
+            # BGR 形式に変換済みのもの．
+            self.__screenshot = None
+            self.__image = screenshot
+            self.__width = screenshot.shape[1]
+            self.__height = screenshot.shape[0]
+        else:
+            self.__screenshot = screenshot
+            self.__image = None
+            self.__width = screenshot.width
+            self.__height = screenshot.height
+        self.__crops = {}
+        self.__pyramid = None
+
+    @property
+    def sequence(self) -> Optional[int]:
+        return self.__sequence
+
+    @property
+    def width(self) -> int:
+        return self.__width
+
+    @property
+    def height(self) -> int:
+        return self.__height
+
+    @property
+    def image(self) -> numpy.ndarray:
+        if self.__image is None:
+            self.__image = pil2opencv(self.__screenshot)
+            self.__crops.clear()
+        return self.__image
+
+    def crop(self, left: int, top: int, width: int, height: int) -> numpy.ndarray:
+        if self.__image is None:
+            box = (left, top, left + width, top + height)
+            if box in self.__crops:
+                return self.__crops[box]
+            if width * height * 4 < self.__width * self.__height:
+                # 狭い領域は全体を変換せずにその領域だけを変換する．
+                image = pil2opencv(self.__screenshot.crop(box=box))
+                self.__crops[box] = image
+                return image
+        return _crop(self.image, left, top, width, height)
+
+    def pyramid(self, level: int) -> numpy.ndarray:
+        # 縦横を 1/2^`level` に縮小した画像．全てのテンプレートで共有する．
+        if self.__pyramid is None:
+            self.__pyramid = [self.image]
+        while len(self.__pyramid) <= level:
+            self.__pyramid.append(cv2.pyrDown(self.__pyramid[-1]))
+        return self.__pyramid[level]
+
+
 class Template(object):
     def __init__(
         self, path: Path, *, left: int=0, top: int=0, width: int=1920,
-        height: int=1080, threshold: float=0.99) -> None:
+        height: int=1080, threshold: float=0.99, pyramid_levels: int=0,
+        pyramid_margin: Optional[int]=None) -> None:
+        if pyramid_levels < 0:
+            raise ValueError(f'{pyramid_levels}: An invalid pyramid level.')
+        if pyramid_margin is not None and pyramid_margin < 0:
+            raise ValueError(f'{pyramid_margin}: An invalid pyramid margin.')
+
         self.__path = path
         self.__left = left
         self.__top = top
@@ -36,14 +249,47 @@ class Template(object):
         self.__height = height
         self.__threshold = threshold
 
+        # テンプレート画像はマッチングのたびに読み込み直さず，BGR 形式に
+        # 変換したものを保持する．複数の呼び出し元で共有されるので
+        # 書き換えられないようにしておく．
+        with PIL.Image.open(path) as image:
+            self.__image = pil2opencv(image)
+        self.__image.flags.writeable = False
+
+        # `pyramid_levels` が正の場合，縦横を 1/2^`pyramid_levels` に
+        # 縮小した画像で大まかな位置を探索した後，その周囲
+        # `pyramid_margin` 画素の範囲だけを元の解像度で探索し直す．
+        self.__pyramid_levels = pyramid_levels
+        if pyramid_margin is None:
+            pyramid_margin = 2 << pyramid_levels
+        self.__pyramid_margin = pyramid_margin
+        self.__coarse_image = None
+        if pyramid_levels > 0:
+            image = self.__image
+            for _ in range(pyramid_levels):
+                image = cv2.pyrDown(image)
+            image.flags.writeable = False
+            self.__coarse_image = image
+
+        # 直前の照合結果．探索領域の画素が前回と同じであれば照合を省き，
+        # 前回のスコアを再利用する． (通し番号, 探索領域のダイジェスト,
+        # 照合結果) の組．
+        self.__score_cache = None
+        self.__score_cache_lock = threading.Lock()
+        self.__cache_hits = 0
+        self.__cache_misses = 0
+
     @staticmethod
-    def open(name_or_path: Union[str, Path]) -> 'Template':
+    def _load(name_or_path: Union[str, Path]) -> Tuple['Template', List[Path]]:
+        # テンプレートを読み込み，読み込んだファイルの一覧とともに返す．
         if isinstance(name_or_path, str):
             if not Path(f'{name_or_path}.yaml').exists():
                 if Path(f'{name_or_path}.png').exists():
-                    return Template(Path(f'{name_or_path}.png'))
+                    path = Path(f'{name_or_path}.png')
+                    return (Template(path), [path])
                 if name_or_path.endswith('.png'):
-                    return Template(Path(f'{name_or_path}'))
+                    path = Path(f'{name_or_path}')
+                    return (Template(path), [path])
                 if not name_or_path.endswith('.yaml'):
                     raise ValueError(f'{name_or_path}: an invalid template.')
                 path = Path(name_or_path)
@@ -54,7 +300,7 @@ class Template(object):
         if not path.exists():
             raise ValueError(f'{path}: does not exist.')
         if str(path).endswith('.png'):
-            return Template(path)
+            return (Template(path), [path])
 
         with open(path, encoding='UTF-8') as f:
             config = yaml.load(f, Loader=yaml.Loader)
@@ -71,17 +317,68 @@ class Template(object):
         if not png_path.exists():
             raise RuntimeError(f'{png_path}: does not exist.')
 
-        return Template(png_path, **config)
+        return (Template(png_path, **config), [path, png_path])
+
+    @staticmethod
+    def open(name_or_path: Union[str, Path]) -> 'Template':
+        return _TEMPLATE_REGISTRY.get(name_or_path)
 
-    def best_template_match(self, screenshot: Image) -> Tuple[int, int, float]:
-        box = (
-            self.__left, self.__top,
-            self.__left + self.__width, self.__top + self.__height)
-        image = screenshot.crop(box=box)
-        image = pil2opencv(image)
+    @staticmethod
+    def preload(directory: Union[str, Path]='template') -> None:
+        _TEMPLATE_REGISTRY.preload(directory)
 
-        template = PIL.Image.open(self.__path)
-        template = pil2opencv(template)
+    @staticmethod
+    def invalidate(name_or_path: Optional[Union[str, Path]]=None) -> None:
+        _TEMPLATE_REGISTRY.invalidate(name_or_path)
+
+    @staticmethod
+    def get_match_backend() -> str:
+        return _MATCH_BACKEND_NAME
+
+    @staticmethod
+    def set_match_backend(name: str) -> None:
+        global _MATCH_BACKEND_NAME, _MATCH_BACKEND
+        _MATCH_BACKEND = _select_match_backend(name)
+        _MATCH_BACKEND_NAME = name
+
+    @property
+    def path(self) -> Path:
+        return self.__path
+
+    @property
+    def region(self) -> Tuple[int, int, int, int]:
+        return (self.__left, self.__top, self.__width, self.__height)
+
+    @property
+    def threshold(self) -> float:
+        return self.__threshold
+
+    @property
+    def image(self) -> numpy.ndarray:
+        return self.__image
+
+    @property
+    def cache_hits(self) -> int:
+        return self.__cache_hits
+
+    @property
+    def cache_misses(self) -> int:
+        return self.__cache_misses
+
+    def clear_cache(self) -> None:
+        with self.__score_cache_lock:
+            self.__score_cache = None
+            self.__cache_hits = 0
+            self.__cache_misses = 0
+
+    def best_template_match(
+        self, screenshot: Union[Image, numpy.ndarray, 'Frame']) -> Tuple[int, int, float]:
+        if not isinstance(screenshot, Frame):
+            screenshot = Frame(screenshot)
+        image = screenshot.crop(
+            self.__left, self.__top, self.__width, self.__height)
+
+        template = self.__image
 
         if template.shape[0] == 0:
             raise ValueError('The height of the template is equal to 0.')
@@ -96,37 +393,92 @@ class Template(object):
                 f"The width of the screenshot ({image.shape[1]}) is smaller"
                 f" than the template's ({template.shape[1]}).")
 
-        result1: numpy.ndarray = cv2.matchTemplate(
-            image, template, cv2.TM_CCOEFF_NORMED)
-        result2: numpy.ndarray = cv2.matchTemplate(
-            image, template, cv2.TM_SQDIFF_NORMED)
-
-        argmax_x = 0
-        argmax_y = 0
-        max_score = result1[0, 0]
-        for x in range(result1.shape[1]):
-            for y in range(result1.shape[0]):
-                score = max(result1[y, x], 1.0 - result2[y, x])
-                if score > max_score:
-                    argmax_x = x
-                    argmax_y = y
-                    max_score = score
-
-        return (self.__left + argmax_x, self.__top + argmax_y, max_score)
-
-    def match(self, screenshot: Image) -> bool:
+        # 同じフレーム，あるいは探索領域の画素が前回と変わっていない
+        # フレームに対しては前回の結果を返す．
+        sequence = screenshot.sequence
+        digest = None
+        with self.__score_cache_lock:
+            cache = self.__score_cache
+            if cache is not None and sequence is not None \
+               and cache[0] == sequence:
+                self.__cache_hits += 1
+                return cache[2]
+        digest = hashlib.blake2b(
+            numpy.ascontiguousarray(image), digest_size=16).digest()
+        with self.__score_cache_lock:
+            cache = self.__score_cache
+            if cache is not None and cache[1] == digest:
+                self.__score_cache = (sequence, digest, cache[2])
+                self.__cache_hits += 1
+                return cache[2]
+            self.__cache_misses += 1
+
+        result = None
+        if self.__pyramid_levels > 0:
+            result = self.__coarse_to_fine_match(screenshot)
+        if result is None:
+            argmax_x, argmax_y, max_score = _best_match_location(
+                image, template)
+            result = (self.__left + argmax_x, self.__top + argmax_y, max_score)
+
+        with self.__score_cache_lock:
+            self.__score_cache = (sequence, digest, result)
+        return result
+
+    def __coarse_to_fine_match(
+        self, screenshot: 'Frame') -> Optional[Tuple[int, int, float]]:
+        level = self.__pyramid_levels
+        scale = 1 << level
+
+        # 縮小画像での探索．テンプレートが小さくなりすぎる場合は
+        # 縮小画像での探索を諦める．
+        coarse_template = self.__coarse_image
+        if coarse_template.shape[0] < 4 or coarse_template.shape[1] < 4:
+            return None
+        coarse_left = self.__left // scale
+        coarse_top = self.__top // scale
+        coarse_width = (self.__left + self.__width) // scale - coarse_left
+        coarse_height = (self.__top + self.__height) // scale - coarse_top
+        coarse_image = _crop(
+            screenshot.pyramid(level), coarse_left, coarse_top, coarse_width,
+            coarse_height)
+        if coarse_image.shape[0] < coarse_template.shape[0] \
+           or coarse_image.shape[1] < coarse_template.shape[1]:
+            return None
+        x, y, _ = _best_match_location(coarse_image, coarse_template)
+
+        # 元の解像度での探索．探索領域の座標系で窓を求める．
+        x = (coarse_left + x) * scale - self.__left
+        y = (coarse_top + y) * scale - self.__top
+        margin = self.__pyramid_margin
+        template_height, template_width = self.__image.shape[:2]
+        x0 = max(x - margin, 0)
+        y0 = max(y - margin, 0)
+        x1 = min(x + template_width + scale + margin, self.__width)
+        y1 = min(y + template_height + scale + margin, self.__height)
+        if x1 - x0 < template_width or y1 - y0 < template_height:
+            return None
+        image = screenshot.crop(
+            self.__left + x0, self.__top + y0, x1 - x0, y1 - y0)
+        x, y, score = _best_match_location(image, self.__image)
+
+        return (self.__left + x0 + x, self.__top + y0 + y, score)
+
+    def match(self, screenshot: Union[Image, numpy.ndarray, 'Frame']) -> bool:
         x, y, score = self.best_template_match(screenshot)
         return score >= self.__threshold
 
     def wait_until(
         self, browser: BrowserBase, deadline: datetime.datetime) -> None:
+        sequence = -1
         while True:
             if datetime.datetime.now(datetime.timezone.utc) > deadline:
                 from majsoul_rpa.presentation import Timeout
                 raise Timeout(
                     f'Timeout in waiting {self.__path}',
                     browser.get_screenshot())
-            if self.match(browser.get_screenshot()):
+            sequence, screenshot = browser.get_next_raw_screenshot(sequence)
+            if self.match(Frame(screenshot, sequence)):
                 break
 
     def wait_for(self, browser: BrowserBase, timeout: TimeoutType) -> None:
@@ -137,23 +489,25 @@ class Template(object):
         self.wait_until(browser, deadline)
 
     def click(self, browser: BrowserBase, edge_sigma: float=0.2) -> None:
-        x, y, score = self.best_template_match(browser.get_screenshot())
-        with PIL.Image.open(self.__path) as image:
-            browser.click_region(x, y, image.width, image.height, edge_sigma)
+        x, y, score = self.best_template_match(browser.get_raw_screenshot())
+        height, width = self.__image.shape[:2]
+        browser.click_region(x, y, width, height, edge_sigma)
 
     def wait_until_then_click(
         self, browser: BrowserBase, deadline: datetime.datetime,
         edge_sigma: float=0.2) -> None:
+        sequence = -1
         while True:
             if datetime.datetime.now(datetime.timezone.utc) > deadline:
                 from majsoul_rpa.presentation import Timeout
                 raise Timeout('Timeout', browser.get_screenshot())
-            x, y, score = self.best_template_match(browser.get_screenshot())
+            sequence, screenshot = browser.get_next_raw_screenshot(sequence)
+            x, y, score = self.best_template_match(Frame(screenshot, sequence))
             if score >= self.__threshold:
                 break
 
-        with PIL.Image.open(self.__path) as image:
-            browser.click_region(x, y, image.width, image.height, edge_sigma)
+        height, width = self.__image.shape[:2]
+        browser.click_region(x, y, width, height, edge_sigma)
 
     def wait_for_then_click(
         self, rpa_or_browser, timeout: TimeoutType,
@@ -170,30 +524,28 @@ class Template(object):
             edge_sigma)
 
     @staticmethod
-    def match_one_of(screenshot: Image, templates: Iterable[Image]) -> int:
-        for i in range(len(templates)):
-            template = Template.open(templates[i])
-            if template.match(screenshot):
-                return i
-        return -1
+    def match_one_of(
+        screenshot: Union[Image, numpy.ndarray, 'Frame'],
+        templates: Iterable[Union[str, Path, 'Template']]) -> int:
+        return TemplateSet(templates).match_one_of(screenshot)
 
     @staticmethod
     def wait_until_one_of_then_click(
         templates: Iterable['Template'], browser: BrowserBase,
         deadline: datetime.datetime, edge_sigma: float=0.2) -> None:
+        sequence = -1
         while True:
             if datetime.datetime.now(datetime.timezone.utc) > deadline:
                 from majsoul_rpa.presentation import Timeout
                 raise Timeout('Timeout', browser.get_screenshot())
 
-            screenshot = browser.get_screenshot()
-            match = False
+            sequence, screenshot = browser.get_next_raw_screenshot(sequence)
+            screenshot = Frame(screenshot, sequence)
             for template in templates:
                 x, y, score = template.best_template_match(screenshot)
                 if score >= template.__threshold:
-                    with PIL.Image.open(template.__path) as image:
-                        browser.click_region(
-                            x, y, image.width, image.height, edge_sigma)
+                    height, width = template.__image.shape[:2]
+                    browser.click_region(x, y, width, height, edge_sigma)
                     return
 
     @staticmethod
@@ -205,3 +557,201 @@ class Template(object):
         deadline = datetime.datetime.now(datetime.timezone.utc) + timeout
         Template.wait_until_one_of_then_click(
             templates, browser, deadline, edge_sigma)
+
+    # 以下は `AsyncRemoteBrowser` 向けの asyncio 版．
+
+    def __match_location(self, frame: Frame) -> Optional[Tuple[int, int]]:
+        x, y, score = self.best_template_match(frame)
+        if score < self.__threshold:
+            return None
+        return (x, y)
+
+    async def async_wait_until(
+        self, browser: 'AsyncRemoteBrowser',
+        deadline: datetime.datetime) -> None:
+        await _async_poll_until(
+            browser, deadline, self.__match_location,
+            f'Timeout in waiting {self.__path}')
+
+    async def async_wait_for(
+        self, browser: 'AsyncRemoteBrowser', timeout: TimeoutType) -> None:
+        if isinstance(timeout, (int, float,)):
+            timeout = datetime.timedelta(seconds=timeout)
+
+        deadline = datetime.datetime.now(datetime.timezone.utc) + timeout
+        await self.async_wait_until(browser, deadline)
+
+    async def async_click(
+        self, browser: 'AsyncRemoteBrowser', edge_sigma: float=0.2) -> None:
+        screenshot = await browser.get_raw_screenshot()
+        x, y, score = await asyncio.to_thread(
+            self.best_template_match, screenshot)
+        height, width = self.__image.shape[:2]
+        await browser.click_region(x, y, width, height, edge_sigma)
+
+    async def async_wait_until_then_click(
+        self, browser: 'AsyncRemoteBrowser', deadline: datetime.datetime,
+        edge_sigma: float=0.2) -> None:
+        x, y = await _async_poll_until(
+            browser, deadline, self.__match_location, 'Timeout')
+        height, width = self.__image.shape[:2]
+        await browser.click_region(x, y, width, height, edge_sigma)
+
+    async def async_wait_for_then_click(
+        self, rpa_or_browser, timeout: TimeoutType,
+        edge_sigma: float=0.2) -> None:
+        from majsoul_rpa import AsyncRPA
+        if isinstance(rpa_or_browser, AsyncRPA):
+            browser = rpa_or_browser._get_browser()
+        else:
+            browser: 'AsyncRemoteBrowser' = rpa_or_browser
+        if isinstance(timeout, (int, float,)):
+            timeout = datetime.timedelta(seconds=timeout)
+        await self.async_wait_until_then_click(
+            browser, datetime.datetime.now(datetime.timezone.utc) + timeout,
+            edge_sigma)
+
+    @staticmethod
+    async def async_wait_until_one_of_then_click(
+        templates: Iterable['Template'], browser: 'AsyncRemoteBrowser',
+        deadline: datetime.datetime, edge_sigma: float=0.2) -> None:
+        templates = list(templates)
+
+        def match(frame: Frame) -> Optional[Tuple['Template', int, int]]:
+            for template in templates:
+                location = template.__match_location(frame)
+                if location is not None:
+                    return (template,) + location
+            return None
+
+        template, x, y = await _async_poll_until(
+            browser, deadline, match, 'Timeout')
+        height, width = template.__image.shape[:2]
+        await browser.click_region(x, y, width, height, edge_sigma)
+
+    @staticmethod
+    async def async_wait_for_one_of_then_click(
+        templates: Iterable['Template'], browser: 'AsyncRemoteBrowser',
+        timeout: TimeoutType, edge_sigma: float=0.2) -> None:
+        if isinstance(timeout, (int, float,)):
+            timeout = datetime.timedelta(seconds=timeout)
+        deadline = datetime.datetime.now(datetime.timezone.utc) + timeout
+        await Template.async_wait_until_one_of_then_click(
+            templates, browser, deadline, edge_sigma)
+
+
+class TemplateSet(object):
+    # 同じスクリーンショットに対して複数のテンプレートを走査する．
+    # スクリーンショットの変換はテンプレートの数によらず1回で済む．
+    def __init__(
+        self, templates: Iterable[Union[str, Path, Template]]) -> None:
+        self.__templates = tuple(
+            t if isinstance(t, Template) else Template.open(t)
+            for t in templates)
+
+    def __len__(self) -> int:
+        return len(self.__templates)
+
+    def __getitem__(self, index: int) -> Template:
+        return self.__templates[index]
+
+    def __iter__(self):
+        return iter(self.__templates)
+
+    def best_template_matches(
+        self, screenshot: Union[Image, numpy.ndarray, Frame], *,
+        first_hit: bool=False) -> List[Optional[Tuple[int, int, float]]]:
+        # テンプレートごとの (x, y, score) を返す． `first_hit` が真の場合，
+        # しきい値を超えるテンプレートが見つかった時点で打ち切り，
+        # 残りのテンプレートに対する結果は `None` とする．
+        if not isinstance(screenshot, Frame):
+            screenshot = Frame(screenshot)
+        results = [None] * len(self.__templates)
+        for i, template in enumerate(self.__templates):
+            results[i] = template.best_template_match(screenshot)
+            if first_hit and results[i][2] >= template.threshold:
+                break
+        return results
+
+    def match_one_of(self, screenshot: Union[Image, numpy.ndarray, Frame]) -> int:
+        results = self.best_template_matches(screenshot, first_hit=True)
+        for i, result in enumerate(results):
+            if result is None:
+                break
+            if result[2] >= self.__templates[i].threshold:
+                return i
+        return -1
+
+    def match_all(self, screenshot: Union[Image, numpy.ndarray, Frame]) -> bool:
+        if not isinstance(screenshot, Frame):
+            screenshot = Frame(screenshot)
+        for template in self.__templates:
+            if not template.match(screenshot):
+                return False
+        return True
+
+
+class _TemplateRegistry(object):
+    def __init__(self, capacity: int) -> None:
+        self.__capacity = capacity
+        # キーはテンプレート名（もしくはパス）を絶対パス化したもの．
+        # 値は `Template` とその読み込み元ファイルの絶対パスの組．
+        self.__templates = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def __get_key(name_or_path: Union[str, Path]) -> str:
+        # `os.path.abspath` はファイルシステムにアクセスしない．
+        return os.path.abspath(name_or_path)
+
+    def get(self, name_or_path: Union[str, Path]) -> Template:
+        key = _TemplateRegistry.__get_key(name_or_path)
+        with self.__lock:
+            if key in self.__templates:
+                self.__templates.move_to_end(key)
+                return self.__templates[key][0]
+
+        # ファイルの読み込みとデコードはロックの外で行う．
+        template, paths = Template._load(name_or_path)
+        paths = [_TemplateRegistry.__get_key(p) for p in paths]
+
+        with self.__lock:
+            if key in self.__templates:
+                # 他のスレッドが先に読み込んでいた場合．
+                self.__templates.move_to_end(key)
+                return self.__templates[key][0]
+            self.__templates[key] = (template, paths)
+            while len(self.__templates) > self.__capacity:
+                self.__templates.popitem(last=False)
+        return template
+
+    def preload(self, directory: Union[str, Path]) -> None:
+        directory = Path(directory)
+        if not directory.is_dir():
+            raise RuntimeError(f'{directory}: Not a directory.')
+
+        # 呼び出し元と同じく拡張子を除いた名前で登録する．
+        for path in sorted(directory.glob('**/*.yaml')):
+            self.get(str(path.with_suffix('')))
+        for path in sorted(directory.glob('**/*.png')):
+            if path.with_suffix('.yaml').exists():
+                continue
+            self.get(str(path.with_suffix('')))
+
+    def invalidate(self, name_or_path: Optional[Union[str, Path]]) -> None:
+        with self.__lock:
+            if name_or_path is None:
+                self.__templates.clear()
+                return
+
+            # 指定されたテンプレート自身に加えて，指定されたファイルを
+            # 読み込んでいるテンプレートも破棄する．
+            key = _TemplateRegistry.__get_key(name_or_path)
+            stale_keys = [
+                k for k, (_, paths) in self.__templates.items()
+                if k == key or key in paths]
+            for k in stale_keys:
+                del self.__templates[k]
+
+
+_TEMPLATE_REGISTRY = _TemplateRegistry(capacity=256)
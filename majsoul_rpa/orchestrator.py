@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import (Optional, Iterable, Callable, List, TypeVar,)
+from majsoul_rpa import (_DEFAULT_IGNORED_MESSAGES, RPA)
+from majsoul_rpa.pool import ContainerPool
+from majsoul_rpa._impl import Template
+
+
+Account = TypeVar('Account')
+Result = TypeVar('Result')
+
+
+class Orchestrator(object):
+    # 1つのホストで複数のアカウントのボットを同時に動かす． Redis と
+    # ヘッドレスブラウザのコンテナは `ContainerPool` で共有し，空いた
+    # ブラウザにアカウントを順に割り当てる．
+    def __init__(
+        self, num_browsers: int, redis_port: Optional[int]=None, *,
+        preload_templates: bool=False, capture: bool=False,
+        ignored_messages: Iterable[str]=_DEFAULT_IGNORED_MESSAGES,
+        message_transport: str='list') -> None:
+        self.__preload_templates = preload_templates
+        self.__capture = capture
+        self.__ignored_messages = tuple(ignored_messages)
+        self.__pool = ContainerPool(
+            num_browsers, redis_port, ignored_messages=self.__ignored_messages,
+            message_transport=message_transport)
+        self.__started = False
+
+    def __enter__(self) -> 'Orchestrator':
+        # テンプレート画像はプロセス全体で共有されるので，ここで1度だけ
+        # 読み込んでおく．
+        if self.__preload_templates:
+            Template.preload()
+        self.__pool.__enter__()
+        self.__started = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.__started = False
+        self.__pool.__exit__(exc_type, exc_value, traceback)
+
+    @property
+    def sessions(self) -> List[str]:
+        return self.__pool.sessions
+
+    def __run_session(
+        self, account: Account,
+        func: Callable[[RPA, Account], Result]) -> Result:
+        with RPA(
+            None, capture=self.__capture,
+            ignored_messages=self.__ignored_messages,
+            pool=self.__pool) as rpa:
+            return func(rpa, account)
+
+    def run(
+        self, accounts: Iterable[Account],
+        func: Callable[[RPA, Account], Result]) -> List[Result]:
+        # アカウントごとに `func(rpa, account)` を呼び出し，結果を
+        # `accounts` の順に返す．同時に動くのはブラウザの数までで，
+        # 残りのアカウントはブラウザが空くのを待つ． `func` が送出した
+        # 例外は全てのアカウントが終わった後に送出する．
+        if not self.__started:
+            raise RuntimeError('`Orchestrator` has not been started.')
+        with ThreadPoolExecutor(max_workers=self.__pool.size) as executor:
+            futures = [
+                executor.submit(self.__run_session, account, func)
+                for account in accounts]
+        return [future.result() for future in futures]
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+import uuid
+import queue
+import logging
+import datetime
+import threading
+from typing import (Optional, Iterable, List, Dict,)
+import docker
+import docker.errors
+import redis
+from majsoul_rpa import (_DEFAULT_IGNORED_MESSAGES, _sniffer_environment)
+from majsoul_rpa.common import TimeoutType
+from majsoul_rpa._impl.redis import (_ready_key, _wait_for_ready)
+
+
+class ContainerPool(object):
+    # 起動済みのヘッドレスブラウザ（とスニファ）のコンテナのプール．
+    # Redis は全てのセッションで1つを共有し，キーの名前空間をセッションごとに
+    # 分ける． `RPA(None, pool=pool)` はプールからセッションを借りて，
+    # 終わったら返す．返されたセッションのコンテナは前のアカウントの
+    # 状態を引き継がないように裏で入れ替える．
+    def __init__(
+        self, size: int, redis_port: Optional[int]=None, *,
+        ignored_messages: Iterable[str]=_DEFAULT_IGNORED_MESSAGES,
+        message_transport: str='list') -> None:
+        if size < 1:
+            raise ValueError(f'{size}: An invalid pool size.')
+        self.__id = uuid.uuid4()
+        self.__size = size
+        self.__redis_port = redis_port
+        self.__ignored_messages = tuple(ignored_messages)
+        self.__message_transport = message_transport
+        self.__docker_client = None
+        self.__docker_network = None
+        self.__redis_container = None
+        self.__redis = None
+        # セッションの名前からそのセッションのブラウザのコンテナへの表．
+        self.__browsers: Dict[str, object] = {}
+        self.__browsers_lock = threading.Lock()
+        # 貸し出せるセッション．
+        self.__free_sessions = queue.Queue()
+        # コンテナを入れ替え中のスレッド．
+        self.__recycle_threads: List[threading.Thread] = []
+        self.__recycle_threads_lock = threading.Lock()
+
+    def __enter__(self) -> 'ContainerPool':
+        try:
+            self.__start()
+        except BaseException:
+            # 途中まで起動したコンテナを止めてから例外を伝える．
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __start(self) -> None:
+        self.__docker_client = docker.from_env()
+
+        network_name = f'majsoul-rpa-{self.__id}'
+        self.__docker_network = self.__docker_client.networks.create(
+            network_name, check_duplicate=True)
+
+        # 全てのセッションで共有する Redis コンテナを走らせる．
+        if self.__redis_port is None:
+            self.__redis_container = self.__docker_client.containers.run(
+                'redis', auto_remove=True, detach=True, hostname='redis',
+                network=network_name)
+            self.__redis = redis.Redis('redis')
+        else:
+            self.__redis_container = self.__docker_client.containers.run(
+                'redis', auto_remove=True, detach=True, hostname='redis',
+                network=network_name, ports={'6379/tcp': self.__redis_port})
+            self.__redis = redis.Redis('localhost', self.__redis_port)
+
+        # ブラウザのコンテナは全て同時に起動し，準備ができるのは
+        # 貸し出す時に待つ．
+        for _ in range(self.__size):
+            session = uuid.uuid4().hex
+            container = self.__run_browser(session)
+            with self.__browsers_lock:
+                self.__browsers[session] = container
+            self.__free_sessions.put(session)
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # 入れ替え中のスレッドが新たに入れ替えを始めることがあるので，
+        # 入れ替え中のスレッドが無くなるまで待つ．
+        while True:
+            with self.__recycle_threads_lock:
+                threads = self.__recycle_threads
+                self.__recycle_threads = []
+            if len(threads) == 0:
+                break
+            for thread in threads:
+                thread.join()
+        with self.__browsers_lock:
+            containers = list(self.__browsers.values())
+            self.__browsers.clear()
+        for container in containers:
+            ContainerPool.__ignore_errors(container.stop)
+        self.__free_sessions = queue.Queue()
+        if self.__redis is not None:
+            self.__redis.close()
+            self.__redis = None
+        if self.__redis_container is not None:
+            ContainerPool.__ignore_errors(self.__redis_container.stop)
+            self.__redis_container = None
+        if self.__docker_network is not None:
+            ContainerPool.__ignore_errors(self.__docker_network.remove)
+            self.__docker_network = None
+        if self.__docker_client is not None:
+            self.__docker_client.close()
+            self.__docker_client = None
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    @property
+    def redis_port(self) -> Optional[int]:
+        return self.__redis_port
+
+    @property
+    def message_transport(self) -> str:
+        return self.__message_transport
+
+    @property
+    def sessions(self) -> List[str]:
+        with self.__browsers_lock:
+            return list(self.__browsers)
+
+    @staticmethod
+    def __ignore_errors(action) -> None:
+        # 後始末の1つが失敗しても残りの後始末は続ける．既に消えている
+        # コンテナやネットワークは後始末済みとみなす．
+        try:
+            action()
+        except docker.errors.NotFound:
+            pass
+        except Exception as e:
+            logging.exception(e)
+
+    def __run_browser(self, session: str):
+        environment = _sniffer_environment(
+            self.__ignored_messages, self.__message_transport, session)
+        return self.__docker_client.containers.run(
+            'majsoul-rpa-sniffer-headless', auto_remove=True, detach=True,
+            network=self.__docker_network.name, environment=environment)
+
+    def lease(self, timeout: TimeoutType=120.0) -> str:
+        # 準備ができたセッションを借りる．空いているセッションが無い場合は
+        # 返されるのを待つ．
+        if self.__docker_client is None:
+            raise RuntimeError('`ContainerPool` has not been started.')
+        if isinstance(timeout, (int, float,)):
+            timeout = datetime.timedelta(seconds=timeout)
+        deadline = datetime.datetime.now(datetime.timezone.utc) + timeout
+
+        try:
+            session = self.__free_sessions.get(
+                timeout=max(timeout.total_seconds(), 0.0))
+        except queue.Empty:
+            raise RuntimeError('No session is available in the pool.')
+
+        timeout = deadline - datetime.datetime.now(datetime.timezone.utc)
+        if not _wait_for_ready(
+                self.__redis, _ready_key('browser', session), timeout):
+            # 準備ができていないセッションは入れ替えてから戻しておく．
+            self.release(session)
+            raise RuntimeError(f'{session}: The browser did not become ready.')
+        return session
+
+    def release(self, session: str) -> None:
+        # 返されたセッションのコンテナを裏で入れ替え，セッションのキーを
+        # 全て消してからプールに戻す．
+        def recycle() -> None:
+            try:
+                # 止めるコンテナは入れ替える前に表から外しておき，
+                # 入れ替えに失敗しても `__exit__` が二重に止めないようにする．
+                with self.__browsers_lock:
+                    container = self.__browsers.pop(session)
+                ContainerPool.__ignore_errors(container.stop)
+                keys = list(self.__redis.scan_iter(match=f'*:{session}*'))
+                if len(keys) > 0:
+                    self.__redis.delete(*keys)
+                container = self.__run_browser(session)
+                with self.__browsers_lock:
+                    self.__browsers[session] = container
+            except Exception as e:
+                logging.exception(e)
+                return
+            self.__free_sessions.put(session)
+
+        thread = threading.Thread(target=recycle)
+        with self.__recycle_threads_lock:
+            self.__recycle_threads = [
+                t for t in self.__recycle_threads if t.is_alive()]
+            thread.start()
+            self.__recycle_threads.append(thread)
@@ -4,7 +4,7 @@ import datetime
 import time
 from PIL.Image import Image
 from majsoul_rpa.common import TimeoutType
-from majsoul_rpa._impl import (Template, BrowserBase,)
+from majsoul_rpa._impl import (Template, TemplateSet, BrowserBase,)
 from majsoul_rpa.presentation.presentation_base import (
     Timeout, InvalidOperation, PresentationNotDetected, PresentationBase,)
 
@@ -94,16 +94,16 @@ class AuthPresentation(PresentationBase):
         # 「ログイン」ボタンをクリック
         template.click(rpa._get_browser())
 
-        templates = (
+        templates = TemplateSet((
             'template/home/marker0',
             'template/match/marker0',
             'template/match/marker1',
             'template/match/marker2',
-            'template/match/marker3')
+            'template/match/marker3'))
         while True:
             if datetime.datetime.now(datetime.timezone.utc) > deadline:
                 raise Timeout('Timeout.', rpa.get_screenshot())
-            index = Template.match_one_of(rpa.get_screenshot(), templates)
+            index = templates.match_one_of(rpa.get_screenshot())
             if index in (0,):
                 break
             if index in (1, 2, 3, 4,):
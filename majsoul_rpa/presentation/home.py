@@ -1,21 +1,22 @@
 import datetime
 import time
 import logging
+from typing import (Union,)
+import numpy
 from PIL.Image import Image
 from majsoul_rpa.common import TimeoutType
-from majsoul_rpa._impl import (BrowserBase, Template, Redis)
+from majsoul_rpa._impl import (
+    BrowserBase, Frame, Template, TemplateSet, Redis)
 from majsoul_rpa.presentation.presentation_base import InconsistentMessage, PresentationBase
 from majsoul_rpa.presentation import (Timeout, PresentationNotDetected)
 
 
 class HomePresentation(PresentationBase):
     @staticmethod
-    def __match_markers(screenshot: Image):
-        for i in range(1, 4):
-            template = Template.open(f'template/home/marker{i}')
-            if not template.match(screenshot):
-                return False
-        return True
+    def __match_markers(screenshot: Union[Image, numpy.ndarray, Frame]):
+        templates = TemplateSet(
+            f'template/home/marker{i}' for i in range(1, 4))
+        return templates.match_all(screenshot)
 
     @staticmethod
     def _close_notifications(
@@ -26,42 +27,48 @@ class HomePresentation(PresentationBase):
             timeout = datetime.timedelta(seconds=timeout)
         deadline = datetime.datetime.now(datetime.timezone.utc) + timeout
 
-        template0 = Template.open('template/home/notification_close')
-        template1 = Template.open('template/home/event_close')
-        template2 = Template.open('template/home/visit_to_shrine')
+        templates = TemplateSet((
+            'template/home/notification_close',
+            'template/home/event_close',
+            'template/home/visit_to_shrine',))
+        # 閉じるボタンの大きさと照合の下限． `visit_to_shrine` だけは
+        # テンプレートの閾値より低い下限で照合する．
+        sizes = ((30, 30), (71, 71), (78, 36),)
+        lower_bounds = (templates[0].threshold, templates[1].threshold, 0.87,)
         template3 = Template.open('template/home/visited_to_shrine')
         while True:
             if datetime.datetime.now(datetime.timezone.utc) > deadline:
                 raise Timeout('Timeout.', browser.get_screenshot())
 
-            screenshot = browser.get_screenshot()
-
-            x, y, score = template0.best_template_match(screenshot)
-            if score >= 0.99:
-                browser.click_region(x, y, 30, 30)
-                time.sleep(1.0)
-                continue
+            screenshot = browser.get_raw_screenshot()
+            # 閾値を超えたテンプレートより後ろは照合されず `None` になるが，
+            # その手前で必ずループを抜ける．
+            results = templates.best_template_matches(
+                screenshot, first_hit=True)
+            index = -1
+            for i, result in enumerate(results):
+                if result[2] >= lower_bounds[i]:
+                    index = i
+                    break
+            if index == -1:
+                break
 
-            x, y, score = template1.best_template_match(screenshot)
-            if score >= 0.99:
-                browser.click_region(x, y, 71, 71)
+            x, y, _ = results[index]
+            width, height = sizes[index]
+            browser.click_region(x, y, width, height)
+            if index != 2:
                 time.sleep(1.0)
                 continue
 
-            x, y, score = template2.best_template_match(screenshot)
-            if score >= 0.87: # Lower bound.
-                browser.click_region(x, y, 78, 36)
-                while True:
-                    if datetime.datetime.now(datetime.timezone.utc) > deadline:
-                        raise Timeout('Timeout.', browser.get_screenshot())
-                    screenshot = browser.get_screenshot()
-                    xx, yy, score = template3.best_template_match(screenshot)
-                    if score >= 0.97: # Upper bound.
-                        browser.click_region(xx, yy, 77, 37)
-                        break
-                continue
-
-            break
+            # 参拝後の画面を閉じる．
+            while True:
+                if datetime.datetime.now(datetime.timezone.utc) > deadline:
+                    raise Timeout('Timeout.', browser.get_screenshot())
+                screenshot = browser.get_raw_screenshot()
+                xx, yy, score = template3.best_template_match(screenshot)
+                if score >= 0.97: # Upper bound.
+                    browser.click_region(xx, yy, 77, 37)
+                    break
 
     @staticmethod
     def _wait(browser: BrowserBase, timeout: TimeoutType) -> None:
@@ -73,15 +80,19 @@ class HomePresentation(PresentationBase):
         template = Template.open(f'template/home/marker0')
         template.wait_for(browser, deadline - now)
 
-        if not HomePresentation.__match_markers(browser.get_screenshot()):
+        if not HomePresentation.__match_markers(browser.get_raw_screenshot()):
             # ホーム画面に告知が表示されている場合にそれらを閉じる．
             now = datetime.datetime.now(datetime.timezone.utc)
             HomePresentation._close_notifications(browser, deadline - now)
 
+            sequence = -1
             while True:
                 if datetime.datetime.now(datetime.timezone.utc) > deadline:
                     raise Timeout('Timeout.', browser.get_screenshot())
-                if HomePresentation.__match_markers(browser.get_screenshot()):
+                sequence, screenshot = browser.get_next_raw_screenshot(
+                    sequence)
+                if HomePresentation.__match_markers(
+                        Frame(screenshot, sequence)):
                     break
 
     def __init__(
@@ -175,7 +186,7 @@ class HomePresentation(PresentationBase):
 
                 _break = False
                 while True:
-                    next_message = self._get_redis().dequeue_message(5)
+                    next_message = self._get_redis().peek(5)
                     if next_message is None:
                         # これ以上メッセージが無いならばホーム画面への遷移が完了している．
                         _break = True
@@ -183,10 +194,10 @@ class HomePresentation(PresentationBase):
                     _, next_name, _, _, _ = next_message
                     if next_name == '.lq.Lobby.heatbeat':
                         # 後続の `.lq.Lobby.heatbeat` メッセージを読み捨てる．
+                        self._get_redis().dequeue_message(5)
                         logging.info(next_message)
                         continue
-                    # 先読みしたメッセージを埋め戻して次へ．
-                    self._get_redis().put_back(next_message)
+                    # 先読みしたメッセージはキューに残したまま次へ．
                     break
                 if _break:
                     break
@@ -313,12 +324,10 @@ class HomePresentation(PresentationBase):
                 logging.info(message)
 
                 # これ以上メッセージが無いならばホーム画面への遷移が完了している．
-                message = self._get_redis().dequeue_message(5)
-                if message is None:
+                if self._get_redis().peek(5) is None:
                     return
 
-                # 先読みしたメッセージを埋め戻して次へ．
-                self._get_redis().put_back(message)
+                # 先読みしたメッセージはキューに残したまま次へ．
                 continue
 
             if name == '.lq.NotifyAccountUpdate':
@@ -1,24 +1,29 @@
 import base64
+import functools
 from typing import (Tuple,)
-from google.protobuf.message_factory import MessageFactory
-import google.protobuf.json_format
-import majsoul_rpa._impl.mahjongsoul_pb2 as mahjongsoul_pb2
+import numpy
+from majsoul_rpa._impl.message_registry import get_message_classes
+from majsoul_rpa._impl.message_view import LazyMessageView
 
 
-_MESSAGE_TYPE_MAP = {}
-for tdesc in mahjongsoul_pb2.DESCRIPTOR.message_types_by_name.values():
-    _name = '.' + tdesc.full_name
-    _MESSAGE_TYPE_MAP[_name] = MessageFactory().GetPrototype(tdesc)
+_KEYS = numpy.array([132, 94, 78, 66, 57, 162, 31, 96, 28], dtype=numpy.int64)
 
 
-def _decode_bytes(buf: bytes) -> bytearray:
-    keys = [132, 94, 78, 66, 57, 162, 31, 96, 28]
-    decode = bytearray()
-    for i, _byte in enumerate(buf):
-        mask = ((23 ^ len(buf)) + 5 * i + keys[i % len(keys)]) & 255
-        _byte ^= mask
-        decode += _byte.to_bytes(1, 'little')
-    return decode
+@functools.lru_cache(maxsize=256)
+def _get_mask(length: int) -> numpy.ndarray:
+    # 長さ `length` のデータに対するマスク列
+    # `((23 ^ length) + 5 * i + keys[i % len(keys)]) & 255` ．
+    # 同じ長さのデータには同じマスク列を使い回す．
+    i = numpy.arange(length, dtype=numpy.int64)
+    mask = ((23 ^ length) + 5 * i + _KEYS[i % len(_KEYS)]) & 255
+    mask = mask.astype(numpy.uint8)
+    mask.flags.writeable = False
+    return mask
+
+
+def _decode_bytes(buf: bytes) -> bytes:
+    data = numpy.frombuffer(buf, dtype=numpy.uint8)
+    return numpy.bitwise_xor(data, _get_mask(len(buf))).tobytes()
 
 
 def parse_action(message: object, *, restore: bool=False) -> Tuple[int, str, object]:
@@ -30,10 +35,9 @@ def parse_action(message: object, *, restore: bool=False) -> Tuple[int, str, obj
     if not restore:
         data = _decode_bytes(data)
 
-    parser = _MESSAGE_TYPE_MAP[f'.lq.{name}']()
-    parser.ParseFromString(data)
-    result = google.protobuf.json_format.MessageToDict(
-        parser, including_default_value_fields=True,
-        preserving_proto_field_name=True)
+    classes = get_message_classes(f'.lq.{name}')
+    if classes is None:
+        raise KeyError(f'.lq.{name}')
+    result = LazyMessageView(classes[0], data)
 
     return step, name, result
@@ -2,6 +2,7 @@
 
 import datetime
 from majsoul_rpa.presentation.match.event._base import EventBase
+from majsoul_rpa.presentation.match.tile import (TILE_NAMES, tile_id,)
 
 
 class AngangJiagangEvent(EventBase):
@@ -9,7 +10,7 @@ class AngangJiagangEvent(EventBase):
         super(AngangJiagangEvent, self).__init__(timestamp)
         self.__seat = data['seat']
         self.__type = (None, None, '暗槓', '加槓')[data['type']]
-        self.__tile = data['tiles']
+        self.__tile = tile_id(data['tiles'])
 
     @property
     def seat(self) -> int:
@@ -24,4 +25,8 @@ class AngangJiagangEvent(EventBase):
 
     @property
     def tile(self) -> str:
+        return TILE_NAMES[self.__tile]
+
+    @property
+    def tile_id(self) -> int:
         return self.__tile
@@ -3,6 +3,7 @@
 import datetime
 from typing import List
 from majsoul_rpa.presentation.match.event._base import EventBase
+from majsoul_rpa.presentation.match.tile import (tile_ids, tile_names,)
 
 
 class ChiPengGangEvent(EventBase):
@@ -11,7 +12,7 @@ class ChiPengGangEvent(EventBase):
         self.__seat = data['seat']
         self.__type = ('チー', 'ポン', '大明槓')[data['type']]
         self.__from = data['froms'][-1]
-        self.__tiles = data['tiles']
+        self.__tiles = bytes(tile_ids(data['tiles']))
 
     @property
     def seat(self) -> int:
@@ -29,4 +30,8 @@ class ChiPengGangEvent(EventBase):
 
     @property
     def tiles(self) -> List[str]:
+        return tile_names(self.__tiles)
+
+    @property
+    def tile_ids(self) -> bytes:
         return self.__tiles
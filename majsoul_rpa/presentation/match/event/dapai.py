@@ -2,13 +2,14 @@
 
 import datetime
 from majsoul_rpa.presentation.match.event._base import EventBase
+from majsoul_rpa.presentation.match.tile import (TILE_NAMES, tile_id,)
 
 
 class DapaiEvent(EventBase):
     def __init__(self, data: object, timestamp: datetime.datetime) -> None:
         super(DapaiEvent, self).__init__(timestamp)
         self.__seat = data['seat']
-        self.__tile = data['tile']
+        self.__tile = tile_id(data['tile'])
         self.__moqie = data['moqie']
         self.__liqi = data['is_liqi']
         self.__wliqi = data['is_wliqi']
@@ -21,6 +22,10 @@ class DapaiEvent(EventBase):
 
     @property
     def tile(self) -> str:
+        return TILE_NAMES[self.__tile]
+
+    @property
+    def tile_id(self) -> int:
         return self.__tile
 
     @property
@@ -4,6 +4,8 @@
 import datetime
 from typing import (Optional, List,)
 from majsoul_rpa.presentation.match.event._base import EventBase
+from majsoul_rpa.presentation.match.tile import (
+    TILE_NAMES, tile_ids, tile_names,)
 
 
 class NewRoundEvent(EventBase):
@@ -13,12 +15,13 @@ class NewRoundEvent(EventBase):
         self.__ju = data['ju']
         self.__ben = data['ben']
         self.__liqibang = data['liqibang']
-        self.__dora_indicators = data['doras']
+        self.__dora_indicators = bytes(tile_ids(data['doras']))
         self.__left_tile_count = data['left_tile_count']
         self.__scores = data['scores']
-        self.__shoupai = data['tiles'][:13]
-        if len(data['tiles']) == 14:
-            self.__zimopai = data['tiles'][13]
+        tiles = tile_ids(data['tiles'])
+        self.__shoupai = bytes(tiles[:13])
+        if len(tiles) == 14:
+            self.__zimopai = tiles[13]
         else:
             self.__zimopai = None
 
@@ -46,6 +49,12 @@ class NewRoundEvent(EventBase):
 
     @property
     def dora_indicators(self) -> List[str]:
+        assert(len(self.__dora_indicators) >= 1)
+        assert(len(self.__dora_indicators) <= 5)
+        return tile_names(self.__dora_indicators)
+
+    @property
+    def dora_indicator_ids(self) -> bytes:
         assert(len(self.__dora_indicators) >= 1)
         assert(len(self.__dora_indicators) <= 5)
         return self.__dora_indicators
@@ -63,9 +72,20 @@ class NewRoundEvent(EventBase):
 
     @property
     def shoupai(self) -> List[str]:
+        assert(len(self.__shoupai) == 13)
+        return tile_names(self.__shoupai)
+
+    @property
+    def shoupai_ids(self) -> bytes:
         assert(len(self.__shoupai) == 13)
         return self.__shoupai
 
     @property
     def zimopai(self) -> Optional[str]:
+        if self.__zimopai is None:
+            return None
+        return TILE_NAMES[self.__zimopai]
+
+    @property
+    def zimopai_id(self) -> Optional[int]:
         return self.__zimopai
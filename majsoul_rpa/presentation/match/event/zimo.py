@@ -3,16 +3,15 @@
 import datetime
 from typing import Optional
 from majsoul_rpa.presentation.match.event._base import EventBase
+from majsoul_rpa.presentation.match.tile import (
+    TILE_NAMES, optional_tile_id,)
 
 
 class ZimoEvent(EventBase):
     def __init__(self, data: object, timestamp: datetime.datetime) -> None:
         super(ZimoEvent, self).__init__(timestamp)
         self.__seat = data['seat']
-        if data['tile'] != '':
-            self.__tile = data['tile']
-        else:
-            self.__tile = None
+        self.__tile = optional_tile_id(data['tile'])
         self.__left_tile_count = data['left_tile_count']
 
     @property
@@ -23,6 +22,12 @@ class ZimoEvent(EventBase):
 
     @property
     def tile(self) -> Optional[str]:
+        if self.__tile is None:
+            return None
+        return TILE_NAMES[self.__tile]
+
+    @property
+    def tile_id(self) -> Optional[int]:
         return self.__tile
 
     @property
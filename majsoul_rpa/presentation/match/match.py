@@ -5,7 +5,8 @@ from typing import (Optional, Tuple, List,)
 from PIL.Image import Image
 from majsoul_rpa._impl.redis import Message
 from majsoul_rpa.common import TimeoutType
-from majsoul_rpa._impl import (Redis, BrowserBase, Template,)
+from majsoul_rpa._impl import (
+    Redis, BrowserBase, Frame, Template, TemplateSet,)
 from majsoul_rpa import common
 from majsoul_rpa.presentation.presentation_base import (
     Timeout, InconsistentMessage, PresentationNotDetected, InvalidOperation,
@@ -16,6 +17,7 @@ from majsoul_rpa.presentation.match.event import (
     HuleEvent, NoTileEvent, LiujuEvent)
 from majsoul_rpa.presentation.match.state import (
     MatchPlayer, MatchState, RoundState,)
+from majsoul_rpa.presentation.match.shanten import TileEfficiency
 from majsoul_rpa.presentation.match.operation import(
     DapaiOperation, ChiOperation, PengOperation, AngangOperation,
     DaminggangOperation, JiagangOperation, LiqiOperation, ZimohuOperation,
@@ -30,11 +32,13 @@ class MatchPresentation(PresentationBase):
         if isinstance(timeout, (int, float,)):
             timeout = datetime.timedelta(seconds=timeout)
         deadline = datetime.datetime.now(datetime.timezone.utc) + timeout
+        templates = TemplateSet(f'template/match/marker{i}' for i in range(4))
+        sequence = -1
         while True:
             if datetime.datetime.now(datetime.timezone.utc) > deadline:
                 raise Timeout('Timeout.', browser.get_screenshot())
-            templates = [f'template/match/marker{i}' for i in range(4)]
-            if Template.match_one_of(browser.get_screenshot(), templates) != -1:
+            sequence, screenshot = browser.get_next_raw_screenshot(sequence)
+            if templates.match_one_of(Frame(screenshot, sequence)) != -1:
                 break
 
     __COMMON_MESSAGE_NAMES = (
@@ -167,13 +171,11 @@ class MatchPresentation(PresentationBase):
         self.__round_state = None
         self.__operation_list = None
 
-        templates = [f'template/match/marker{i}' for i in range(4)]
-        if Template.match_one_of(screenshot, templates) == -1:
+        templates = TemplateSet(f'template/match/marker{i}' for i in range(4))
+        if templates.match_one_of(screenshot) == -1:
             if True:
                 # For postmortem.
-                for i in range(4):
-                    template = Template.open(f'template/match/marker{i}')
-                    x, y, score = template.best_template_match(screenshot)
+                for x, y, score in templates.best_template_matches(screenshot):
                     print(f'({x}, {y}): score = {score}')
                 now = datetime.datetime.now(datetime.timezone.utc)
                 screenshot.save(now.strftime('%Y-%m-%d-%H-%M-%S.png'))
@@ -523,6 +525,22 @@ class MatchPresentation(PresentationBase):
     def zimopai(self) -> Optional[str]:
         return self.__round_state.zimopai
 
+    @property
+    def shoupai_ids(self) -> bytes:
+        return self.__round_state.shoupai_ids
+
+    @property
+    def shoupai_counts(self) -> bytes:
+        return self.__round_state.shoupai_counts
+
+    @property
+    def zimopai_id(self) -> Optional[int]:
+        return self.__round_state.zimopai_id
+
+    @property
+    def tile_efficiency(self) -> TileEfficiency:
+        return self.__round_state.tile_efficiency
+
     @property
     def he(self) -> List[List[Tuple[str, bool]]]:
         return self.__round_state.he
@@ -581,13 +599,19 @@ class MatchPresentation(PresentationBase):
             if datetime.datetime.now(datetime.timezone.utc) > deadline:
                 raise Timeout('Timeout', rpa.get_screenshot())
 
-            rpa._click_region(left, top, width, height, edge_sigma=edge_sigma, warp=warp)
-            message = rpa._get_redis().dequeue_message(interval)
+            # クリックの完了を待たずにメッセージの待ち受けを始める．
+            # 前のクリックの応答は次のクリックを送る前に待つので，完了を
+            # 待っていないクリックは高々1つ．
+            rpa._click_region(
+                left, top, width, height, edge_sigma=edge_sigma, warp=warp,
+                blocking=False)
+            message = rpa._get_redis().peek(interval)
             if message is None:
                 continue
             _, name, _, _, _ = message
 
             if name in MatchPresentation.__COMMON_MESSAGE_NAMES:
+                rpa._get_redis().dequeue_message(interval)
                 self.__on_common_message(message)
                 continue
 
@@ -605,8 +629,7 @@ class MatchPresentation(PresentationBase):
 
             raise InconsistentMessage(message, rpa.get_screenshot())
 
-        # 先読みしたメッセージの埋め戻し．
-        rpa._get_redis().put_back(message)
+        # 先読みしたメッセージはキューに残しておく．
 
     def __reset_to_prev_presentation(self, rpa: RPA, timeout: TimeoutType) -> None:
         if isinstance(timeout, (int, float,)):
@@ -690,14 +713,12 @@ class MatchPresentation(PresentationBase):
                 # TODO: メッセージ内容の処理．
 
                 # これ以上メッセージが無いならばホーム画面へ戻る．
-                message = self._get_redis().dequeue_message(5)
-                if message is None:
+                if self._get_redis().peek(5) is None:
                     now = datetime.datetime.now(datetime.timezone.utc)
                     self.__reset_to_prev_presentation(rpa, deadline - now)
                     return
 
-                # 先読みしたメッセージを埋め戻して次へ．
-                self._get_redis().put_back(message)
+                # 先読みしたメッセージはキューに残したまま次へ．
                 continue
 
             if name == '.lq.NotifyLeaderboardPoint':
@@ -715,6 +736,15 @@ class MatchPresentation(PresentationBase):
 
             raise InconsistentMessage(message, rpa.get_screenshot())
 
+    @staticmethod
+    def __is_action(message: Message, action_names: Tuple[str, ...]) -> bool:
+        # `message` が `action_names` のいずれかのアクションか．
+        _, name, request, _, _ = message
+        if name != '.lq.ActionPrototype':
+            return False
+        _, action_name, _ = _common.parse_action(request)
+        return action_name in action_names
+
     def __workaround_for_reordered_actions(
         self, rpa: RPA, message: Message, expected_step: int, timeout: TimeoutType) -> Message:
         # `.lq.ActionPrototype` が `step` 順通りに来ない場合があるので，
@@ -828,7 +858,8 @@ class MatchPresentation(PresentationBase):
             if datetime.datetime.now(datetime.timezone.utc) > deadline:
                 raise Timeout('Timeout.', rpa.get_screenshot())
 
-            if not round_result_confirmed and template.match(rpa.get_screenshot()):
+            if not round_result_confirmed \
+               and template.match(rpa.get_raw_screenshot()):
                 template.click(rpa._get_browser())
                 round_result_confirmed = True
 
@@ -864,10 +895,16 @@ class MatchPresentation(PresentationBase):
                 logging.info(message)
                 while True:
                     # `ActionNewRound` メッセージを待つ．
+                    # `ActionNewRound` はキューに残したまま取り出しを止める．
                     now = datetime.datetime.now(datetime.timezone.utc)
-                    message = rpa._get_redis().dequeue_message(deadline - now)
+                    message = rpa._get_redis().take_if(
+                        lambda m: not MatchPresentation.__is_action(
+                            m, ('ActionNewRound',)),
+                        deadline - now)
                     if message is None:
-                        raise Timeout('Timeout', rpa.get_screenshot())
+                        if rpa._get_redis().peek(0) is None:
+                            raise Timeout('Timeout', rpa.get_screenshot())
+                        break
                     direction, name, request, response, timestamp = message
                     if name in MatchPresentation.__COMMON_MESSAGE_NAMES:
                         self.__on_common_message(message)
@@ -879,10 +916,6 @@ class MatchPresentation(PresentationBase):
                             'action_name': action_name,
                             'data': data
                         }
-                        if action_name == 'ActionNewRound':
-                            # 先読みしたメッセージの埋め戻し．
-                            rpa._get_redis().put_back(message)
-                            break
                         raise InconsistentMessage(
                             action_info, rpa.get_screenshot())
                     raise InconsistentMessage(message, rpa.get_screenshot())
@@ -910,23 +943,24 @@ class MatchPresentation(PresentationBase):
                     # `.lq.FastTest.confirmNewRound` のレスポンスメッセージを
                     # 待つ．
                     now = datetime.datetime.now(datetime.timezone.utc)
-                    next_message = rpa._get_redis().dequeue_message(deadline - now)
+                    next_message = rpa._get_redis().take_if(
+                        lambda m: m[1] != '.lq.ActionPrototype',
+                        deadline - now)
                     if next_message is None:
-                        raise Timeout('Timeout', rpa.get_screenshot())
-                    _, next_name, _, _, _ = next_message
-                    if next_name in MatchPresentation.__COMMON_MESSAGE_NAMES:
-                        self.__on_common_message(next_message)
-                        continue
-                    if next_name == '.lq.ActionPrototype':
+                        if rpa._get_redis().peek(0) is None:
+                            raise Timeout('Timeout', rpa.get_screenshot())
                         # `.lq.FastTest.confirmNewRound` と `ActionNewRound` の
                         # やり取りを飛ばして，次局の `step = 1` の
                         # `.lq.ActionPrototype` が飛んでくる場合があるので，
                         # その現象に対する workaround.
-                        # 先読みしたメッセージを埋め戻しておく．
-                        rpa._get_redis().put_back(next_message)
+                        # 先読みしたメッセージはキューに残したままにしておく．
                         self.__workaround_for_skipped_confirm_new_round(
                             rpa, message, deadline)
                         return
+                    _, next_name, _, _, _ = next_message
+                    if next_name in MatchPresentation.__COMMON_MESSAGE_NAMES:
+                        self.__on_common_message(next_message)
+                        continue
                     if next_name == '.lq.FastTest.confirmNewRound':
                         logging.info(next_name)
                         break
@@ -1147,18 +1181,32 @@ class MatchPresentation(PresentationBase):
                         # 和了画面の「確認」ボタンをクリックする．ただし，
                         # 和了画面がスキップされて次局がいきなり開始される
                         # 場合があるため，その現象に対する workaround を行う．
-                        if template.match(rpa.get_screenshot()):
+                        if template.match(rpa.get_raw_screenshot()):
                             template.click(rpa._get_browser())
                             click_count += 1
                             if click_count == len(data['hules']):
                                 break
                             continue
 
-                        message1 = rpa._get_redis().dequeue_message(0.1)
+                        message1 = rpa._get_redis().peek(0.1)
                         if message1 is None:
                             continue
                         _, name1, _, _, _ = message1
 
+                        if name1 == '.lq.NotifyGameEndResult':
+                            # 和了画面の「確認」ボタンをクリックする前に
+                            # `.lq.NotifyGameEndResult` メッセージが飛んできた
+                            # 場合．
+                            # 先読みしたメッセージはキューに残しておく．
+                            continue
+
+                        if name1 == '.lq.ActionPrototype':
+                            # 和了画面がスキップされて次局が開始された場合．
+                            # 先読みしたメッセージはキューに残しておく．
+                            break
+
+                        rpa._get_redis().dequeue_message(0.1)
+
                         if name1 in MatchPresentation.__COMMON_MESSAGE_NAMES:
                             self.__on_common_message(message1)
                             continue
@@ -1177,20 +1225,6 @@ class MatchPresentation(PresentationBase):
                             logging.info(message1)
                             continue
 
-                        if name1 == '.lq.NotifyGameEndResult':
-                            # 和了画面の「確認」ボタンをクリックする前に
-                            # `.lq.NotifyGameEndResult` メッセージが飛んできた
-                            # 場合．
-                            # 先読みしたメッセージを埋め戻す．
-                            rpa._get_redis().put_back(message1)
-                            continue
-
-                        if name1 == '.lq.ActionPrototype':
-                            # 和了画面がスキップされて次局が開始された場合．
-                            # 先読みしたメッセージを埋め戻す．
-                            rpa._get_redis().put_back(message1)
-                            break
-
                         # `.lq.FastTest.confirmNewRound` が
                         # やり取りされている場合，画面の描画が
                         # おかしくなっている可能性が高いので
@@ -1352,22 +1386,24 @@ class MatchPresentation(PresentationBase):
             # 「鳴き無し」ボタンをクリックして鳴きができる状態に戻す．
             rpa._click_region(14, 623, 43, 43, edge_sigma=1.0, warp=True)
             while True:
+                # スキップの結果を表すメッセージはキューに残したまま
+                # 取り出しを止める．
                 now = datetime.datetime.now(datetime.timezone.utc)
-                message = rpa._get_redis().dequeue_message(deadline - now)
+                message = rpa._get_redis().take_if(
+                    lambda m: m[1] not in (
+                        '.lq.FastTest.inputChiPengGang',
+                        '.lq.ActionPrototype',),
+                    deadline - now)
                 if message is None:
-                    raise Timeout('Timeout', rpa.get_screenshot())
+                    if rpa._get_redis().peek(0) is None:
+                        raise Timeout('Timeout', rpa.get_screenshot())
+                    break
                 _, name, request, _, _ = message
                 if name in MatchPresentation.__COMMON_MESSAGE_NAMES:
                     self.__on_common_message(message)
                     continue
                 if name == '.lq.FastTest.inputOperation':
                     raise InconsistentMessage(message, rpa.get_screenshot())
-                if name == '.lq.FastTest.inputChiPengGang':
-                    break
-                if name == '.lq.ActionPrototype':
-                    break
-            # 先読みしたメッセージを埋め戻す．
-            rpa._get_redis().put_back(message)
             rpa._click_region(14, 623, 43, 43, edge_sigma=1.0)
 
             self.__operation_list = None
@@ -1403,26 +1439,27 @@ class MatchPresentation(PresentationBase):
                 # 他家のポン，槓もしくは栄和に邪魔された可能性がある．
                 while True:
                     now = datetime.datetime.now(datetime.timezone.utc)
-                    message = rpa._get_redis().dequeue_message(deadline - now)
+                    message = rpa._get_redis().take_if(
+                        lambda m: not MatchPresentation.__is_action(
+                            m, ('ActionChiPengGang', 'ActionHule',)),
+                        deadline - now)
                     if message is None:
-                        ss = rpa.get_screenshot()
+                        if rpa._get_redis().peek(0) is None:
+                            ss = rpa.get_screenshot()
+                            now = datetime.datetime.now(datetime.timezone.utc)
+                            ss.save(now.strftime('%Y-%m-%d-%H-%M-%S.png'))
+                            raise NotImplementedError()
+                        # 他家のポン，槓もしくは栄和に邪魔されていた．
+                        # 先読みしたメッセージはキューに残したまま次へ．
+                        self.__operation_list = None
                         now = datetime.datetime.now(datetime.timezone.utc)
-                        ss.save(now.strftime('%Y-%m-%d-%H-%M-%S.png'))
-                        raise NotImplementedError()
+                        self._wait_impl(rpa, deadline - now)
+                        return
                     _, name, request, _, _ = message
                     if name in MatchPresentation.__COMMON_MESSAGE_NAMES:
                         self.__on_common_message(message)
                         continue
                     if name == '.lq.ActionPrototype':
-                        _, action_name, _ = _common.parse_action(request)
-                        if action_name in ('ActionChiPengGang', 'ActionHule',):
-                            # 他家のポン，槓もしくは栄和に邪魔されていた．
-                            # 先読みしたメッセージを埋め戻す．
-                            rpa._get_redis().put_back(message)
-                            self.__operation_list = None
-                            now = datetime.datetime.now(datetime.timezone.utc)
-                            self._wait_impl(rpa, deadline - now)
-                            return
                         ss = rpa.get_screenshot()
                         now = datetime.datetime.now(datetime.timezone.utc)
                         ss.save(now.strftime('%Y-%m-%d-%H-%M-%S.png'))
@@ -1511,26 +1548,27 @@ class MatchPresentation(PresentationBase):
                 # 他家の栄和に邪魔された可能性がある．
                 while True:
                     now = datetime.datetime.now(datetime.timezone.utc)
-                    message = rpa._get_redis().dequeue_message(deadline - now)
+                    message = rpa._get_redis().take_if(
+                        lambda m: not MatchPresentation.__is_action(
+                            m, ('ActionHule',)),
+                        deadline - now)
                     if message is None:
-                        ss = rpa.get_screenshot()
+                        if rpa._get_redis().peek(0) is None:
+                            ss = rpa.get_screenshot()
+                            now = datetime.datetime.now(datetime.timezone.utc)
+                            ss.save(now.strftime('%Y-%m-%d-%H-%M-%S.png'))
+                            raise NotImplementedError()
+                        # 他家の栄和に邪魔されていた．
+                        # 先読みしたメッセージはキューに残したまま次へ．
+                        self.__operation_list = None
                         now = datetime.datetime.now(datetime.timezone.utc)
-                        ss.save(now.strftime('%Y-%m-%d-%H-%M-%S.png'))
-                        raise NotImplementedError()
+                        self._wait_impl(rpa, deadline - now)
+                        return
                     _, name, request, _, _ = message
                     if name in MatchPresentation.__COMMON_MESSAGE_NAMES:
                         self.__on_common_message(message)
                         continue
                     if name == '.lq.ActionPrototype':
-                        _, action_name, _ = _common.parse_action(request)
-                        if action_name == 'ActionHule':
-                            # 他家の栄和に邪魔されていた．
-                            # 先読みしたメッセージを埋め戻す．
-                            rpa._get_redis().put_back(message)
-                            self.__operation_list = None
-                            now = datetime.datetime.now(datetime.timezone.utc)
-                            self._wait_impl(rpa, deadline - now)
-                            return
                         ss = rpa.get_screenshot()
                         now = datetime.datetime.now(datetime.timezone.utc)
                         ss.save(now.strftime('%Y-%m-%d-%H-%M-%S.png'))
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+
+import functools
+from typing import (Tuple, List, Iterable,)
+import numpy
+from majsoul_rpa.presentation.match.tile import (
+    NUM_TILE_KINDS, KIND_NAMES, TILE_KINDS,)
+
+
+# 向聴数と受け入れの計算．
+#
+# 手牌は赤5を区別しない34種の牌の枚数のベクトルで持ち，萬子・筒子・索子・
+# 字牌の4つの部分に分ける．各部分について「その部分で面子を m 個，雀頭を
+# j 個作るのに足りない牌の枚数の最小値」を `_get_distances` で表引きし，
+# 4つの部分の表を合わせて面子4つ（副露を除く）と雀頭1つに足りない枚数を
+# 求める．向聴数はこの枚数から1を引いたもの．各部分の表は，その部分の
+# 牌の枚数を5進数で符号化した値をキーにしてキャッシュする．
+
+
+_INF = 99
+
+
+# 各部分の牌の種類の数．
+_NUM_POSITIONS = (9, 9, 9, 7)
+
+
+# 5進数のキーの各桁の重み．
+_WEIGHTS = tuple(5 ** i for i in range(9))
+
+
+# 牌の種類から，その種類が属する部分と部分内の位置への表．
+_SUITS = bytes(k // 9 for k in range(NUM_TILE_KINDS))
+_POSITIONS = bytes(k % 9 for k in range(NUM_TILE_KINDS))
+
+
+_YAOJIU = frozenset((0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_targets(num_positions: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    # 1つの部分で作れる面子（順子・刻子）4つまでと雀頭1つまでの組み合わせを
+    # 全て列挙する．返り値は組み合わせの牌の枚数を (面子の数, 雀頭の数) の
+    # 順に並べた行列と，各グループの先頭の行の添え字．
+    mentsu = []
+    for p in range(num_positions):
+        counts = [0] * num_positions
+        counts[p] = 3
+        mentsu.append(counts)
+    if num_positions == 9:
+        for p in range(7):
+            counts = [0] * num_positions
+            counts[p:p + 3] = [1, 1, 1]
+            mentsu.append(counts)
+
+    groups = [set() for _ in range(10)]
+
+    def enumerate_(start: int, m: int, counts: List[int]) -> None:
+        groups[m * 2].add(tuple(counts))
+        for p in range(num_positions):
+            if counts[p] <= 2:
+                c = list(counts)
+                c[p] += 2
+                groups[m * 2 + 1].add(tuple(c))
+        if m == 4:
+            return
+        for i in range(start, len(mentsu)):
+            c = [a + b for a, b in zip(counts, mentsu[i])]
+            if max(c) <= 4:
+                enumerate_(i, m + 1, c)
+
+    enumerate_(0, 0, [0] * num_positions)
+
+    targets = []
+    offsets = []
+    for group in groups:
+        assert(len(group) > 0)
+        offsets.append(len(targets))
+        targets.extend(sorted(group))
+    targets = numpy.array(targets, dtype=numpy.int8)
+    offsets = numpy.array(offsets, dtype=numpy.intp)
+    return (targets, offsets)
+
+
+@functools.lru_cache(maxsize=65536)
+def _get_distances(suit: int, key: int) -> Tuple[int, ...]:
+    # 部分 `suit` の牌の枚数が `key` の時，面子 m 個と雀頭 j 個を作るのに
+    # 足りない牌の枚数の最小値を `m * 2 + j` 番目に並べた表．
+    num_positions = _NUM_POSITIONS[suit]
+    counts = numpy.empty(num_positions, dtype=numpy.int8)
+    for p in range(num_positions):
+        key, counts[p] = divmod(key, 5)
+    targets, offsets = _get_targets(num_positions)
+    distances = numpy.maximum(targets - counts, 0).sum(axis=1)
+    return tuple(int(d) for d in numpy.minimum.reduceat(distances, offsets))
+
+
+# 2つの部分の表を合わせる時の，添え字の組 `(x の添え字, y の添え字,
+# 合わせた表の添え字)` ．面子は合わせて4つまで，雀頭は1つまで．
+_COMBINATIONS = tuple(
+    (m1 * 2 + j1, m2 * 2 + j2, (m1 + m2) * 2 + j1 + j2)
+    for m1 in range(5) for j1 in range(2)
+    for m2 in range(5 - m1) for j2 in range(2 - j1))
+
+
+def _combine(x: Tuple[int, ...], y: Tuple[int, ...]) -> List[int]:
+    # 2つの部分の表を合わせて1つの表にする．
+    z = [_INF] * 10
+    for i, j, k in _COMBINATIONS:
+        d = x[i] + y[j]
+        if d < z[k]:
+            z[k] = d
+    return z
+
+
+def _finish(x: List[int], y: Tuple[int, ...], num_mentsu: int) -> int:
+    # 2つの部分の表から，面子 `num_mentsu` 個と雀頭1つに足りない枚数を求める．
+    result = _INF
+    for m in range(num_mentsu + 1):
+        d = x[m * 2] + y[(num_mentsu - m) * 2 + 1]
+        if d < result:
+            result = d
+        d = x[m * 2 + 1] + y[(num_mentsu - m) * 2]
+        if d < result:
+            result = d
+    return result
+
+
+def _get_keys(counts: Iterable[int]) -> List[int]:
+    keys = [0, 0, 0, 0]
+    for kind, count in enumerate(counts):
+        keys[_SUITS[kind]] += count * _WEIGHTS[_POSITIONS[kind]]
+    return keys
+
+
+def _get_rests(keys: List[int]) -> List[List[int]]:
+    # 各部分について，それ以外の3つの部分を合わせた表．
+    p = [_get_distances(suit, key) for suit, key in enumerate(keys)]
+    p01 = _combine(p[0], p[1])
+    p23 = _combine(p[2], p[3])
+    return [
+        _combine(p[1], p23), _combine(p[0], p23),
+        _combine(p01, p[3]), _combine(p01, p[2])]
+
+
+class _HandStats(object):
+    # 七対子と国士無双の向聴数を，1枚の増減に対して定数時間で求めるための
+    # 集計．
+    def __init__(self, counts: bytearray) -> None:
+        self.pairs = 0
+        self.kinds = 0
+        self.yaojiu_kinds = 0
+        self.yaojiu_pair = False
+        for kind, count in enumerate(counts):
+            if count >= 1:
+                self.kinds += 1
+                if kind in _YAOJIU:
+                    self.yaojiu_kinds += 1
+            if count >= 2:
+                self.pairs += 1
+                if kind in _YAOJIU:
+                    self.yaojiu_pair = True
+
+    def shanten(self, count: int=-1, kind: int=-1) -> int:
+        # 種類 `kind` の牌（現在 `count` 枚）を1枚加えた場合の，七対子と
+        # 国士無双の向聴数の小さい方．
+        pairs = self.pairs
+        kinds = self.kinds
+        yaojiu_kinds = self.yaojiu_kinds
+        yaojiu_pair = self.yaojiu_pair
+        if count == 0:
+            kinds += 1
+            if kind in _YAOJIU:
+                yaojiu_kinds += 1
+        elif count == 1:
+            pairs += 1
+            if kind in _YAOJIU:
+                yaojiu_pair = True
+        qiduizi = 6 - pairs + max(0, 7 - kinds)
+        guoshi = 13 - yaojiu_kinds - (1 if yaojiu_pair else 0)
+        return min(qiduizi, guoshi)
+
+
+def calculate_shanten(counts: Iterable[int], num_fulu: int=0) -> int:
+    # 34種の牌の枚数のベクトル `counts` で表される手牌の向聴数．和了形は
+    # -1 ．手牌の枚数は `3 * (4 - num_fulu) + 1` か `+ 2` でなければならない．
+    counts = bytearray(counts)
+    if len(counts) != NUM_TILE_KINDS:
+        raise ValueError(f'{len(counts)}: An invalid length of counts.')
+    num_mentsu = 4 - num_fulu
+    if sum(counts) not in (num_mentsu * 3 + 1, num_mentsu * 3 + 2):
+        raise ValueError(f'{sum(counts)}: An invalid number of tiles.')
+    keys = _get_keys(counts)
+    x = _combine(_get_distances(0, keys[0]), _get_distances(1, keys[1]))
+    x = _combine(x, _get_distances(2, keys[2]))
+    shanten = _finish(x, _get_distances(3, keys[3]), num_mentsu) - 1
+    if num_fulu == 0:
+        shanten = min(shanten, _HandStats(counts).shanten())
+    return shanten
+
+
+class DiscardEvaluation(object):
+    def __init__(
+        self, kind: int, shanten: int, ukeire_kinds: Iterable[int],
+        ukeire: int) -> None:
+        self.__kind = kind
+        self.__shanten = shanten
+        self.__ukeire_kinds = [k for k in ukeire_kinds]
+        self.__ukeire = ukeire
+
+    @property
+    def kind(self) -> int:
+        return self.__kind
+
+    @property
+    def tile(self) -> str:
+        # 赤5は区別しない．
+        return KIND_NAMES[self.__kind]
+
+    @property
+    def shanten(self) -> int:
+        # 打牌後の向聴数．
+        return self.__shanten
+
+    @property
+    def ukeire(self) -> int:
+        # 打牌後に向聴数を下げる牌の，見えていない残り枚数の合計．
+        return self.__ukeire
+
+    @property
+    def ukeire_tiles(self) -> List[str]:
+        return [KIND_NAMES[k] for k in self.__ukeire_kinds]
+
+
+class TileEfficiency(object):
+    # 自分の手牌の向聴数と受け入れ．手牌と見えている牌の枚数を
+    # `RoundState` の自摸・打牌・副露に合わせて1枚ずつ更新し，結果は
+    # 参照された時に計算して次に更新されるまでキャッシュする．
+    def __init__(self) -> None:
+        self.__hand = bytearray(NUM_TILE_KINDS)
+        # 自分の手牌，全員の河と副露，ドラ表示牌のうち見えている牌の枚数．
+        self.__visible = bytearray(NUM_TILE_KINDS)
+        self.__keys = [0, 0, 0, 0]
+        self.__num_fulu = 0
+        self.__shanten = None
+        self.__ukeire = None
+        self.__discards = None
+
+    def __invalidate(self) -> None:
+        self.__shanten = None
+        self.__ukeire = None
+        self.__discards = None
+
+    def _add_hand(self, tile: int) -> None:
+        # 牌 ID `tile` の牌を引いた．
+        kind = TILE_KINDS[tile]
+        if self.__hand[kind] >= 4:
+            raise ValueError(f'{tile}: Too many tiles in the hand.')
+        self.__hand[kind] += 1
+        self.__keys[_SUITS[kind]] += _WEIGHTS[_POSITIONS[kind]]
+        self._add_visible(tile)
+
+    def _remove_hand(self, tile: int) -> None:
+        # 牌 ID `tile` の牌を手牌から河か副露に移した．
+        kind = TILE_KINDS[tile]
+        if self.__hand[kind] == 0:
+            raise ValueError(f'{tile}: The tile is not in the hand.')
+        self.__hand[kind] -= 1
+        self.__keys[_SUITS[kind]] -= _WEIGHTS[_POSITIONS[kind]]
+        self.__invalidate()
+
+    def _add_visible(self, tile: int) -> None:
+        # 他家の河や副露，ドラ表示牌として牌 ID `tile` の牌が見えた．
+        kind = TILE_KINDS[tile]
+        if self.__visible[kind] < 4:
+            self.__visible[kind] += 1
+        self.__invalidate()
+
+    def _add_fulu(self) -> None:
+        self.__num_fulu += 1
+        self.__invalidate()
+
+    @property
+    def hand_counts(self) -> bytes:
+        return bytes(self.__hand)
+
+    @property
+    def visible_counts(self) -> bytes:
+        return bytes(self.__visible)
+
+    @property
+    def num_fulu(self) -> int:
+        return self.__num_fulu
+
+    def __num_mentsu(self) -> int:
+        return 4 - self.__num_fulu
+
+    def __check_num_tiles(self, remainder: int) -> None:
+        num_tiles = sum(self.__hand)
+        if num_tiles != self.__num_mentsu() * 3 + remainder:
+            raise ValueError(f'{num_tiles}: An invalid number of tiles.')
+
+    @property
+    def shanten(self) -> int:
+        if self.__shanten is None:
+            self.__shanten = calculate_shanten(self.__hand, self.__num_fulu)
+        return self.__shanten
+
+    def __evaluate(
+        self, hand: bytearray, keys: List[int]) -> Tuple[int, List[int], int]:
+        # 手牌 `hand` （ `3n + 1` 枚）の向聴数と，向聴数を下げる牌の
+        # 種類とその残り枚数の合計．
+        num_mentsu = self.__num_mentsu()
+        rests = _get_rests(keys)
+        stats = _HandStats(hand) if self.__num_fulu == 0 else None
+
+        shanten = _finish(
+            rests[3], _get_distances(3, keys[3]), num_mentsu) - 1
+        if stats is not None:
+            shanten = min(shanten, stats.shanten())
+
+        ukeire_kinds = []
+        ukeire = 0
+        for kind in range(NUM_TILE_KINDS):
+            left = 4 - self.__visible[kind]
+            if left <= 0 or hand[kind] >= 4:
+                continue
+            suit = _SUITS[kind]
+            distances = _get_distances(
+                suit, keys[suit] + _WEIGHTS[_POSITIONS[kind]])
+            s = _finish(rests[suit], distances, num_mentsu) - 1
+            if stats is not None:
+                s = min(s, stats.shanten(hand[kind], kind))
+            if s < shanten:
+                ukeire_kinds.append(kind)
+                ukeire += left
+
+        return (shanten, ukeire_kinds, ukeire)
+
+    def ukeire(self) -> Tuple[List[str], int]:
+        # `3n + 1` 枚の手牌について，向聴数を下げる牌とその残り枚数の合計．
+        if self.__ukeire is not None:
+            return self.__ukeire
+        self.__check_num_tiles(1)
+        _, ukeire_kinds, ukeire = self.__evaluate(self.__hand, self.__keys)
+        self.__ukeire = ([KIND_NAMES[k] for k in ukeire_kinds], ukeire)
+        return self.__ukeire
+
+    def evaluate_discards(self) -> List[DiscardEvaluation]:
+        # `3n + 2` 枚の手牌について，打牌の候補ごとに打牌後の向聴数と
+        # 受け入れを求める．向聴数の小さい順，受け入れの多い順に並べる．
+        if self.__discards is not None:
+            return self.__discards
+        self.__check_num_tiles(2)
+
+        discards = []
+        hand = bytearray(self.__hand)
+        keys = list(self.__keys)
+        for kind in range(NUM_TILE_KINDS):
+            if hand[kind] == 0:
+                continue
+            suit = _SUITS[kind]
+            weight = _WEIGHTS[_POSITIONS[kind]]
+            hand[kind] -= 1
+            keys[suit] -= weight
+            shanten, ukeire_kinds, ukeire = self.__evaluate(hand, keys)
+            hand[kind] += 1
+            keys[suit] += weight
+            discards.append(
+                DiscardEvaluation(kind, shanten, ukeire_kinds, ukeire))
+
+        discards.sort(key=lambda d: (d.shanten, -d.ukeire, d.kind))
+        self.__discards = discards
+        return discards
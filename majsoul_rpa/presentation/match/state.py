@@ -1,9 +1,13 @@
 #!/usr/bin/env bash
 
-import re
+import bisect
 from majsoul_rpa.presentation.presentation_base import InconsistentMessage
 from typing import (Optional, Tuple, List, Iterable,)
 from majsoul_rpa.common import Player
+from majsoul_rpa.presentation.match.tile import (
+    NUM_TILE_IDS, TILE_NAMES, TILE_KINDS, KIND_TILES, tile_id, tile_ids,
+    tile_names,)
+from majsoul_rpa.presentation.match.shanten import TileEfficiency
 
 
 class MatchPlayer(Player):
@@ -74,22 +78,38 @@ New one: {uuid}''')
 
 
 class RoundState(object):
+    # 牌は全て整数の牌 ID （ `majsoul_rpa.presentation.match.tile` を参照）で
+    # 保持する．手牌は理牌済みの牌 ID の列と牌 ID ごとの枚数のベクトルで
+    # 持ち，文字列の手牌などは参照された時に作る．
     def __init__(self, match_state: MatchState, data: object) -> None:
         self.__match_state = match_state
         self.__chang = data['chang']
         self.__ju = data['ju']
         self.__ben = data['ben']
         self.__liqibang = data['liqibang']
-        self.__dora_indicators = data['doras']
         self.__left_tile_count = data['left_tile_count']
         self.__scores = data['scores']
-        self.__shoupai = data['tiles'][:13]
-        if len(data['tiles']) == 14:
-            self.__zimopai = data['tiles'][13]
+        tiles = tile_ids(data['tiles'])
+        # 自分の手牌の向聴数と受け入れ．
+        self.__efficiency = TileEfficiency()
+        for tile in tiles:
+            self.__efficiency._add_hand(tile)
+        self.__dora_indicators = b''
+        self.__set_dora_indicators(data['doras'])
+        self.__shoupai = tiles[:13]
+        self.__shoupai_counts = bytearray(NUM_TILE_IDS)
+        for tile in self.__shoupai:
+            self.__shoupai_counts[tile] += 1
+        # 配牌は理牌されているとは限らないので，最初に自摸牌を組み入れる
+        # 時に理牌する．
+        self.__sorted = self.__is_sorted()
+        if len(tiles) == 14:
+            self.__zimopai = tiles[13]
         else:
             self.__zimopai = None
-        self.__he = [[]] * 4
-        self.__fulu = [[]] * 4
+        self.__he = [bytearray() for _ in range(4)]
+        self.__he_moqie = [bytearray() for _ in range(4)]
+        self.__fulu = [[] for _ in range(4)]
         self.__liqi = [False] * 4
         self.__wliqi = [False] * 4
         self.__first_draw = [True] * 4
@@ -97,24 +117,52 @@ class RoundState(object):
         self.__lingshang_zimo = [False] * 4
         self.__prev_dapai_seat = None
         self.__prev_dapai = None
+        # 文字列表現のキャッシュ．
+        self.__shoupai_view = None
+
+    def __is_sorted(self) -> bool:
+        return all(
+            self.__shoupai[i] <= self.__shoupai[i + 1]
+            for i in range(len(self.__shoupai) - 1))
 
     def __hand_in(self) -> None:
         # 自摸牌を手牌に組み入れて理牌する．
         assert(self.__zimopai is not None)
-        self.__shoupai.append(self.__zimopai)
+        zimopai = self.__zimopai
         self.__zimopai = None
-
-        # 理牌
-        shoupai = [re.sub("^([1-9])([mpsz])$", "\\2\\1@", t) for t in self.__shoupai]
-        shoupai = [re.sub("^0([mps])$", "\\g<1>5!", t) for t in shoupai]
-        shoupai.sort()
-        shoupai = [re.sub("^([mps])5!$", "0\\1", t) for t in shoupai]
-        self.__shoupai = [re.sub("^([mpsz])([1-9])@$", "\\2\\1", t) for t in shoupai]
+        self.__shoupai_counts[zimopai] += 1
+        self.__shoupai_view = None
+
+        if not self.__sorted:
+            self.__shoupai.append(zimopai)
+            self.__shoupai = bytearray(sorted(self.__shoupai))
+            self.__sorted = True
+            return
+
+        # 理牌済みの手牌の，牌 ID の順の位置に挿入する．
+        assert(self.__is_sorted())
+        bisect.insort(self.__shoupai, zimopai)
+
+    def __set_dora_indicators(self, doras: Iterable[str]) -> None:
+        # 新しく表示されたドラ表示牌を見えている牌に加える．
+        dora_indicators = bytes(tile_ids(doras))
+        for tile in dora_indicators[len(self.__dora_indicators):]:
+            self.__efficiency._add_visible(tile)
+        self.__dora_indicators = dora_indicators
+
+    def __remove_from_shoupai(self, tile: int) -> None:
+        # 牌を抜いても残りの牌の並び順は変わらないので，副露で手牌から
+        # 牌を抜いても `__sorted` はそのまま正しい．
+        assert(self.__shoupai_counts[tile] > 0)
+        del self.__shoupai[self.__shoupai.index(tile)]
+        self.__shoupai_counts[tile] -= 1
+        self.__shoupai_view = None
 
     def _on_zimo(self, data: object) -> None:
         if data['seat'] == self.__match_state.seat:
             assert(self.__zimopai is None)
-            self.__zimopai = data['tile']
+            self.__zimopai = tile_id(data['tile'])
+            self.__efficiency._add_hand(self.__zimopai)
         else:
             if data['tile'] != '':
                 raise ValueError(
@@ -125,7 +173,7 @@ class RoundState(object):
 
         if len(data['doras']) > 0:
             # 新ドラを表示する．
-            self.__dora_indicators = data['doras']
+            self.__set_dora_indicators(data['doras'])
         self.__left_tile_count = data['left_tile_count']
 
         if 'liqi' in data:
@@ -141,37 +189,37 @@ class RoundState(object):
         assert(self.__prev_dapai is None)
 
         seat = data['seat']
+        tile = tile_id(data['tile'])
 
         if seat == self.__match_state.seat:
             if data['moqie']:
                 assert(self.__zimopai is not None)
-                assert(self.__zimopai == data['tile'])
+                assert(self.__zimopai == tile)
                 self.__zimopai = None
             else:
                 # 手出し．
-                index = None
-                for i, tile in enumerate(self.__shoupai):
-                    if tile == data['tile']:
-                        index = i
-                        break
-                if index is None:
+                if self.__shoupai_counts[tile] == 0:
                     # 自分が親で，かつ第一打牌である場合．
                     assert(seat == self.__ju and self.__first_draw[seat])
                     assert(self.__zimopai is not None)
-                    assert(self.__zimopai == data['tile'])
+                    assert(self.__zimopai == tile)
                     self.__zimopai = None
                 else:
-                    self.__shoupai.pop(index)
+                    self.__remove_from_shoupai(tile)
                     if self.__zimopai is not None:
                         # 自摸牌を手牌に組み入れる．
                         self.__hand_in()
+            self.__efficiency._remove_hand(tile)
             assert('operation' not in data)
+        else:
+            self.__efficiency._add_visible(tile)
 
         if len(data['doras']) > 0:
             # 新ドラを表示する．
-            self.__dora_indicators = data['doras']
+            self.__set_dora_indicators(data['doras'])
 
-        self.__he[seat].append((data['tile'], data['moqie']))
+        self.__he[seat].append(tile)
+        self.__he_moqie[seat].append(1 if data['moqie'] else 0)
 
         if data['is_liqi']:
             self.__liqi[seat] = True
@@ -185,10 +233,11 @@ class RoundState(object):
         self.__lingshang_zimo[seat] = False
 
         self.__prev_dapai_seat = seat
-        self.__prev_dapai = data['tile']
+        self.__prev_dapai = tile
 
     def _on_chipenggang(self, data: object) -> None:
         seat = data['seat']
+        tiles = bytes(tile_ids(data['tiles']))
 
         assert(self.__prev_dapai_seat is not None)
         assert(seat != self.__prev_dapai_seat)
@@ -196,19 +245,21 @@ class RoundState(object):
 
         if seat == self.__match_state.seat:
             # 手牌から副露牌を抜く．
-            for tile in data['tiles'][:-1]:
-                for i, t in enumerate(self.__shoupai):
-                    if t == tile:
-                        break
-                assert(i < len(self.__shoupai))
-                self.__shoupai.pop(i)
+            for tile in tiles[:-1]:
+                self.__remove_from_shoupai(tile)
+                self.__efficiency._remove_hand(tile)
+            self.__efficiency._add_fulu()
+        else:
+            # 鳴かれた牌は河で既に見えている．
+            for tile in tiles[:-1]:
+                self.__efficiency._add_visible(tile)
 
         assert(self.__zimopai is None)
 
         type_ = ('チー', 'ポン', '大明槓')[data['type']]
         from_ = data['froms'][-1]
         he_index = len(self.__he[from_]) - 1
-        self.__fulu[seat].append((type_, from_, he_index, data['tiles']))
+        self.__fulu[seat].append((type_, from_, he_index, tiles))
 
         if 'liqi' in data:
             liqi = data['liqi']
@@ -230,29 +281,22 @@ class RoundState(object):
         assert(self.__prev_dapai is None)
 
         seat = data['seat']
+        # `data['tiles']` は槓した牌1枚．
+        tile = tile_id(data['tiles'])
+        kind = TILE_KINDS[tile]
 
         assert(
             (seat == self.__match_state.seat) == (self.__zimopai is not None))
 
         if seat == self.__match_state.seat:
-            # 手牌もしくは自摸牌から副露牌を抜く．
-            if data['tiles'] in ('0m', '5m',):
-                tiles = ('0m', '5m',)
-            elif data['tiles'] in ('0p', '5p',):
-                tiles = ('0p', '5p',)
-            elif data['tiles'] in ('0s', '5s',):
-                tiles = ('0s', '5s',)
-            else:
-                tiles = (data['tiles'],)
-            count = 0
-            i = 0
-            while i < len(self.__shoupai):
-                tile = self.__shoupai[i]
-                if tile in tiles:
-                    self.__shoupai.pop(i)
-                    count += 1
-                    continue
-                i += 1
+            # 手牌もしくは自摸牌から副露牌を抜く．赤5とそうでない5は
+            # 同じ種類の牌として扱う．
+            removed = bytearray()
+            for t in KIND_TILES[kind]:
+                while self.__shoupai_counts[t] > 0:
+                    self.__remove_from_shoupai(t)
+                    removed.append(t)
+            count = len(removed)
             if data['type'] == 2:
                 # 加槓の場合
                 if count != 1:
@@ -260,8 +304,9 @@ class RoundState(object):
                         raise InconsistentMessage('An inconsistent message')
                     if self.__zimopai is None:
                         raise InconsistentMessage('An inconsistent message')
-                    if self.__zimopai not in tiles:
+                    if TILE_KINDS[self.__zimopai] != kind:
                         raise InconsistentMessage('An inconsistent message')
+                    removed.append(self.__zimopai)
                     self.__zimopai = None
                     count += 1
                 assert(count == 1)
@@ -272,8 +317,9 @@ class RoundState(object):
                         raise InconsistentMessage('An inconsistent message')
                     if self.__zimopai is None:
                         raise InconsistentMessage('An inconsistent message')
-                    if self.__zimopai not in tiles:
+                    if TILE_KINDS[self.__zimopai] != kind:
                         raise InconsistentMessage('An inconsistent message')
+                    removed.append(self.__zimopai)
                     self.__zimopai = None
                     count += 1
                 assert(count == 4)
@@ -282,24 +328,38 @@ class RoundState(object):
                 # 自摸牌を手牌に組み入れる．
                 self.__hand_in()
 
+            for t in removed:
+                self.__efficiency._remove_hand(t)
+            if data['type'] == 3:
+                self.__efficiency._add_fulu()
+        else:
+            # 他家の副露牌は赤5の有無が分からないので，通知された牌で
+            # 代用する．
+            removed = bytearray([tile] * (1 if data['type'] == 2 else 4))
+            for t in removed:
+                self.__efficiency._add_visible(t)
+
         assert(data['type'] in (2, 3))
         type_ = (None, None, '加槓', '暗槓')[data['type']]
         if data['type'] == 2:
             # 加槓の場合，既存のポンを加槓に置き換える．
             for i, fulu in enumerate(self.__fulu[seat]):
-                if fulu[3] == data['tiles'][:-1]:
+                if fulu[0] == 'ポン' and TILE_KINDS[fulu[3][0]] == kind:
                     break
-            assert(i < len(self.__fulu[seat]))
+            else:
+                raise InconsistentMessage('An inconsistent message')
             from_ = self.__fulu[seat][i][1]
             he_index = self.__fulu[seat][i][2]
-            self.__fulu[seat][i] = (type_, from_, he_index, data['tiles'])
+            tiles = self.__fulu[seat][i][3] + bytes(removed)
+            self.__fulu[seat][i] = (type_, from_, he_index, tiles)
         else:
             # 暗槓の場合．
-            self.__fulu[seat].append((type_, None, None, data['tiles']))
+            tiles = bytes(sorted(removed))
+            self.__fulu[seat].append((type_, None, None, tiles))
 
         if len(data['doras']) > 0:
             # 新ドラを表示する．
-            self.__dora_indicators = data['doras']
+            self.__set_dora_indicators(data['doras'])
 
         self.__first_draw = [False] * 4
         self.__yifa = [False] * 4
@@ -307,7 +367,7 @@ class RoundState(object):
 
         # 槍槓があるので暗槓・加槓は捨て牌とみなす．
         self.__prev_dapai_seat = seat
-        self.__prev_dapai = data['tiles'][-1]
+        self.__prev_dapai = tile
 
     @property
     def chang(self) -> int:
@@ -333,6 +393,12 @@ class RoundState(object):
 
     @property
     def dora_indicators(self) -> List[str]:
+        assert(len(self.__dora_indicators) >= 1)
+        assert(len(self.__dora_indicators) <= 5)
+        return tile_names(self.__dora_indicators)
+
+    @property
+    def dora_indicator_ids(self) -> bytes:
         assert(len(self.__dora_indicators) >= 1)
         assert(len(self.__dora_indicators) <= 5)
         return self.__dora_indicators
@@ -350,10 +416,28 @@ class RoundState(object):
 
     @property
     def shoupai(self) -> List[str]:
-        return self.__shoupai
+        if self.__shoupai_view is None:
+            self.__shoupai_view = tile_names(self.__shoupai)
+        return self.__shoupai_view
+
+    @property
+    def shoupai_ids(self) -> bytes:
+        # 手牌の牌 ID の列．並びは `shoupai` と同じ．
+        return bytes(self.__shoupai)
+
+    @property
+    def shoupai_counts(self) -> bytes:
+        # 手牌の牌 ID ごとの枚数．自摸牌は含まない．
+        return bytes(self.__shoupai_counts)
 
     @property
     def zimopai(self) -> Optional[str]:
+        if self.__zimopai is None:
+            return None
+        return TILE_NAMES[self.__zimopai]
+
+    @property
+    def zimopai_id(self) -> Optional[int]:
         return self.__zimopai
 
     @property
@@ -361,22 +445,47 @@ class RoundState(object):
         assert(len(self.__he) in (4, 3))
         for he_ in self.__he:
             assert(len(he_) <= 24)
-        return self.__he
+        return [
+            [(TILE_NAMES[t], m != 0) for t, m in zip(tiles, moqie)]
+            for tiles, moqie in zip(self.__he, self.__he_moqie)]
 
     @property
-    def fulu(self) -> List[List[Tuple[str, Optional[int], Optional[int], List[str]]]]:
+    def he_ids(self) -> List[bytes]:
+        # 各席の捨て牌の牌 ID の列．
+        assert(len(self.__he) in (4, 3))
+        return [bytes(he_) for he_ in self.__he]
+
+    def __check_fulu(self) -> None:
         assert(len(self.__fulu) in (4, 3))
-        for fulu_ in self.__fulu:
+        for seat, fulu_ in enumerate(self.__fulu):
             for type_, from_, he_index, tiles in fulu_:
                 assert(type_ in ('チー', 'ポン', '大明槓', '暗槓', '加槓'))
-                assert(from_ != self.__match_state.seat)
-                assert(from_ >= 0)
-                assert(from_ < 4)
-                assert(he_index < len(self.__fulu[from_]))
+                if type_ != '暗槓':
+                    assert(from_ != seat)
+                    assert(from_ >= 0)
+                    assert(from_ < 4)
+                    assert(he_index < len(self.__he[from_]))
                 assert(type_ not in ('チー', 'ポン') or len(tiles) == 3)
                 assert(
                     type_ not in ('大明槓', '暗槓', '加槓') or len(tiles) == 4)
-        return self.__fulu
+
+    @property
+    def fulu(self) -> List[List[Tuple[str, Optional[int], Optional[int], List[str]]]]:
+        self.__check_fulu()
+        return [
+            [(type_, from_, he_index, tile_names(tiles))
+             for type_, from_, he_index, tiles in fulu_]
+            for fulu_ in self.__fulu]
+
+    @property
+    def fulu_ids(self) -> List[List[Tuple[str, Optional[int], Optional[int], bytes]]]:
+        # `fulu` と同じで，副露牌を牌 ID の列で返す．
+        self.__check_fulu()
+        return [list(fulu_) for fulu_ in self.__fulu]
+
+    @property
+    def tile_efficiency(self) -> TileEfficiency:
+        return self.__efficiency
 
     @property
     def liqi(self) -> List[bool]:
@@ -415,4 +524,10 @@ class RoundState(object):
 
     @property
     def prev_dapai(self) -> Optional[str]:
+        if self.__prev_dapai is None:
+            return None
+        return TILE_NAMES[self.__prev_dapai]
+
+    @property
+    def prev_dapai_id(self) -> Optional[int]:
         return self.__prev_dapai
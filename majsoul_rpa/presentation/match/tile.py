@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+from typing import (Optional, Iterable, List,)
+
+
+# 牌の文字列表現（ `'1m'` や `'0p'` など）と整数の牌 ID の相互変換．
+# 牌 ID は理牌の順に振り，赤5は同じ色の5の直前に置く．
+#
+#   1m 2m 3m 4m 0m 5m 6m 7m 8m 9m :  0 -  9
+#   1p 2p 3p 4p 0p 5p 6p 7p 8p 9p : 10 - 19
+#   1s 2s 3s 4s 0s 5s 6s 7s 8s 9s : 20 - 29
+#   1z 2z 3z 4z 5z 6z 7z          : 30 - 36
+#
+# 牌 ID の大小がそのまま理牌の順になるので，牌 ID をそのまま理牌の
+# ソートキーとして使える．また，赤5を区別しない34種の牌の種類
+# （ `1m` から `7z` まで順に 0 - 33 ）への表を `TILE_KINDS` に持つ．
+
+
+NUM_TILE_IDS = 37
+NUM_TILE_KINDS = 34
+
+
+TILE_NAMES = tuple(
+    [f'{n}{c}' for c in 'mps' for n in (1, 2, 3, 4, 0, 5, 6, 7, 8, 9)]
+    + [f'{n}z' for n in range(1, 8)])
+
+
+_TILE_IDS = {name: i for i, name in enumerate(TILE_NAMES)}
+
+
+KIND_NAMES = tuple(
+    [f'{n}{c}' for c in 'mps' for n in range(1, 10)]
+    + [f'{n}z' for n in range(1, 8)])
+
+
+# 牌 ID から牌の種類への表．
+TILE_KINDS = bytes(
+    [9 * c + n for c in range(3) for n in (0, 1, 2, 3, 4, 4, 5, 6, 7, 8)]
+    + [27 + n for n in range(7)])
+
+
+# 牌 ID が赤5かどうか．
+RED_TILES = bytes(1 if name[0] == '0' else 0 for name in TILE_NAMES)
+
+
+# 牌の種類から，その種類に属する牌 ID への表．
+KIND_TILES = tuple(
+    tuple(i for i in range(NUM_TILE_IDS) if TILE_KINDS[i] == kind)
+    for kind in range(NUM_TILE_KINDS))
+
+
+assert(len(TILE_NAMES) == NUM_TILE_IDS)
+assert(len(KIND_NAMES) == NUM_TILE_KINDS)
+assert(len(TILE_KINDS) == NUM_TILE_IDS)
+
+
+def tile_id(name: str) -> int:
+    try:
+        return _TILE_IDS[name]
+    except KeyError:
+        raise ValueError(f'{name}: An invalid tile.')
+
+
+def tile_ids(names: Iterable[str]) -> bytearray:
+    return bytearray(tile_id(name) for name in names)
+
+
+def optional_tile_id(name: Optional[str]) -> Optional[int]:
+    # 他家の自摸牌のように牌が伏せられている場合は空文字列が来る．
+    if name is None or name == '':
+        return None
+    return tile_id(name)
+
+
+def tile_name(id_: int) -> str:
+    return TILE_NAMES[id_]
+
+
+def tile_names(ids: Iterable[int]) -> List[str]:
+    return [TILE_NAMES[i] for i in ids]
+
+
+def to_kind_counts(ids: Iterable[int]) -> bytearray:
+    # 牌 ID の列を，赤5を区別しない34種の牌の枚数のベクトルにする．
+    counts = bytearray(NUM_TILE_KINDS)
+    for i in ids:
+        counts[TILE_KINDS[i]] += 1
+    return counts
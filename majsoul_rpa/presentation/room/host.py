@@ -171,7 +171,7 @@ class RoomHostPresentation(RoomPresentationBase):
         while True:
             if datetime.datetime.now(datetime.timezone.utc) > deadline:
                 raise Timeout('Timeout.', rpa.get_screenshot())
-            if template.match(rpa.get_screenshot()):
+            if template.match(rpa.get_raw_screenshot()):
                 break
         template.click(rpa._get_browser())
 
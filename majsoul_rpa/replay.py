@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import time
+from pathlib import Path
+from typing import (Optional, Union, Iterable,)
+import numpy
+import PIL.Image
+from majsoul_rpa import (_DEFAULT_IGNORED_MESSAGES, RPA)
+from majsoul_rpa._impl import (ReplayClock, ReplayRedis, ReplayBrowser)
+from majsoul_rpa._impl.replay import (ArchiveWriter, read_archive)
+from majsoul_rpa._impl.template import pil2opencv
+
+
+class Recorder(object):
+    # `RPA` が `message_queue` から読み出したレコードと，取得した
+    # スクリーンショットを時刻と共にファイルに記録する．記録は `Replay` で
+    # 再生できる．スクリーンショットは全ては記録せず，直前に記録してから
+    # `screenshot_interval` 秒以上経ったものだけを記録する．
+    #
+    #   with RPA(...) as rpa, Recorder('session.mrrp', rpa):
+    #       ...
+    def __init__(
+        self, path: Union[str, Path], rpa: RPA, *,
+        screenshot_interval: float=0.5) -> None:
+        self.__path = path
+        self.__rpa = rpa
+        self.__screenshot_interval = int(screenshot_interval * 1000000000.0)
+        self.__writer = None
+        self.__last_frame = None
+
+    def __enter__(self) -> 'Recorder':
+        self.__writer = ArchiveWriter(self.__path)
+        self.__rpa._get_redis()._set_record_hook(self.__on_message)
+        self.__rpa._get_browser()._set_frame_hook(self.__on_frame)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        redis = self.__rpa._get_redis()
+        if redis is not None:
+            redis._set_record_hook(None)
+        browser = self.__rpa._get_browser()
+        if browser is not None:
+            browser._set_frame_hook(None)
+        self.__writer.close()
+        self.__writer = None
+
+    def __on_message(self, message: bytes) -> None:
+        self.__writer.write_message(time.time_ns(), message)
+
+    def __on_frame(self, image: Union[PIL.Image.Image, numpy.ndarray]) -> None:
+        timestamp = time.time_ns()
+        if self.__last_frame is not None \
+           and timestamp - self.__last_frame < self.__screenshot_interval:
+            return
+        self.__last_frame = timestamp
+        if isinstance(image, PIL.Image.Image):
+            image = pil2opencv(image)
+        self.__writer.write_frame(timestamp, image)
+
+
+class Replay(object):
+    # `Recorder` の記録を再生する．ゲームサーバ， Docker やブラウザ無しで
+    # プレゼンテーションを動かすためのもので， `RPA(None, replay=replay)`
+    # とすると `Redis` と `RemoteBrowser` の代わりに記録を再生する
+    # `ReplayRedis` と `ReplayBrowser` を使う．
+    #
+    # 再生中の時刻は，メッセージやスクリーンショットを待つ呼び出しでは
+    # 実際に待たずに次のメッセージなどの時刻まで飛ぶ． `speed` が 0 の
+    # 場合はそれ以外では進まず，再生は決定的になる．正の場合は実時間の
+    # `speed` 倍速でも進む．クリックなどのブラウザ操作は行わずに
+    # `ReplayBrowser.actions` に記録される．
+    def __init__(self, path: Union[str, Path], *, speed: float=0.0) -> None:
+        messages, frames = read_archive(path)
+        timestamps = [t for t, _ in messages] + [t for t, _ in frames]
+        if len(timestamps) == 0:
+            raise RuntimeError(f'{path}: An empty archive.')
+        self.__messages = messages
+        self.__frames = frames
+        self.__start = min(timestamps)
+        self.__end = max(timestamps)
+        self.__speed = speed
+        self.__clock: Optional[ReplayClock] = None
+
+    @property
+    def num_messages(self) -> int:
+        return len(self.__messages)
+
+    @property
+    def num_frames(self) -> int:
+        return len(self.__frames)
+
+    @property
+    def duration(self) -> float:
+        # 記録の長さ [s] ．
+        return (self.__end - self.__start) / 1000000000.0
+
+    @property
+    def clock(self) -> ReplayClock:
+        if self.__clock is None:
+            self.__clock = ReplayClock(self.__start, self.__speed)
+        return self.__clock
+
+    def _create_redis(
+        self, ignored_names: Iterable[str]=_DEFAULT_IGNORED_MESSAGES
+        ) -> ReplayRedis:
+        return ReplayRedis(
+            self.__messages, self.clock, ignored_names=ignored_names)
+
+    def _create_browser(self) -> ReplayBrowser:
+        return ReplayBrowser(self.__frames, self.clock)
@@ -1,19 +1,104 @@
+import os
 import re
-import datetime
 import logging
-import json
-import base64
+import struct
+import time
+from typing import (Optional,)
 import wsproto
 from redis import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+
+# Redis に送るレコードのバイナリ形式．
+# `majsoul_rpa/_impl/redis.py` にも同じ定義がある．
+#
+#   magic (4 bytes) | version (1 byte) | flags (1 byte)
+#   | timestamp [ns] (8 bytes) | request length (4 bytes)
+#   | response length (4 bytes) | request | response
+#
+# flags の bit 0 はリクエストが inbound であること， bit 1 はレスポンスが
+# 存在することを表す．
+_RECORD_MAGIC = b'MRWS'
+_RECORD_VERSION = 1
+_RECORD_PREFIX = struct.Struct('!4sBBQII')
+_RECORD_INBOUND = 0x01
+_RECORD_HAS_RESPONSE = 0x02
+
+
+def _encode_record(
+    request_direction: str, request: bytes, response: Optional[bytes],
+    timestamp: int) -> bytes:
+    flags = 0
+    if request_direction == 'inbound':
+        flags |= _RECORD_INBOUND
+    if response is not None:
+        flags |= _RECORD_HAS_RESPONSE
+    else:
+        response = b''
+    prefix = _RECORD_PREFIX.pack(
+        _RECORD_MAGIC, _RECORD_VERSION, flags, timestamp, len(request),
+        len(response))
+    return b''.join((prefix, request, response))
+
+
+def _session_key(name: str, session: Optional[str]) -> str:
+    # 複数のセッションで1つの Redis を共有する場合に，キーにセッションの
+    # 名前を付けて名前空間を分ける． `majsoul_rpa/_impl/redis.py` にも
+    # 同じ定義がある．
+    if session is None:
+        return name
+    return f'{name}:{session}'
 
 
 __redis = Redis(host='redis')
 __message_queue = {}
 
+# オーケストレータの下で動く場合のセッションの名前．
+__session = os.environ.get('MAJSOUL_RPA_SESSION') or None
+__queue_key = _session_key('message_queue', __session)
+__stream_key = _session_key('message_stream', __session)
+__counts_key = _session_key('ignored_message_counts', __session)
+
+# Redis に送らずに読み捨てるメッセージの名前（カンマ区切り）．
+# 読み捨てたメッセージは名前ごとの数だけを Redis に記録する．
+__ignored_names = frozenset(
+    n for n in os.environ.get('MAJSOUL_RPA_IGNORED_MESSAGES', '').split(',')
+    if n != '')
+
+# `list` ならば `message_queue` リストに， `stream` ならば
+# `message_stream` ストリームに送る．後者は直近の
+# `MAJSOUL_RPA_MESSAGE_STREAM_MAXLEN` 件程度を保持する．
+__transport = os.environ.get('MAJSOUL_RPA_MESSAGE_TRANSPORT', 'list')
+if __transport not in ('list', 'stream',):
+    raise RuntimeError(f'{__transport}: An unknown transport.')
+__stream_maxlen = int(
+    os.environ.get('MAJSOUL_RPA_MESSAGE_STREAM_MAXLEN', '100000'))
+
+
+def running() -> None:
+    # プロキシが接続を受け付けられるようになったことを知らせる．
+    # Redis のコンテナが起動途中の場合は接続できるまで待つ．
+    global __redis
+    global __session
+
+    key = _session_key('sniffer_ready', __session)
+    while True:
+        try:
+            __redis.rpush(key, 1)
+            break
+        except RedisConnectionError:
+            time.sleep(0.1)
+
 
 def websocket_message(flow) -> None:
     global __redis
     global __message_queue
+    global __ignored_names
+    global __transport
+    global __stream_maxlen
+    global __queue_key
+    global __stream_key
+    global __counts_key
 
     # mitmproxy のバージョンによる違いを吸収する．
     if hasattr(flow, 'websocket'):
@@ -115,18 +200,16 @@ content: {content}''')
  messages are outbound.')
         assert(direction == 'inbound')
 
-    # Redis に enqueue できるよう JSON にできる形式にエンコードする．
-    request = base64.b64encode(request).decode('UTF-8')
-    if response is not None:
-        response = base64.b64encode(response).decode('UTF-8')
-    now = datetime.datetime.now(tz=datetime.timezone.utc)
-    data = {
-        'request_direction': request_direction,
-        'request': request,
-        'response': response,
-        'timestamp': now.timestamp()
-    }
-
-    data = json.dumps(data, allow_nan=False, separators=(',', ':'))
-    data = data.encode('UTF-8')
-    __redis.rpush('message_queue', data)
+    if name in __ignored_names:
+        __redis.hincrby(__counts_key, name, 1)
+        return
+
+    # Redis に enqueue できるようバイナリ形式のレコードにする．
+    data = _encode_record(
+        request_direction, request, response, time.time_ns())
+    if __transport == 'stream':
+        __redis.xadd(
+            __stream_key, {'data': data}, maxlen=__stream_maxlen,
+            approximate=True)
+    else:
+        __redis.rpush(__queue_key, data)